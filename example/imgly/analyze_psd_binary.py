@@ -9,6 +9,8 @@ import os
 import re
 from typing import List, Dict, Set, Tuple
 
+import psd_strings
+
 def analyze_psd_binary_patterns(path: str) -> Dict:
     """Analisa padrões binários para encontrar correlações fonte-texto"""
     
@@ -20,9 +22,6 @@ def analyze_psd_binary_patterns(path: str) -> Dict:
 
     print(f"[INFO] Analisando {len(data)} bytes do arquivo {path}")
     
-    # Remove null bytes e decodifica
-    text = data.replace(b"\x00", b"").decode("latin-1", errors="ignore")
-    
     # Textos conhecidos do PSD
     known_texts = ["WOQM TESTE DE FONT", "LIGHT", "WOQM"]
     
@@ -35,46 +34,37 @@ def analyze_psd_binary_patterns(path: str) -> Dict:
     
     correlations = []
     
+    # (início, fim) reais no arquivo (ASCII ou UTF-16BE), sem remover nulos do buffer
+    font_spans = {font: psd_strings.find_string_spans(data, font) for font in known_fonts}
+    
     # Para cada texto, procura fontes próximas nos dados binários
     for text in known_texts:
         print(f"\n[ANALISANDO] Texto: '{text}'")
         
         # Encontra todas as posições deste texto
-        text_positions = []
-        start = 0
-        while True:
-            pos = text.find(text, start)
-            if pos == -1:
-                break
-            text_positions.append(pos)
-            start = pos + 1
+        text_spans = psd_strings.find_string_spans(data, text)
+        text_positions = [start for start, _end in text_spans]
         
         print(f"[POSIÇÕES] Encontrado em {len(text_positions)} posições: {text_positions}")
         
         # Para cada posição do texto, procura fontes em uma janela ao redor
-        for pos in text_positions:
+        # (text_end conta os bytes do texto: 2 por caractere em UTF-16BE)
+        for pos, text_end in text_spans:
             print(f"\n[ANÁLISE] Posição {pos} - Texto '{text}'")
             
             # Define janela de análise (antes e depois do texto)
-            window_size = 1000  # 1000 chars antes e depois
+            window_size = 1000  # 1000 bytes antes e depois
             start_window = max(0, pos - window_size)
-            end_window = min(len(text), pos + len(text) + window_size)
-            
-            window_text = text[start_window:end_window]
+            end_window = min(len(data), text_end + window_size)
             
             # Procura por fontes nesta janela
             fonts_in_window = []
             for font in known_fonts:
-                font_positions = []
-                start_font = 0
-                while True:
-                    font_pos = window_text.find(font, start_font)
-                    if font_pos == -1:
-                        break
-                    actual_pos = start_window + font_pos
-                    distance = abs(actual_pos - pos)
-                    font_positions.append({'pos': actual_pos, 'distance': distance})
-                    start_font = font_pos + 1
+                font_positions = [
+                    {'pos': font_pos, 'distance': abs(font_pos - pos)}
+                    for font_pos, font_end in font_spans[font]
+                    if start_window <= font_pos and font_end <= end_window
+                ]
                 
                 if font_positions:
                     closest = min(font_positions, key=lambda x: x['distance'])
@@ -7,12 +7,12 @@ import sys
 import os
 import re
 
+import psd_strings
+
 def comprehensive_psd_analysis(path: str):
     with open(path, "rb") as f:
         data = f.read()
 
-    text = data.replace(b"\x00", b"").decode("latin-1", errors="ignore")
-    
     target_texts = ["WOQM TESTE DE FONT", "LIGHT", "WOQM"]
     target_fonts = ["AvianoSansBold", "AvianoSansThin", "MyriadPro-Regular"]
     
@@ -21,27 +21,18 @@ def comprehensive_psd_analysis(path: str):
     print("="*80)
     
     # Cria um mapa de posições de todos os elementos
+    # (offsets reais no arquivo, em ASCII ou UTF-16BE)
     all_positions = []
     
     # Mapeia posições dos textos
     for text in target_texts:
-        start = 0
-        while True:
-            pos = text.find(text, start)
-            if pos == -1:
-                break
+        for pos in psd_strings.find_string_offsets(data, text):
             all_positions.append({'type': 'text', 'content': text, 'pos': pos})
-            start = pos + 1
     
     # Mapeia posições das fontes
     for font in target_fonts:
-        start = 0
-        while True:
-            pos = text.find(font, start)
-            if pos == -1:
-                break
+        for pos in psd_strings.find_string_offsets(data, font):
             all_positions.append({'type': 'font', 'content': font, 'pos': pos})
-            start = pos + 1
     
     # Ordena por posição
     all_positions.sort(key=lambda x: x['pos'])
@@ -9,6 +9,8 @@ import os
 import re
 from typing import List, Dict, Set, Tuple
 
+import psd_strings
+
 def deep_analyze_psd(path: str) -> Dict:
     """Análise profunda procurando padrões de contexto"""
     
@@ -20,9 +22,6 @@ def deep_analyze_psd(path: str) -> Dict:
 
     print(f"[INFO] Analisando {len(data)} bytes do arquivo")
     
-    # Converte para texto legível
-    text = data.replace(b"\x00", b"").decode("latin-1", errors="ignore")
-    
     # Textos e fontes conhecidos
     target_texts = ["WOQM TESTE DE FONT", "LIGHT", "WOQM"]
     target_fonts = ["AvianoSansBold", "AvianoSansThin", "MyriadPro-Regular"]
@@ -34,57 +33,47 @@ def deep_analyze_psd(path: str) -> Dict:
     # Mapeia todas as ocorrências
     all_mappings = []
     
+    # (início, fim) reais no arquivo (ASCII ou UTF-16BE), sem remover nulos do buffer
+    font_spans = {font: psd_strings.find_string_spans(data, font) for font in target_fonts}
+    
     for target_text in target_texts:
         print(f"\n[PROCURANDO] Texto: '{target_text}'")
         
         # Encontra todas as posições do texto
-        positions = []
-        start = 0
-        while True:
-            pos = text.find(target_text, start)
-            if pos == -1:
-                break
-            positions.append(pos)
-            start = pos + 1
+        spans = psd_strings.find_string_spans(data, target_text)
+        positions = [start for start, _end in spans]
         
         print(f"[ENCONTRADO] {len(positions)} ocorrências em: {positions[:5]}{'...' if len(positions) > 5 else ''}")
         
         # Para cada posição, analisa o contexto ao redor
-        for i, pos in enumerate(positions):
+        # text_end conta os bytes do texto: 2 por caractere em UTF-16BE
+        for i, (pos, text_end) in enumerate(spans):
             print(f"\n  [CONTEXTO {i+1}] Posição {pos}")
             
-            # Extrai contexto grande ao redor
+            # Janela grande ao redor (em bytes do arquivo)
             context_size = 2000  # 2KB antes e depois
             start_ctx = max(0, pos - context_size)
-            end_ctx = min(len(text), pos + len(target_text) + context_size)
-            context = text[start_ctx:end_ctx]
+            end_ctx = min(len(data), text_end + context_size)
             
             # Procura todas as fontes neste contexto
             fonts_in_context = []
             for font in target_fonts:
                 font_positions = []
-                start_font = 0
-                while True:
-                    font_pos = context.find(font, start_font)
-                    if font_pos == -1:
-                        break
+                for absolute_pos, font_end in font_spans[font]:
+                    if not (start_ctx <= absolute_pos and font_end <= end_ctx):
+                        continue
                     
-                    absolute_pos = start_ctx + font_pos
                     distance_to_text = abs(absolute_pos - pos)
                     
                     # Extrai um snippet ao redor da fonte
-                    snippet_start = max(0, font_pos - 50)
-                    snippet_end = min(len(context), font_pos + len(font) + 50)
-                    snippet = context[snippet_start:snippet_end]
+                    snippet = psd_strings.text_around(data, absolute_pos, 50 + font_end - absolute_pos)
                     
                     font_positions.append({
-                        'relative_pos': font_pos,
+                        'relative_pos': absolute_pos - start_ctx,
                         'absolute_pos': absolute_pos,
                         'distance': distance_to_text,
                         'snippet': snippet
                     })
-                    
-                    start_font = font_pos + 1
                 
                 if font_positions:
                     closest = min(font_positions, key=lambda x: x['distance'])
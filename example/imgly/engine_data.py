@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Streaming parser for Photoshop EngineData.
+
+EngineData is the PostScript-like dictionary that holds the text of a type
+layer and its styling.  It is stored raw in the ``Txt2`` tagged block and
+inside the ``EngineData`` property of the ``TySh`` descriptor:
+
+    <<
+        /EngineDict << /Editor << /Text (\\xfe\\xff...) >> /StyleRun << ... >> >>
+        /ResourceDict << /FontSet [ << /Name (\\xfe\\xff...) ... >> ] ... >>
+        /DocumentResources << ... >>
+    >>
+
+Tokens are ``<<``/``>>`` (dictionary), ``[``/``]`` (array), ``/Name``
+(key or name value), ``(...)`` strings (UTF-16BE after a ``\\xfe\\xff`` BOM,
+with backslash escapes), numbers and ``true``/``false``.  Newer ``Txt2``
+blocks use numeric keys (``/0``, ``/1``, ...) and omit the outer ``<< >>``;
+both forms are accepted.
+
+:func:`parse_engine_data` can build only the parts named by a ``spec`` and
+stops as soon as every one of them has been read, so extracting the
+``FontSet`` and ``StyleRun`` tables does not decode the rest of the
+document (``DocumentResources`` alone is often larger than everything
+needed).  :func:`read_engine_tables` does exactly that, and
+:func:`fonts_from_engine_dicts` applies the font lookup of
+``extract_psd_fonts.fonts_from_text_layer`` to the result.
+:func:`read_txt2_fonts` reads the document FontSet and the style runs of
+every text object from the global ``Txt2`` block, which answers "which
+fonts does this document use" without visiting the layers.
+
+This module has no third-party dependencies.
+"""
+
+import numbers
+import re
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+_TOKEN_RE = re.compile(
+    rb"(?P<dict_open><<)"
+    rb"|(?P<dict_close>>>)"
+    rb"|(?P<list_open>\[)"
+    rb"|(?P<list_close>\])"
+    rb"|/(?P<name>[^\s/\[\]()<>]*)"
+    rb"|\((?P<string>(?:[^\\)]|\\.)*)\)"
+    rb"|(?P<number>[-+]?(?:\d+\.?\d*|\.\d+))"
+    rb"|(?P<bool>true|false)"
+    rb"|(?P<null>null)",
+    re.S,
+)
+
+_ESCAPE_RE = re.compile(rb"\\(.)", re.S)
+
+# Only the tokens that open or close containers, and strings (which may
+# contain brackets); used to skip the subtrees a spec does not ask for.
+_SKIP_RE = re.compile(rb"<<|>>|\[|\]|\((?:[^\\)]|\\.)*\)", re.S)
+
+# Marker of the raw EngineData property inside a TySh descriptor: the key
+# "EngineData" followed by the "tdta" (raw data) type.
+_TYSH_ENGINE_DATA_RE = re.compile(rb"EngineDatatdta")
+
+# Font name fields of a FontSet entry, in order of preference (same as
+# ``extract_psd_fonts.FONT_NAME_KEYS``).
+FONT_NAME_KEYS = ("PostScriptName", "Name", "FontName", "FontFamilyName", "FontFamily")
+
+# What :func:`read_engine_tables` builds.  ``EngineDict.StyleSheetSet`` is
+# only consulted when a layer has no style runs.
+FONT_TABLES_SPEC = {
+    "EngineDict": {
+        "Editor": {"Text": True},
+        "StyleRun": {"RunArray": True, "RunLengthArray": True},
+        "StyleSheetSet": True,
+    },
+    "ResourceDict": {"FontSet": True},
+}
+
+# What :func:`read_txt2_fonts` builds from the numeric-key ``Txt2`` data:
+# ``/0/1/0`` is the document FontSet (``/0/0/0`` name, ``/0/0/2`` font type
+# and ``/0/0/3`` synthetic flag of each entry, in the order of the TySh
+# ``Name``/``Script``/``FontType``/``Synthetic`` keys; zero values are left
+# out) and ``/1/1`` the text objects, whose style runs are at ``/0/6/0``
+# with the FontSet index in ``/0/0/6/0`` of each run.
+TXT2_FONTS_SPEC = {
+    "0": {"1": {"0": {"0": {"0": {"0": True, "2": True, "3": True}}}}},
+    "1": {"1": {"0": {"6": {"0": {"0": {"0": {"6": {"0": True}}}}}}}},
+}
+
+
+def _decode_string(raw: bytes) -> str:
+    raw = _ESCAPE_RE.sub(rb"\1", raw)
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    return raw.decode("latin-1")
+
+
+def _decode_number(raw: bytes):
+    return float(raw) if b"." in raw else int(raw)
+
+
+class _Frame:
+    """An open dictionary or array while parsing."""
+
+    __slots__ = ("value", "spec", "remaining", "key", "name_in_parent", "is_dict", "satisfied")
+
+    def __init__(self, is_dict: bool, spec, name_in_parent: Optional[str]) -> None:
+        self.is_dict = is_dict
+        self.spec = spec
+        # ``None`` when the container is only being skipped.
+        self.value = None if spec is None else ({} if is_dict else [])
+        # Spec keys not read yet (selective dictionaries only).
+        self.remaining = set(spec) if is_dict and isinstance(spec, dict) else None
+        self.key: Optional[str] = None
+        self.name_in_parent = name_in_parent
+        self.satisfied = False
+
+    def child_spec(self):
+        if self.spec is None or self.spec is True:
+            return self.spec
+        if not self.is_dict:
+            return self.spec  # a dict spec on an array applies to its items
+        return self.spec.get(self.key)
+
+    def store(self, value) -> None:
+        if self.value is None:
+            return
+        if self.is_dict:
+            self.value[self.key] = value
+        else:
+            self.value.append(value)
+
+
+def _skip_container(data, pos: int, end: int) -> int:
+    """Return the position after the token closing the container open at ``pos``.
+
+    Only brackets and strings are matched, so the numbers and names inside
+    are passed over by the regex engine instead of one token at a time.
+    """
+    depth = 1
+    for match in _SKIP_RE.finditer(data, pos, end):
+        token = match.group()
+        if token == b"<<" or token == b"[":
+            depth += 1
+        elif token == b">>" or token == b"]":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    raise ValueError("Unexpected end of EngineData")
+
+
+def _mark_read(stack: List[_Frame]) -> bool:
+    """Record that the pending key of the top frame has been read.
+
+    Selective dictionaries whose spec keys have all been read count as read
+    in their parent, up the stack.  Returns True once the root is complete.
+    """
+    index = len(stack) - 1
+    frame = stack[index]
+    if not frame.is_dict:
+        return False
+    name = frame.key
+    frame.key = None
+    while frame.remaining is not None and not frame.satisfied:
+        frame.remaining.discard(name)
+        if frame.remaining:
+            return False
+        frame.satisfied = True
+        if index == 0:
+            return True
+        name = frame.name_in_parent
+        index -= 1
+        frame = stack[index]
+        if not frame.is_dict:
+            return False
+    return False
+
+
+def parse_engine_data(
+    data, spec: Optional[dict] = None, start: int = 0, end: Optional[int] = None
+) -> Any:
+    """Parse the EngineData in ``data[start:end]``.
+
+    ``data`` is any bytes-like object (``bytes``, ``memoryview``, ``mmap``).
+    Without ``spec`` the whole structure is returned as nested ``dict``,
+    ``list``, ``str``, ``int``, ``float`` and ``bool`` values.
+
+    ``spec`` is a nested dictionary naming the keys to build, ``True``
+    marking a subtree that is built whole, e.g. ``{"ResourceDict":
+    {"FontSet": True}}``.  Other values are tokenized but not built, and
+    parsing stops once every key of the spec has been read (or the
+    dictionary that should hold it has ended).  A dict spec given for an
+    array applies to each of its items.
+
+    Raises:
+        ValueError: If the data is not well-formed EngineData.
+    """
+    if end is None:
+        end = len(data)
+    root_spec = True if spec is None else spec
+    stack: List[_Frame] = []
+    implicit_root = False
+
+    pos = start
+    while True:
+        match = _TOKEN_RE.search(data, pos, end)
+        if match is None:
+            break
+        pos = match.end()
+        kind = match.lastgroup
+        top = stack[-1] if stack else None
+
+        if top is None and kind == "name" and not implicit_root:
+            # Txt2 data has no enclosing "<< >>": the root is implicit.
+            implicit_root = True
+            top = _Frame(True, root_spec, None)
+            stack.append(top)
+
+        if top is not None and top.is_dict and top.key is None:
+            if kind == "name":
+                top.key = match.group("name").decode("latin-1")
+                continue
+            if kind != "dict_close":
+                raise ValueError(f"Expected a key at offset {match.start()}")
+
+        if kind == "dict_open" or kind == "list_open":
+            if top is None:
+                frame = _Frame(kind == "dict_open", root_spec, None)
+            else:
+                child_spec = top.child_spec()
+                if child_spec is None:
+                    # Nothing to build inside: jump to the closing token.
+                    pos = _skip_container(data, pos, end)
+                    if _mark_read(stack):
+                        return stack[0].value
+                    continue
+                frame = _Frame(kind == "dict_open", child_spec, top.key)
+                if frame.value is not None:
+                    # Attached right away so an early stop returns it too.
+                    top.store(frame.value)
+            stack.append(frame)
+            continue
+
+        if kind == "dict_close" or kind == "list_close":
+            if not stack or top.is_dict != (kind == "dict_close"):
+                raise ValueError(f"Unbalanced {match.group().decode()} at offset {match.start()}")
+            stack.pop()
+            if not stack:
+                return top.value
+            # A dictionary that ended has no more of its spec keys to read.
+            top.satisfied = True
+            if _mark_read(stack):
+                return stack[0].value
+            continue
+
+        if top is None:
+            raise ValueError(f"Unexpected {kind} at offset {match.start()} outside a dictionary")
+        if top.child_spec() is not None:
+            if kind == "string":
+                top.store(_decode_string(match.group("string")))
+            elif kind == "number":
+                top.store(_decode_number(match.group("number")))
+            elif kind == "bool":
+                top.store(match.group("bool") == b"true")
+            elif kind == "name":
+                top.store(match.group("name").decode("latin-1"))
+            else:
+                top.store(None)
+        if _mark_read(stack):
+            return stack[0].value
+
+    if implicit_root and len(stack) == 1 and stack[0].key is None:
+        return stack[0].value
+    raise ValueError("Unexpected end of EngineData")
+
+
+def find_engine_data(payload, start: int = 0, end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """Return the ``(start, end)`` of the EngineData inside a ``TySh`` payload.
+
+    The raw EngineData is stored as the ``EngineData`` property (type
+    ``tdta``) of the text descriptor.  ``start`` and ``end`` limit the
+    search to part of ``payload``.  Returns ``None`` when it is missing.
+    """
+    if end is None:
+        end = len(payload)
+    match = _TYSH_ENGINE_DATA_RE.search(payload, start, end)
+    if match is None or match.end() + 4 > end:
+        return None
+    length = struct.unpack_from(">I", payload, match.end())[0]
+    data_start = match.end() + 4
+    return data_start, min(data_start + length, end)
+
+
+class StyleRun(NamedTuple):
+    """One entry of ``EngineDict.StyleRun``: a character count and its style."""
+
+    length: int
+    font: Optional[int]
+    font_size: Optional[float]
+
+
+class EngineTables(NamedTuple):
+    """The parts of EngineData read by :func:`read_engine_tables`."""
+
+    engine_dict: Dict[str, Any]
+    resource_dict: Dict[str, Any]
+
+    @property
+    def text(self) -> str:
+        return ((self.engine_dict.get("Editor") or {}).get("Text")) or ""
+
+    @property
+    def font_set(self) -> List[Dict[str, Any]]:
+        return self.resource_dict.get("FontSet") or []
+
+    @property
+    def font_names(self) -> List[str]:
+        """Names of every FontSet entry, used or not, in FontSet order."""
+        return [_font_name(entry) for entry in self.font_set]
+
+    @property
+    def style_runs(self) -> List[StyleRun]:
+        style_run = self.engine_dict.get("StyleRun") or {}
+        runs = style_run.get("RunArray") or []
+        lengths = style_run.get("RunLengthArray") or []
+        table = []
+        for i, run in enumerate(runs):
+            data = _safe_get(run, "StyleSheet", "StyleSheetData") or {}
+            table.append(StyleRun(
+                lengths[i] if i < len(lengths) else 0,
+                data.get("Font"),
+                data.get("FontSize"),
+            ))
+        return table
+
+    @property
+    def fonts(self) -> List[str]:
+        """Same result as ``extract_psd_fonts.fonts_from_text_layer``."""
+        return fonts_from_engine_dicts(self.engine_dict, self.resource_dict)
+
+
+def read_engine_tables(data, start: int = 0, end: Optional[int] = None) -> EngineTables:
+    """Read the text, FontSet and StyleRun tables of EngineData.
+
+    ``data`` holds raw EngineData (a ``Txt2`` block) or, when
+    :func:`find_engine_data` locates it, a whole ``TySh`` payload.
+
+    Raises:
+        ValueError: If the EngineData is malformed.
+    """
+    if end is None:
+        end = len(data)
+    located = find_engine_data(data, start, end)
+    if located is not None:
+        start, end = located
+    parsed = parse_engine_data(data, FONT_TABLES_SPEC, start, end) or {}
+    return EngineTables(parsed.get("EngineDict") or {}, parsed.get("ResourceDict") or {})
+
+
+def _is_mapping(value) -> bool:
+    # psd-tools' engine_data.Dict is dict-like but not a dict subclass.
+    return isinstance(value, dict) or hasattr(value, "keys")
+
+
+def _is_index(value) -> bool:
+    # psd-tools' engine_data.Integer is not an int but registers as numbers.Integral.
+    return isinstance(value, numbers.Integral)
+
+
+def _safe_get(d, *keys, default=None):
+    cur = d
+    for k in keys:
+        if not _is_mapping(cur) or k not in cur:
+            return default
+        cur = cur[k]
+    return cur
+
+
+def _font_name(entry: Dict[str, Any]) -> str:
+    for k in FONT_NAME_KEYS:
+        v = entry.get(k) if _is_mapping(entry) else None
+        if v:
+            # psd-tools wraps strings in engine_data.String; str() of it is a repr.
+            return str(getattr(v, "value", v))
+    return ""
+
+
+class FontInfo(NamedTuple):
+    """A FontSet entry, resolved.
+
+    ``postscript_name``, ``font_type`` and ``synthetic`` are read from the
+    entry.  EngineData stores no family or style, so ``family`` and
+    ``style`` are only a heuristic split of the PostScript name.
+    """
+
+    postscript_name: str
+    # Heuristic: the name before the last "-", or the whole name without
+    # one.  Not the family of the font file.
+    family: str
+    # Heuristic: the name after the last "-" ("Arial-BoldMT" gives "BoldMT"),
+    # empty when the name has no "-".
+    style: str
+    font_type: Optional[int]
+    synthetic: bool
+
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def font_info(entry: Dict[str, Any]) -> FontInfo:
+    """Resolve a FontSet entry (``/Name``, ``/FontType``, ``/Synthetic``)."""
+    name = _font_name(entry)
+    family, dash, style = name.rpartition("-")
+    if not dash:
+        family, style = name, ""
+    font_type = entry.get("FontType") if _is_mapping(entry) else None
+    synthetic = entry.get("Synthetic") if _is_mapping(entry) else None
+    return FontInfo(
+        name,
+        family,
+        style,
+        int(font_type) if _is_index(font_type) else None,
+        bool(synthetic),
+    )
+
+
+class Txt2Fonts(NamedTuple):
+    """The document FontSet of a ``Txt2`` block and the entries each text object uses."""
+
+    font_set: List[FontInfo]
+    # FontSet indices referenced by the style runs of each text object.
+    text_objects: List[List[int]]
+
+    @property
+    def fonts(self) -> List[str]:
+        """Sorted names of the fonts used by at least one style run."""
+        names = {
+            self.font_set[index].postscript_name
+            for indices in self.text_objects
+            for index in indices
+        }
+        names.discard("")
+        return sorted(names)
+
+
+def read_txt2_fonts(data, start: int = 0, end: Optional[int] = None) -> Txt2Fonts:
+    """Read the FontSet and the style run fonts of a ``Txt2`` block.
+
+    Raises:
+        ValueError: If the EngineData is malformed.
+    """
+    parsed = parse_engine_data(data, TXT2_FONTS_SPEC, start, end) or {}
+    font_set = []
+    for entry in _safe_get(parsed, "0", "1", "0", default=None) or []:
+        font = _safe_get(entry, "0", "0", default=None) or {}
+        font_set.append(
+            font_info({"Name": font.get("0"), "FontType": font.get("2"), "Synthetic": font.get("3")})
+        )
+    text_objects = []
+    for text_object in _safe_get(parsed, "1", "1", default=None) or []:
+        runs = _safe_get(text_object, "0", "6", "0", default=None) or []
+        indices = [_safe_get(run, "0", "0", "6", "0") for run in runs]
+        text_objects.append(
+            [int(index) for index in indices if _is_index(index) and 0 <= index < len(font_set)]
+        )
+    return Txt2Fonts(font_set, text_objects)
+
+
+def used_font_indices(engine: Dict[str, Any], resource_dict: Dict[str, Any]) -> Tuple[List[Any], List[int]]:
+    """Return the FontSet of a text layer and the FontSet indices it uses.
+
+    The indices are those of ``StyleRun.RunArray[*].StyleSheet.StyleSheetData.Font``
+    in ``engine`` (``EngineDict``) or, without runs, the one of
+    ``StyleSheetSet.StyleSheetData.Font``; indices outside the FontSet are
+    dropped.
+    """
+    resource_dict = engine.get("ResourceDict") or resource_dict or {}
+    font_set = resource_dict.get("FontSet", []) or []
+    style_run = engine.get("StyleRun") or {}
+    runs = style_run.get("RunArray", []) or []
+
+    if runs:
+        indices = [_safe_get(r, "StyleSheet", "StyleSheetData", "Font") for r in runs]
+    else:
+        style_sheet_set = engine.get("StyleSheetSet") or {}
+        indices = [_safe_get(style_sheet_set, "StyleSheetData", "Font")]
+    return font_set, [int(idx) for idx in indices if _is_index(idx) and 0 <= idx < len(font_set)]
+
+
+def fonts_from_engine_dicts(engine: Dict[str, Any], resource_dict: Dict[str, Any]) -> List[str]:
+    """Return the sorted font names used by a text layer.
+
+    Maps the indices of :func:`used_font_indices` to the names of the
+    FontSet entries.  Works on the dictionaries of :func:`parse_engine_data`
+    and on ``psd_tools``' ``engine_dict``/``resource_dict``.
+    """
+    font_set, indices = used_font_indices(engine, resource_dict)
+    names = {_font_name(font_set[idx]) for idx in indices}
+    names.discard("")
+    return sorted(names)
@@ -8,11 +8,110 @@ import sys
 import os
 import json
 import re
-from psd_tools import PSDImage
-from psd_tools.constants import Tag
 
-def extract_fonts_from_layer_tysh(layer):
+try:
+    from psd_tools import PSDImage
+    from psd_tools.constants import Tag
+except ImportError:  # psd-tools é opcional: o leitor nativo (psd_sections) cobre o caso comum
+    PSDImage = None
+
+import engine_data
+import psd_cascade
+import psd_metadata
+import psd_sections
+import scan_fonts_binary
+
+def fonts_via_text_data(tag_data):
+    """Método 1: Via text_data estruturado"""
+    fonts_found = []
+    if hasattr(tag_data, 'text_data'):
+        text_data = tag_data.text_data
+        
+        # Via document_resources
+        if hasattr(text_data, 'document_resources'):
+            doc_res = text_data.document_resources
+            if hasattr(doc_res, 'font_set') and doc_res.font_set:
+                for font in doc_res.font_set:
+                    for attr in ['name', 'postscript_name', 'family', 'font_name']:
+                        if hasattr(font, attr):
+                            value = getattr(font, attr)
+                            if value and isinstance(value, str) and len(value) > 1:
+                                fonts_found.append(value)
+                                print(f"[MATCH] Fonte via document_resources: {value}")
+                                break
+        
+        # Via style_runs
+        if hasattr(text_data, 'style_runs'):
+            for run in text_data.style_runs:
+                if hasattr(run, 'style'):
+                    style = run.style
+                    for attr in ['font', 'font_name', 'font_family', 'postscript_name']:
+                        if hasattr(style, attr):
+                            value = getattr(style, attr)
+                            if value and isinstance(value, str) and len(value) > 1:
+                                fonts_found.append(value)
+                                print(f"[MATCH] Fonte via style_runs: {value}")
+                                break
+    return fonts_found
+
+def fonts_via_regex(tag_data):
+    """Método 2: Regex sobre a representação textual do bloco"""
+    fonts_found = []
+    raw_data = str(tag_data)
+    
+    # Padrões específicos para fontes
+    font_patterns = [
+        r'PostScriptName["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
+        r'FontName["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
+        r'Family["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\s\-]*)',
+        r'([A-Za-z]+(?:\-[A-Z][a-z]*)*(?:\-(?:Bold|Italic|Light|Regular|Medium|Black|Thin))?)',
+    ]
+    
+    for pattern in font_patterns:
+        matches = re.findall(pattern, raw_data, re.IGNORECASE)
+        for match in matches:
+            match = match.strip()
+            if len(match) > 2 and match not in ['Type', 'Text', 'Object', 'Data', 'Layer']:
+                fonts_found.append(match)
+                print(f"[MATCH] Fonte via regex: {match}")
+    return fonts_found
+
+def fonts_via_binary_scan(tag_data):
+    """Método 3: Scan binário focado nas palavras-chave de fontes"""
+    fonts_found = []
+    # Converte dados para bytes e aplica método similar ao scan_fonts_binary
+    try:
+        if hasattr(tag_data, 'data'):
+            layer_bytes = tag_data.data
+        elif hasattr(tag_data, '_data'):
+            layer_bytes = tag_data._data
+        else:
+            layer_bytes = str(tag_data).encode('latin-1', errors='ignore')
+        
+        if isinstance(layer_bytes, bytes):
+            # Remove null bytes e decodifica
+            text = layer_bytes.replace(b"\x00", b"").decode("latin-1", errors="ignore")
+            
+            # Procura palavras com indicadores de fonte (uma passada só)
+            for name in scan_fonts_binary.DEFAULT_MATCHER.font_names(text):
+                fonts_found.append(name)
+                print(f"[MATCH] Fonte via scan binário: {name}")
+    except Exception as e:
+        print(f"[DEBUG] Erro no scan binário: {e}")
+    return fonts_found
+
+def new_psd_tools_cascade(exhaustive=False):
+    """Cascata do backend psd-tools: text_data, depois regex, depois scan binário"""
+    return psd_cascade.Cascade([
+        psd_cascade.Method('text_data', 1, 0.95, fonts_via_text_data),
+        psd_cascade.Method('regex', 5, 0.3, fonts_via_regex),
+        psd_cascade.Method('binary_scan', 10, 0.7, fonts_via_binary_scan),
+    ], exhaustive=exhaustive)
+
+def extract_fonts_from_layer_tysh(layer, cascade=None):
     """Extrai fontes específicas de uma camada usando análise do TySh"""
+    if cascade is None:
+        cascade = new_psd_tools_cascade()
     fonts_found = []
     
     try:
@@ -23,82 +122,8 @@ def extract_fonts_from_layer_tysh(layer):
                         
                         print(f"[DEBUG] Analisando TySh da camada '{layer.name}'")
                         
-                        # Método 1: Via text_data estruturado
-                        if hasattr(tag_data, 'text_data'):
-                            text_data = tag_data.text_data
-                            
-                            # Via document_resources
-                            if hasattr(text_data, 'document_resources'):
-                                doc_res = text_data.document_resources
-                                if hasattr(doc_res, 'font_set') and doc_res.font_set:
-                                    for font in doc_res.font_set:
-                                        for attr in ['name', 'postscript_name', 'family', 'font_name']:
-                                            if hasattr(font, attr):
-                                                value = getattr(font, attr)
-                                                if value and isinstance(value, str) and len(value) > 1:
-                                                    fonts_found.append(value)
-                                                    print(f"[MATCH] Fonte via document_resources: {value}")
-                                                    break
-                            
-                            # Via style_runs
-                            if hasattr(text_data, 'style_runs'):
-                                for run in text_data.style_runs:
-                                    if hasattr(run, 'style'):
-                                        style = run.style
-                                        for attr in ['font', 'font_name', 'font_family', 'postscript_name']:
-                                            if hasattr(style, attr):
-                                                value = getattr(style, attr)
-                                                if value and isinstance(value, str) and len(value) > 1:
-                                                    fonts_found.append(value)
-                                                    print(f"[MATCH] Fonte via style_runs: {value}")
-                                                    break
-                        
-                        # Método 2: Análise binária dos dados da camada específica
-                        raw_data = str(tag_data)
-                        
-                        # Padrões específicos para fontes
-                        font_patterns = [
-                            r'PostScriptName["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
-                            r'FontName["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
-                            r'Family["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\s\-]*)',
-                            r'([A-Za-z]+(?:\-[A-Z][a-z]*)*(?:\-(?:Bold|Italic|Light|Regular|Medium|Black|Thin))?)',
-                        ]
-                        
-                        for pattern in font_patterns:
-                            matches = re.findall(pattern, raw_data, re.IGNORECASE)
-                            for match in matches:
-                                match = match.strip()
-                                if len(match) > 2 and match not in ['Type', 'Text', 'Object', 'Data', 'Layer']:
-                                    fonts_found.append(match)
-                                    print(f"[MATCH] Fonte via regex: {match}")
-                        
-                        # Método 3: Scan binário focado nas palavras-chave de fontes
-                        # Converte dados para bytes e aplica método similar ao scan_fonts_binary
-                        try:
-                            if hasattr(tag_data, 'data'):
-                                layer_bytes = tag_data.data
-                            elif hasattr(tag_data, '_data'):
-                                layer_bytes = tag_data._data
-                            else:
-                                layer_bytes = str(tag_data).encode('latin-1', errors='ignore')
-                            
-                            if isinstance(layer_bytes, bytes):
-                                # Remove null bytes e decodifica
-                                text = layer_bytes.replace(b"\x00", b"").decode("latin-1", errors="ignore")
-                                
-                                # Procura palavras com indicadores de fonte
-                                words = re.findall(r"[A-Za-z0-9][A-Za-z0-9 _\-/]{2,}", text)
-                                font_terms = ["Bold", "Light", "Regular", "Italic", "Thin", "Medium", "Black", "Semibold", "Condensed", "Heavy", "Ultra", "Book"]
-                                
-                                for w in words:
-                                    if any(t in w for t in font_terms):
-                                        name = w.strip().strip("/")
-                                        if name.lower() not in {"fauxbold false", "fauxitalic false"} and 0 < len(name) <= 50:
-                                            fonts_found.append(name)
-                                            print(f"[MATCH] Fonte via scan binário: {name}")
-                        except Exception as e:
-                            print(f"[DEBUG] Erro no scan binário: {e}")
-                        
+                        # Métodos do mais barato ao mais caro; para no primeiro confiável
+                        fonts_found = cascade.run(tag_data).fonts
                         break
                         
     except Exception as e:
@@ -124,7 +149,104 @@ def clean_font_name(font_name):
     
     return cleaned if len(cleaned) > 2 else None
 
-def extract_fonts_with_layer_association(psd_path):
+def fonts_from_tysh_bytes(payload):
+    """Extrai fontes dos bytes brutos de um bloco TySh (mesmo scan do Método 3)"""
+    # bytes() só copia quando o payload é uma view (mmap)
+    text = bytes(payload).replace(b"\x00", b"").decode("latin-1", errors="ignore")
+    unique_fonts = []
+    for name in scan_fonts_binary.DEFAULT_MATCHER.font_names(text):
+        cleaned = clean_font_name(name)
+        if cleaned and cleaned not in unique_fonts:
+            unique_fonts.append(cleaned)
+    return unique_fonts
+
+def new_layer_index_cascade(exhaustive=False):
+    """Cascata do backend nativo: tabelas do EngineData, depois scan dos bytes do TySh"""
+    return psd_cascade.Cascade([
+        psd_cascade.Method('engine_data', 1, 0.95, lambda item: item[0].fonts),
+        psd_cascade.Method('tysh_scan', 5, 0.7, lambda item: fonts_from_tysh_bytes(item[1])),
+    ], exhaustive=exhaustive)
+
+def extract_with_layer_index(psd_path, exhaustive=False):
+    """
+    Backend rápido: lê só o índice de camadas (psd_sections) e o EngineData
+    de cada TySh (engine_data), sem montar o modelo de objetos do psd-tools
+    nem tocar nos pixels.
+    Percorre as mesmas camadas do backend psd-tools (nível superior).
+    """
+    cascade = new_layer_index_cascade(exhaustive)
+    with open(psd_path, 'rb') as f:
+        index = psd_sections.read_layer_index(f)
+    top_level = psd_sections.build_layer_tree(index.layers)
+    print(f"[INFO] Dimensões: {index.header.width} x {index.header.height}")
+    
+    with psd_sections.map_file(psd_path) as mm:
+        tysh = psd_sections.layer_block_views(mm, 'TySh')
+        
+        layers_info = []
+        all_unique_fonts = set()
+        
+        for i, node in enumerate(top_level, 1):
+            record = node.record
+            if not record.is_text:
+                continue
+            payload = tysh[record.index].view
+            try:
+                tables = engine_data.read_engine_tables(payload)
+            except ValueError:
+                tables = engine_data.EngineTables({}, {})
+            text = tables.text.rstrip('\r')
+            print(f"\n[LAYER {i}] Processando: '{record.name}'")
+            print(f"[INFO] Texto: '{text}'")
+            
+            # Fontes dos StyleRuns primeiro; o scan dos bytes do TySh só
+            # roda se as tabelas não trouxerem nenhuma fonte
+            layer_fonts = []
+            for font in cascade.run((tables, payload)).fonts:
+                cleaned = clean_font_name(font)
+                if cleaned and cleaned not in layer_fonts:
+                    layer_fonts.append(cleaned)
+            all_unique_fonts.update(layer_fonts)
+            
+            layers_info.append({
+                'layer_index': i,
+                'layer_name': record.name,
+                'text_content': text,
+                'fonts_found': layer_fonts,
+                'font_count': len(layer_fonts),
+                'visible': record.visible,
+                'bbox': {
+                    'left': record.left,
+                    'top': record.top,
+                    'right': record.right,
+                    'bottom': record.bottom
+                }
+            })
+            
+            if layer_fonts:
+                print(f"[SUCESSO] Fontes da camada '{record.name}': {layer_fonts}")
+            else:
+                print(f"[AVISO] Nenhuma fonte encontrada na camada '{record.name}'")
+    
+    return {
+        'source_file': psd_path,
+        'psd_info': {
+            'width': index.header.width,
+            'height': index.header.height,
+            'total_layers': len(top_level)
+        },
+        'extraction_method': 'layer_specific_analysis',
+        'summary': {
+            'total_text_layers': len(layers_info),
+            'total_unique_fonts': len(all_unique_fonts),
+            'all_fonts_found': sorted(list(all_unique_fonts))
+        },
+        'layers': layers_info,
+        'method_stats': cascade.as_dict(),
+        'extraction_timestamp': __import__('datetime').datetime.now().isoformat()
+    }
+
+def extract_fonts_with_layer_association(psd_path, exhaustive=False):
     """Extrai fontes associando cada uma à sua camada específica"""
     
     if not os.path.exists(psd_path):
@@ -132,9 +254,18 @@ def extract_fonts_with_layer_association(psd_path):
     
     print(f"[INFO] Extraindo fontes com associação por camada: {os.path.basename(psd_path)}")
     
+    # Backend nativo primeiro; psd-tools fica como fallback
+    try:
+        return extract_with_layer_index(psd_path, exhaustive)
+    except (ValueError, OSError) as e:
+        if PSDImage is None:
+            raise Exception(f"Erro ao processar PSD: {e}")
+        print(f"[AVISO] Leitor nativo falhou ({e}), usando psd-tools")
+    
     try:
-        psd = PSDImage.open(psd_path)
+        psd = psd_metadata.open_metadata(psd_path)
         print(f"[INFO] Dimensões: {psd.width} x {psd.height}")
+        cascade = new_psd_tools_cascade(exhaustive)
         
         layers_info = []
         all_unique_fonts = set()
@@ -146,7 +277,7 @@ def extract_fonts_with_layer_association(psd_path):
                 print(f"[INFO] Texto: '{layer.text}'")
                 
                 # Extrai fontes específicas desta camada
-                layer_fonts = extract_fonts_from_layer_tysh(layer)
+                layer_fonts = extract_fonts_from_layer_tysh(layer, cascade)
                 
                 # Adiciona ao conjunto geral
                 for font in layer_fonts:
@@ -190,6 +321,7 @@ def extract_fonts_with_layer_association(psd_path):
                 'all_fonts_found': sorted(list(all_unique_fonts))
             },
             'layers': layers_info,
+            'method_stats': cascade.as_dict(),
             'extraction_timestamp': __import__('datetime').datetime.now().isoformat()
         }
         
@@ -199,14 +331,17 @@ def extract_fonts_with_layer_association(psd_path):
         raise Exception(f"Erro ao processar PSD: {e}")
 
 def main():
-    if len(sys.argv) != 2:
-        print("Uso: python extract_fonts_per_layer.py <arquivo.psd>")
+    # --all-methods roda todos os métodos em todas as camadas (sem parada antecipada)
+    exhaustive = '--all-methods' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--all-methods']
+    if len(args) != 1:
+        print("Uso: python extract_fonts_per_layer.py <arquivo.psd> [--all-methods]")
         sys.exit(1)
     
-    psd_path = sys.argv[1]
+    psd_path = args[0]
     
     try:
-        result = extract_fonts_with_layer_association(psd_path)
+        result = extract_fonts_with_layer_association(psd_path, exhaustive)
         
         # Imprime resultado formatado
         print(f"\n{'='*60}")
@@ -225,6 +360,12 @@ def main():
         for font in result['summary']['all_fonts_found']:
             print(f"  - {font}")
         
+        print(f"\nMétodos (do mais barato ao mais caro):")
+        for name, stats in result['method_stats'].items():
+            rate = stats['hits'] / stats['calls'] * 100 if stats['calls'] else 0.0
+            print(f"  {name}: {stats['calls']} chamadas, {stats['hits']} acertos ({rate:.0f}%), "
+                  f"{stats['skipped']} evitadas, {stats['seconds'] * 1000:.2f} ms")
+        
         # Salva resultado JSON
         output_file = psd_path.replace('.psd', '_fonts_per_layer.json')
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -10,35 +10,14 @@ import json
 import re
 from typing import List, Set, Dict, Any
 
+import psd_sections
+import psd_strings
+import scan_fonts_binary
+
 def scan_file_for_fonts(path: str) -> List[str]:
     """Escaneia arquivo PSD por fontes usando método que funciona"""
-    if not os.path.isfile(path):
-        raise FileNotFoundError(f"File not found: {path}")
-    
-    with open(path, "rb") as f:
-        data = f.read()
-
-    # Remove null bytes e decodifica
-    text = data.replace(b"\x00", b"").decode("latin-1", errors="ignore")
-
-    # Regex para sequências ASCII válidas
-    words = re.findall(r"[A-Za-z0-9][A-Za-z0-9 _\-/]{2,}", text)
-
-    # Termos que indicam fontes
-    font_terms = [
-        "Bold", "Light", "Regular", "Italic", "Thin", "Medium", "Black", 
-        "Semibold", "Condensed", "Heavy", "Ultra", "Book"
-    ]
-
-    candidates: Set[str] = set()
-    for w in words:
-        if any(t in w for t in font_terms):
-            name = w.strip().strip("/")
-            if name.lower() not in {"fauxbold false", "fauxitalic false"}:
-                if 0 < len(name) <= 50:
-                    candidates.add(name)
-
-    return sorted(candidates)
+    # Decodifica strings ASCII/UTF-16BE no próprio buffer, sem remover nulos
+    return scan_fonts_binary.scan_file_for_fonts(path, decode_strings=True)
 
 def extract_text_content_from_binary(path: str) -> List[Dict[str, Any]]:
     """Extrai conteúdo de texto real das camadas PSD, filtrando ruído"""
@@ -48,8 +27,17 @@ def extract_text_content_from_binary(path: str) -> List[Dict[str, Any]]:
     with open(path, "rb") as f:
         data = f.read()
 
-    # Remove null bytes e decodifica
-    text = data.replace(b"\x00", b"").decode("latin-1", errors="ignore")
+    # O texto das camadas fica nos blocos TySh/Txt2; quando existem,
+    # analisa só esses trechos em vez do arquivo inteiro
+    spans = [(offset, length) for _key, offset, length in psd_sections.iter_engine_data_spans(data)]
+    strings = []
+    for offset, length in spans or [(0, len(data))]:
+        for _offset, _encoding, value in psd_strings.iter_strings(data, start=offset, end=offset + length):
+            strings.append(value)
+
+    # Strings separadas por \x00 para não virarem uma palavra só;
+    # no EngineData a quebra de linha do texto é \r
+    text = "\x00".join(strings).replace("\r", " ")
     
     # Lista de textos que sabemos que são reais (do seu exemplo)
     known_real_texts = ["WOQM TESTE DE FONT", "LIGHT", "WOQM"]
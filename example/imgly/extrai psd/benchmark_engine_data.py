@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the EngineData parser.
+
+For every text layer of the given files, compares parsing the whole
+EngineData (:func:`engine_data.parse_engine_data` without a spec) with
+reading only the font tables (:func:`engine_data.read_engine_tables`),
+and, when psd-tools is installed, with
+``extract_psd_fonts.extract_fonts_psd_tools`` on the whole file.  Time is the best of ``--repeat`` runs; memory is the
+peak traced by ``tracemalloc`` during one run.
+
+Usage:
+    python benchmark_engine_data.py ../assets/input_clean.psd ../assets/teste_font.psd
+"""
+
+import argparse
+import sys
+import tracemalloc
+from typing import Callable, List, Sequence, Tuple
+
+import engine_data
+import psd_sections
+from benchmark_scan import best_time
+
+import extract_psd_fonts
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    """Return the peak traced allocation of one call of ``func``, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def text_payloads(path: str) -> List[Tuple[str, bytes]]:
+    with open(path, "rb") as f:
+        index = psd_sections.read_layer_index(f)
+        return [
+            (record.name, psd_sections.read_block(f, record.block("TySh")))
+            for record in index.layers
+            if record.is_text
+        ]
+
+
+def benchmark_file(path: str, repeat: int) -> None:
+    payloads = text_payloads(path)
+    print(f"\n{path}: {len(payloads)} text layers")
+
+    def parse_all() -> None:
+        for _name, payload in payloads:
+            start, end = engine_data.find_engine_data(payload)
+            engine_data.parse_engine_data(payload, None, start, end)
+
+    def read_tables() -> None:
+        for _name, payload in payloads:
+            engine_data.read_engine_tables(payload).fonts
+
+    cases = [("full parse", parse_all), ("font tables", read_tables)]
+    if extract_psd_fonts.PSDImage is not None:
+        cases.append(("psd-tools", lambda: extract_psd_fonts.extract_fonts_psd_tools(path)))
+    for label, func in cases:
+        elapsed = best_time(func, repeat)
+        peak = peak_memory(func)
+        print(f"  {label:<12} {elapsed * 1000:8.2f} ms  peak {peak / 1024:8.1f} KiB")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the EngineData parser.")
+    parser.add_argument("files", nargs="+", help="PSD/PSB files with text layers.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement.")
+    args = parser.parse_args(argv)
+    for path in args.files:
+        benchmark_file(path, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
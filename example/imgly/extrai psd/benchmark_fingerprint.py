@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the result cache lookup cost against the file size.
+
+For each file, times :func:`psd_cache.quick_fingerprint` (size, header,
+section lengths and metadata) against :func:`psd_cache.file_digest` (full
+SHA-256), plus a complete cache hit through :meth:`ResultCache.cached`
+with and without full-hash verification.  Synthetic PSB files come from
+``benchmark_scan.make_synthetic_psb``.  The files are read once before
+timing, so the numbers reflect the page cache and not the disk.
+
+Usage:
+    python benchmark_fingerprint.py ../assets/input_clean.psd
+    python benchmark_fingerprint.py --synthetic-mb 16 128 1024 --repeat 3
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import List, Sequence
+
+import psd_cache
+from benchmark_scan import best_time, make_synthetic_psb
+
+
+def benchmark_file(path: str, cache: psd_cache.ResultCache, repeat: int) -> None:
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    psd_cache.file_digest(path)  # warm the page cache
+    cache.cached(path, "benchmark", "1", lambda p: ["x"])
+    cache.cached(path, "benchmark", "2", lambda p: ["x"], verify=False)
+
+    timings = [
+        ("quick", lambda: psd_cache.quick_fingerprint(path)),
+        ("sha256", lambda: psd_cache.file_digest(path)),
+        ("hit", lambda: cache.cached(path, "benchmark", "2", list, verify=False)),
+        ("hit+verify", lambda: cache.cached(path, "benchmark", "1", list)),
+    ]
+    cells = [f"{label} {best_time(func, repeat) * 1000:9.2f} ms" for label, func in timings]
+    print(f"{size_mb:9.1f} MB  " + "  ".join(cells) + f"  {os.path.basename(path)}")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark cache fingerprinting.")
+    parser.add_argument("files", nargs="*", help="PSD/PSB files to benchmark.")
+    parser.add_argument(
+        "--synthetic-mb",
+        type=float,
+        nargs="*",
+        default=[],
+        help="Also benchmark synthetic PSB files of these sizes (MB).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement.")
+    args = parser.parse_args(argv)
+    if not args.files and not args.synthetic_mb:
+        parser.error("give at least one file or --synthetic-mb")
+
+    workdir = tempfile.mkdtemp(prefix="psd_fingerprint_")
+    cache = psd_cache.ResultCache(os.path.join(workdir, "cache"))
+    paths: List[str] = list(args.files)
+    try:
+        for size in args.synthetic_mb:
+            path = os.path.join(workdir, f"synthetic_{size:g}mb.psb")
+            make_synthetic_psb(path, size)
+            paths.append(path)
+        for path in paths:
+            benchmark_file(path, cache, args.repeat)
+    finally:
+        cache.close()
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
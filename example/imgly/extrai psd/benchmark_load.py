@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Throughput of ``POST /api/analyze-psd`` against the executor configuration.
+
+For each configuration (``psd_executor`` kind and worker count) the API is
+served on a local port by werkzeug's threaded server, in this process, and
+``--clients`` client processes upload the files in a loop for
+``--seconds``.  The clients run in their own processes so they do not
+compete with the server for its GIL.  Reported per configuration: requests
+per second, median and 95th percentile latency, and the speedup over the
+``inline`` run (the work done in the request threads, as before the
+executor existed).
+
+The default files are the sample PSDs under ``../assets`` with
+``method=binary_scan``, so most of the server time is the metadata scan;
+``--method txt2`` measures the cheaper Txt2 path instead.  Throughput can
+only grow up to the number of cores of the machine: the worker counts
+default to powers of two up to ``os.cpu_count()``.  The result cache is
+disabled.
+
+Usage:
+    python benchmark_load.py
+    python benchmark_load.py --workers 1 2 4 8 16 --clients 32 --seconds 20
+    python benchmark_load.py ../assets/input_clean.psd --kinds process --method txt2
+
+Requires Flask (see api_requirements.txt).
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+os.environ["PSD_CACHE_DISABLED"] = "1"
+
+import psd_executor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILES = [
+    os.path.join(HERE, "..", "assets", "input_clean.psd"),
+    os.path.join(HERE, "..", "assets", "teste_font.psd"),
+]
+BOUNDARY = "loadboundary" + uuid.uuid4().hex
+
+# Request bodies of the client process, built once per process.
+_bodies: Dict[str, bytes] = {}
+
+
+def multipart_body(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("ascii") + data + f"\r\n--{BOUNDARY}--\r\n".encode("ascii")
+
+
+def client(
+    port: int, paths: Sequence[str], url: str, start_at: float, end_at: float
+) -> Tuple[List[float], int]:
+    """Upload ``paths`` in turn from ``start_at`` to ``end_at``; (latencies, errors)."""
+    for path in paths:
+        if path not in _bodies:
+            _bodies[path] = multipart_body(path)
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    latencies: List[float] = []
+    errors = 0
+    time.sleep(max(0.0, start_at - time.time()))
+    i = 0
+    while time.time() < end_at:
+        body = _bodies[paths[i % len(paths)]]
+        i += 1
+        start = time.perf_counter()
+        conn.request("POST", url, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    conn.close()
+    return latencies, errors
+
+
+def start_server(kind: str, workers: int):
+    """Serve ``psd_api.app`` with a fresh executor; returns the werkzeug server."""
+    import psd_api  # only in the server process: the clients never need Flask
+    from werkzeug.serving import make_server
+
+    previous = psd_api._executor
+    psd_api.EXECUTOR_KIND = kind
+    psd_api.EXECUTOR_WORKERS = workers
+    psd_api._executor = None
+    if previous is not None:
+        previous.shutdown()
+    psd_api.task_executor()  # starts the workers before the clients do
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no line per request
+    server = make_server("127.0.0.1", 0, psd_api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_configuration(
+    pool, kind: str, workers: int, args: argparse.Namespace
+) -> Dict[str, float]:
+    server = start_server(kind, workers)
+    try:
+        url = f"/api/analyze-psd?method={args.method}"
+        start_at = time.time() + 1.0  # client processes are already running
+        end_at = start_at + args.seconds
+        runs = pool.starmap(
+            client,
+            [(server.server_port, args.files, url, start_at, end_at)] * args.clients,
+        )
+    finally:
+        server.shutdown()
+    latencies = sorted(latency for run, _errors in runs for latency in run)
+    errors = sum(errors for _run, errors in runs)
+    if not latencies:
+        raise RuntimeError(f"{kind}/{workers}: no successful request ({errors} errors)")
+    return {
+        "throughput": len(latencies) / args.seconds,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "requests": len(latencies),
+        "errors": errors,
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(
+        description="Benchmark /api/analyze-psd throughput against the executor worker count."
+    )
+    parser.add_argument("files", nargs="*", help="PSD/PSB files to upload (default: ../assets samples).")
+    parser.add_argument(
+        "--kinds",
+        nargs="+",
+        choices=psd_executor.KINDS,
+        default=list(psd_executor.KINDS),
+        help="Executor kinds to measure (inline runs once, with one worker).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[n for n in (1, 2, 4, 8, 16, 32) if n <= cpus] or [1],
+        help="Worker counts for the thread and process executors.",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=2 * cpus, help="Concurrent client processes."
+    )
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run.")
+    parser.add_argument(
+        "--method", choices=("txt2", "binary_scan"), default="binary_scan",
+        help="?method= of the requests.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(argv)
+    args.files = [os.path.abspath(path) for path in args.files or DEFAULT_FILES]
+
+    configurations = []
+    for kind in args.kinds:
+        if kind == psd_executor.INLINE:
+            configurations.append((kind, 1))
+        else:
+            configurations.extend((kind, workers) for workers in args.workers)
+
+    results = []
+    baseline: Optional[float] = None
+    if not args.json:
+        print(f"{cpus} CPUs, {args.clients} clients, {args.seconds:g}s per run, method={args.method}")
+        print(f"{'executor':<9}{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>9}")
+    # spawn: the clients must not inherit the server threads of this process
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        for kind, workers in configurations:
+            result = run_configuration(pool, kind, workers, args)
+            if kind == psd_executor.INLINE:
+                baseline = result["throughput"]
+            result.update(executor=kind, workers=workers)
+            result["speedup"] = result["throughput"] / baseline if baseline else None
+            results.append(result)
+            if not args.json:
+                speedup = f"{result['speedup']:.2f}x" if result["speedup"] else "-"
+                print(
+                    f"{kind:<9}{workers:>8}{result['throughput']:>10.1f}"
+                    f"{result['p50'] * 1000:>10.1f}{result['p95'] * 1000:>10.1f}{speedup:>9}"
+                    + (f"  ({result['errors']} errors)" if result["errors"] else "")
+                )
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark of ``psd_metadata.open_metadata`` against ``PSDImage.open``.
+
+Each measurement runs in a fresh process, which opens the file, walks
+every layer (name, kind, text of the text layers) and reports its wall
+time and peak RSS (``VmHWM``, or ``ru_maxrss`` outside Linux).  The RSS
+of a process that only imports psd-tools is reported as the baseline.
+Synthetic files are built by ``benchmark_scan.make_synthetic_psb``.
+
+Usage:
+    python benchmark_open.py ../assets/input_clean.psd
+    python benchmark_open.py ../assets/input_clean.psd --synthetic-mb 256 1024
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+import benchmark_scan
+
+MODES = ("import", "psd_tools", "metadata")
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM is reset by exec; ru_maxrss can carry the parent's peak over.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_child(mode: str, path: str) -> None:
+    """Open ``path`` with ``mode`` and print the measurement as JSON."""
+    from psd_tools import PSDImage
+
+    import psd_metadata
+
+    start = time.perf_counter()
+    layers = 0
+    if mode != "import":
+        psd = PSDImage.open(path) if mode == "psd_tools" else psd_metadata.open_metadata(path)
+        for layer in psd.descendants():
+            layers += 1
+            if layer.kind == "type":
+                try:
+                    layer.text
+                except ValueError:
+                    pass  # synthetic TySh blocks are not complete descriptors
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": _peak_rss_mb(), "layers": layers}))
+
+
+def measure(mode: str, path: str) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def benchmark_file(path: str, repeat: int) -> None:
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"\n{os.path.basename(path)} ({size_mb:.1f} MB)")
+    for mode in MODES:
+        runs = [measure(mode, path) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["seconds"])
+        peak = max(run["peak_rss_mb"] for run in runs)
+        print(
+            f"  {mode:<10} {best['seconds'] * 1000:9.1f} ms  peak RSS {peak:8.1f} MB  "
+            f"{best['layers']} layers"
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark metadata-only opening against PSDImage.open."
+    )
+    parser.add_argument("files", nargs="*", help="PSD/PSB files to benchmark.")
+    parser.add_argument(
+        "--synthetic-mb",
+        type=float,
+        nargs="*",
+        default=[],
+        help="Also benchmark synthetic PSB files of these sizes (MB).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement.")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        run_child(*args.child)
+        return
+    if not args.files and not args.synthetic_mb:
+        parser.error("give at least one file or --synthetic-mb")
+
+    paths: List[str] = list(args.files)
+    generated: List[str] = []
+    workdir = tempfile.mkdtemp(prefix="psd_bench_")
+    for size in args.synthetic_mb:
+        path = os.path.join(workdir, f"synthetic_{size:g}mb.psb")
+        benchmark_scan.make_synthetic_psb(path, size)
+        generated.append(path)
+    paths.extend(generated)
+
+    try:
+        for path in paths:
+            benchmark_file(path, args.repeat)
+    finally:
+        for path in generated:
+            os.remove(path)
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the binary font scanner.
+
+Times ``scan_fonts_binary.scan_file_for_fonts`` with the pure ``re`` path
+and with the NumPy run prefilter on real files and on synthetic PSB files
+of a given size.  The synthetic files are valid PSB documents: a few text
+layers with ``TySh`` engine data, random channel data and a random merged
+image, which behaves like compressed pixel data for the scanner.
+
+``--word-run-mb`` times ``FontTermMatcher`` on one run of short words
+separated by spaces and containing no font term, the worst case for the
+word regex: the MB/s should stay flat as the run grows.
+
+Usage:
+    python benchmark_scan.py ../assets/input_clean.psd
+    python benchmark_scan.py ../assets/input_clean.psd --synthetic-mb 64 256
+    python benchmark_scan.py --synthetic-mb 512 --repeat 1 --keep
+    python benchmark_scan.py --word-run-mb 0.25 1 4
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from typing import Callable, List, Sequence
+
+import scan_fonts_binary
+
+SYNTHETIC_FONTS = ["AvianoSans-Bold", "Montserrat-Light", "BebasNeue-Regular"]
+
+
+def _engine_data(font: str, text: str) -> bytes:
+    """Build a small EngineData dictionary naming ``font``."""
+
+    def ps_string(value: str) -> bytes:
+        raw = value.encode("utf-16-be")
+        for ch in (b"\\", b"(", b")"):
+            raw = raw.replace(ch, b"\\" + ch)
+        return b"(\xfe\xff" + raw + b")"
+
+    return (
+        b"\n\n<<\n\t/EngineDict\n\t<<\n\t\t/Editor\n\t\t<<\n\t\t\t/Text "
+        + ps_string(text + "\r")
+        + b"\n\t\t>>\n\t\t/StyleRun\n\t\t<<\n\t\t\t/RunArray [\n\t\t\t<<\n"
+        b"\t\t\t\t/StyleSheet\n\t\t\t\t<<\n\t\t\t\t\t/StyleSheetData\n"
+        b"\t\t\t\t\t<<\n\t\t\t\t\t\t/Font 0\n\t\t\t\t\t\t/FontSize 48.0\n"
+        b"\t\t\t\t\t>>\n\t\t\t\t>>\n\t\t\t>>\n\t\t\t]\n\t\t\t/RunLengthArray [ "
+        + str(len(text) + 1).encode("ascii")
+        + b" ]\n\t\t>>\n\t>>\n\t/ResourceDict\n\t<<\n\t\t/FontSet [\n\t\t<<\n"
+        b"\t\t\t/Name "
+        + ps_string(font)
+        + b"\n\t\t\t/Script 0\n\t\t\t/FontType 1\n\t\t\t/Synthetic 0\n"
+        b"\t\t>>\n\t\t]\n\t>>\n>>"
+    )
+
+
+def _tagged_block(key: bytes, payload: bytes) -> bytes:
+    if len(payload) % 2:
+        payload += b"\x00"
+    return b"8BIM" + key + struct.pack(">I", len(payload)) + payload
+
+
+def make_synthetic_psb(
+    path: str,
+    size_mb: float,
+    text_layers: int = 3,
+    seed: int = 0,
+) -> None:
+    """Write a PSB file of roughly ``size_mb`` megabytes to ``path``.
+
+    Each text layer carries a ``TySh`` block whose EngineData names one of
+    ``SYNTHETIC_FONTS``.  Half of the requested size goes to channel image
+    data and half to the merged image data, both filled with random bytes.
+    The ``TySh`` payload only contains what the scanners look at; it is not
+    a complete type tool descriptor.
+    """
+    rng = random.Random(seed)
+    total = int(size_mb * 1024 * 1024)
+    channel_size = max(1, total // 2 // max(1, text_layers) // 3)
+    image_size = max(1, total // 2)
+    width = height = 1000
+
+    def noise(n: int) -> bytes:
+        return rng.getrandbits(n * 8).to_bytes(n, "little")
+
+    records = b""
+    channels = b""
+    for i in range(text_layers):
+        font = SYNTHETIC_FONTS[i % len(SYNTHETIC_FONTS)]
+        name = f"Text {i + 1}".encode("ascii")
+        pascal = bytes([len(name)]) + name
+        pascal += b"\x00" * (-len(pascal) % 4)
+        tysh = struct.pack(">HH", 1, 50) + _engine_data(font, f"Layer {i + 1}")
+        extra = struct.pack(">II", 0, 0) + pascal + _tagged_block(b"TySh", tysh)
+        records += struct.pack(">iiii", 0, 0, height, width)
+        records += struct.pack(">H", 3)
+        for channel_id in range(3):
+            records += struct.pack(">hQ", channel_id, channel_size + 2)
+        records += b"8BIMnorm" + bytes([255, 0, 0, 0])
+        records += struct.pack(">I", len(extra)) + extra
+        for _ in range(3):
+            channels += b"\x00\x00" + noise(channel_size)
+
+    layer_info = struct.pack(">h", text_layers) + records + channels
+    layer_info += b"\x00" * (-len(layer_info) % 4)
+    layer_section = struct.pack(">Q", len(layer_info)) + layer_info
+    layer_section += struct.pack(">I", 0)  # global layer mask info
+
+    with open(path, "wb") as f:
+        f.write(b"8BPS" + struct.pack(">H", 2) + b"\x00" * 6)
+        f.write(struct.pack(">HIIHH", 3, height, width, 8, 3))
+        f.write(struct.pack(">I", 0))  # color mode data
+        f.write(struct.pack(">I", 0))  # image resources
+        f.write(struct.pack(">Q", len(layer_section)) + layer_section)
+        f.write(b"\x00\x00")  # raw image data
+        remaining = image_size
+        while remaining > 0:
+            block = min(remaining, 8 * 1024 * 1024)
+            f.write(noise(block))
+            remaining -= block
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Return the best wall time of ``repeat`` runs of ``func``, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_file(path: str, repeat: int) -> None:
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"\n{os.path.basename(path)} ({size_mb:.1f} MB)")
+    modes = [("re", False)]
+    if scan_fonts_binary.np is not None:
+        modes.append(("numpy", True))
+    else:
+        print("  (NumPy not installed: only the pure re path is measured)")
+
+    results = {}
+    for label, use_numpy in modes:
+        fonts = scan_fonts_binary.scan_file_for_fonts(path, use_numpy=use_numpy)
+        elapsed = best_time(
+            lambda: scan_fonts_binary.scan_file_for_fonts(path, use_numpy=use_numpy),
+            repeat,
+        )
+        results[label] = fonts
+        print(
+            f"  {label:<6} {elapsed * 1000:9.1f} ms  {size_mb / elapsed:8.1f} MB/s  "
+            f"{len(fonts)} fonts"
+        )
+    if len(results) == 2 and results["re"] != results["numpy"]:
+        print("  WARNING: results differ between the re and numpy paths")
+
+
+def benchmark_word_run(size_mb: float, repeat: int) -> None:
+    """Time the matcher on a ``size_mb`` run of ``"ab "`` words with no font term."""
+    text = "ab " * int(size_mb * 1024 * 1024 / 3)
+    matcher = scan_fonts_binary.DEFAULT_MATCHER
+    elapsed = best_time(lambda: list(matcher.font_names(text)), repeat)
+    print(
+        f"  word run {size_mb:g} MB  {elapsed * 1000:9.1f} ms  "
+        f"{size_mb / elapsed:8.1f} MB/s"
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the binary font scanner.")
+    parser.add_argument("files", nargs="*", help="PSD/PSB files to benchmark.")
+    parser.add_argument(
+        "--synthetic-mb",
+        type=float,
+        nargs="*",
+        default=[],
+        help="Also benchmark synthetic PSB files of these sizes (MB).",
+    )
+    parser.add_argument(
+        "--word-run-mb",
+        type=float,
+        nargs="*",
+        default=[],
+        help="Also time the matcher on a run of words of these sizes (MB).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement.")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the synthetic files after the run."
+    )
+    args = parser.parse_args(argv)
+    if not args.files and not args.synthetic_mb and not args.word_run_mb:
+        parser.error("give at least one file, --synthetic-mb or --word-run-mb")
+
+    if args.word_run_mb:
+        print("\nRun of short words without a font term")
+        for size in args.word_run_mb:
+            benchmark_word_run(size, args.repeat)
+
+    paths: List[str] = list(args.files)
+    generated: List[str] = []
+    workdir = tempfile.mkdtemp(prefix="psd_bench_")
+    for size in args.synthetic_mb:
+        path = os.path.join(workdir, f"synthetic_{size:g}mb.psb")
+        make_synthetic_psb(path, size)
+        generated.append(path)
+    paths.extend(generated)
+
+    try:
+        for path in paths:
+            benchmark_file(path, args.repeat)
+    finally:
+        if args.keep:
+            print(f"\nSynthetic files kept in {workdir}")
+        else:
+            for path in generated:
+                os.remove(path)
+            os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
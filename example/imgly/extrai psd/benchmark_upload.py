@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Upload-to-response latency of ``POST /api/analyze-psd``.
+
+Starts ``psd_api.app`` on a local port (werkzeug's threaded server) and
+uploads each file as ``multipart/form-data`` with ``http.client``, timing
+the request from its first byte to the end of the response.  Two handlers
+are compared:
+
+    stream  the ``/api/analyze-psd`` endpoint, which scans the upload while
+            it arrives (``psd_stream.SpooledUpload``)
+    saved   the previous flow, registered here under ``/bench/analyze-saved``:
+            ``request.files`` buffers the body, it is saved to a temporary
+            file, then scanned and fingerprinted from disk
+
+``after last byte`` is the time between sending the last byte of the body
+and receiving the response, i.e. the work left once the upload is done.
+``--rate-mb`` throttles the client to emulate a network link.  Both
+handlers use the binary scan (the synthetic files have no ``Txt2``) and
+the result cache is disabled.  Synthetic files are built by
+``benchmark_scan.make_synthetic_psb``.
+
+Usage:
+    python benchmark_upload.py
+    python benchmark_upload.py --synthetic-mb 1 50 500 --repeat 3
+    python benchmark_upload.py ../assets/input_clean.psd --synthetic-mb --rate-mb 100
+
+Requires Flask (see api_requirements.txt).
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+os.environ["PSD_CACHE_DISABLED"] = "1"
+
+from flask import jsonify, request
+from werkzeug.serving import make_server
+
+import benchmark_scan
+import psd_api
+import psd_cache
+import scan_fonts_binary
+
+SEND_CHUNK_SIZE = 256 * 1024
+BOUNDARY = "benchmarkboundary" + uuid.uuid4().hex
+
+
+def analyze_saved():
+    """``/api/analyze-psd`` before streaming: save, then scan from disk."""
+    file = request.files["file"]
+    temp_path = os.path.join(psd_api.UPLOAD_FOLDER, f"{uuid.uuid4()}.psb")
+    file.save(temp_path)
+    try:
+        fonts = scan_fonts_binary.scan_file_for_fonts(
+            temp_path, chunk_size=psd_api.SCAN_CHUNK_SIZE, sections_only=True
+        )
+        return jsonify({
+            "fonts_found": fonts,
+            "size_bytes": os.path.getsize(temp_path),
+            "fingerprint": psd_cache.quick_fingerprint(temp_path),
+        })
+    finally:
+        os.remove(temp_path)
+
+
+def start_server(max_bytes: int):
+    psd_api.app.config["MAX_CONTENT_LENGTH"] = max_bytes
+    psd_api.app.add_url_rule("/bench/analyze-saved", view_func=analyze_saved, methods=["POST"])
+    psd_api.task_executor()  # start the executor workers before the first timing
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no line per request
+    server = make_server("127.0.0.1", 0, psd_api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def upload(port: int, url: str, path: str, rate_mb: Optional[float]) -> Dict[str, Any]:
+    """POST ``path`` to ``url``; return the timings in seconds and the fonts found."""
+    head = (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("ascii")
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode("ascii")
+    length = len(head) + os.path.getsize(path) + len(tail)
+
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.putrequest("POST", url)
+    conn.putheader("Content-Type", f"multipart/form-data; boundary={BOUNDARY}")
+    conn.putheader("Content-Length", str(length))
+    conn.endheaders()
+    conn.send(head)
+    sent = len(head)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(SEND_CHUNK_SIZE), b""):
+            conn.send(chunk)
+            sent += len(chunk)
+            if rate_mb:
+                # Sleep until the link would have carried ``sent`` bytes.
+                delay = start + sent / (rate_mb * 1024 * 1024) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    conn.send(tail)
+    uploaded = time.perf_counter()
+    response = conn.getresponse()
+    body = response.read()
+    done = time.perf_counter()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"{url}: HTTP {response.status} {body[:200]!r}")
+    result = json.loads(body)
+    fonts = result["analysis"]["fonts_found"] if "analysis" in result else result["fonts_found"]
+    return {"total": done - start, "after_upload": done - uploaded, "fonts": fonts}
+
+
+def benchmark_file(port: int, path: str, repeat: int, rate_mb: Optional[float]) -> None:
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"\n{os.path.basename(path)} ({size_mb:.1f} MB)")
+    fonts = {}
+    for mode, url in (
+        ("stream", "/api/analyze-psd?method=binary_scan"),
+        ("saved", "/bench/analyze-saved"),
+    ):
+        runs = [upload(port, url, path, rate_mb) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["total"])
+        fonts[mode] = best["fonts"]
+        print(
+            f"  {mode:<7} {best['total'] * 1000:9.1f} ms total  "
+            f"{best['after_upload'] * 1000:8.1f} ms after last byte"
+        )
+    if fonts["stream"] != fonts["saved"]:
+        print(f"  fonts differ: stream {fonts['stream']} saved {fonts['saved']}")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark upload-to-response latency of /api/analyze-psd."
+    )
+    parser.add_argument("files", nargs="*", help="PSD/PSB files to upload.")
+    parser.add_argument(
+        "--synthetic-mb",
+        type=float,
+        nargs="*",
+        default=[1, 50, 500],
+        help="Also upload synthetic PSB files of these sizes (MB).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Uploads per measurement.")
+    parser.add_argument(
+        "--rate-mb", type=float, help="Throttle the client to this many MB/s."
+    )
+    args = parser.parse_args(argv)
+    if not args.files and not args.synthetic_mb:
+        parser.error("give at least one file or --synthetic-mb")
+
+    paths: List[str] = list(args.files)
+    generated: List[str] = []
+    workdir = tempfile.mkdtemp(prefix="psd_bench_")
+    for size in args.synthetic_mb:
+        path = os.path.join(workdir, f"synthetic_{size:g}mb.psb")
+        benchmark_scan.make_synthetic_psb(path, size)
+        generated.append(path)
+    paths.extend(generated)
+
+    largest = max(os.path.getsize(path) for path in paths)
+    server = start_server(largest + 1024 * 1024)
+    try:
+        for path in paths:
+            benchmark_file(server.server_port, path, args.repeat, args.rate_mb)
+    finally:
+        server.shutdown()
+        for path in generated:
+            os.remove(path)
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
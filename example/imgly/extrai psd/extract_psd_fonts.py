@@ -2,78 +2,108 @@
 # -*- coding: utf-8 -*-
 """
 Extrai fontes de arquivos PSD/PSB.
-Requer: psd-tools (pip install psd-tools)
+Lê o índice de camadas (psd_sections) e o EngineData (engine_data) direto do
+arquivo; psd-tools (pip install psd-tools) é usado como fallback.
 Uso:
   python extract_psd_fonts.py caminho/arquivo.psd
   python extract_psd_fonts.py caminho/arquivo.psd --json
+  python extract_psd_fonts.py caminho/arquivo.psd --no-cache
+  python extract_psd_fonts.py caminho/arquivo.psd --refresh
+  python extract_psd_fonts.py caminho/arquivo.psd --fonts-only
 """
 
 import argparse
 import json
-from typing import Dict, List, Set, Any
-from psd_tools import PSDImage
+from typing import Dict, List, Optional, Set, Any
+try:
+    from psd_tools import PSDImage
+except ImportError:  # psd-tools é opcional: o leitor nativo cobre o caso comum
+    PSDImage = None
+
+import engine_data
+import psd_cache
+import psd_metadata
+import psd_sections
+from psd_results import DocumentFontTable
+
+# nome/versão usados como chave no cache de resultados (mude a versão ao alterar a extração)
+CACHE_EXTRACTOR = "extract_psd_fonts"
+CACHE_VERSION = "3"
 
 # ordem de preferência dos campos que costumam existir no FontSet
-FONT_NAME_KEYS = ("PostScriptName", "Name", "FontName", "FontFamilyName", "FontFamily")
-
-def _safe_get(d: Dict, *keys, default=None):
-    cur = d
-    for k in keys:
-        if not isinstance(cur, dict) or k not in cur:
-            return default
-        cur = cur[k]
-    return cur
-
-def _font_name_from_fontset_entry(entry: Dict[str, Any]) -> str:
-    for k in FONT_NAME_KEYS:
-        v = entry.get(k)
-        if v:
-            return str(v)
-    return ""
-
-def fonts_from_text_layer(layer) -> List[str]:
+FONT_NAME_KEYS = engine_data.FONT_NAME_KEYS
+
+def fonts_from_text_layer(layer, table: Optional[DocumentFontTable] = None) -> List[str]:
     """
     Retorna a lista (sem duplicados) de nomes de fonte usados em uma camada de texto.
     Lê engine_dict.ResourceDict.FontSet e mapeia os índices usados em StyleRun.RunArray[*].StyleSheet.StyleSheetData.Font.
+    Com ``table`` o FontSet é resolvido na tabela do documento (uma vez por FontSet distinto).
     """
-    names: Set[str] = set()
-
     # psd-tools expõe dicionários prontos
     engine = getattr(layer, "engine_dict", None) or {}
     # algumas versões também expõem resource_dict separado
-    resource_dict = engine.get("ResourceDict") or getattr(layer, "resource_dict", {}) or {}
-
-    font_set = resource_dict.get("FontSet", []) or []
-    style_run = engine.get("StyleRun") or {}
-    runs = style_run.get("RunArray", []) or []
-
-    # quando não há runs, alguns PSDs guardam o estilo em "StyleSheetSet"
-    if not runs:
-        style_sheet_set = engine.get("StyleSheetSet") or {}
-        # ainda assim, o índice costuma estar na própria camada de texto; tentamos pegar de StyleSheetData
-        single_idx = _safe_get(style_sheet_set, "StyleSheetData", "Font")
-        if isinstance(single_idx, int) and 0 <= single_idx < len(font_set):
-            names.add(_font_name_from_fontset_entry(font_set[single_idx]))
-
-    for r in runs:
-        idx = _safe_get(r, "StyleSheet", "StyleSheetData", "Font")
-        if isinstance(idx, int) and 0 <= idx < len(font_set):
-            entry = font_set[idx]
-            name = _font_name_from_fontset_entry(entry)
-            if name:
-                names.add(name)
-
-    return sorted(names)
+    resource_dict = getattr(layer, "resource_dict", {})
+    if table is None:
+        return engine_data.fonts_from_engine_dicts(engine, resource_dict)
+    return table.lookup(table.used_font_ids(engine, resource_dict))
+
+def layer_entry(name: str, table: DocumentFontTable, font_ids) -> Dict[str, Any]:
+    """Entrada de ``per_layer``: nomes ordenados e os índices na tabela do documento"""
+    font_ids = sorted(set(font_ids), key=lambda font_id: table.names[font_id])
+    return {
+        "layer_name": name,
+        "fonts": table.lookup(font_ids),
+        "font_ids": font_ids
+    }
+
+def extract_fonts_native(psd_path: str):
+    """
+    Mesmo resultado de extract_fonts_psd_tools sem montar o PSDImage:
+    percorre o índice de camadas e lê só FontSet/StyleRun do TySh de cada camada de texto.
+    Retorna (fontes, camadas, tabela de fontes do documento); as camadas apontam
+    para a tabela por índice ("font_ids").
+    """
+    all_fonts: Set[str] = set()
+    per_layer: List[Dict[str, Any]] = []
+    table = DocumentFontTable()
+
+    with open(psd_path, "rb") as f:
+        index = psd_sections.read_layer_index(f)
+    tree = psd_sections.build_layer_tree(index.layers)
+
+    with psd_sections.map_file(psd_path) as mm:
+        # views sobre o mmap: o payload do TySh não é copiado
+        tysh = psd_sections.layer_block_views(mm, "TySh")
+        # mesma ordem de psd.descendants()
+        for record, _path in psd_sections.iter_layer_paths(tree):
+            if record.kind != "type":
+                continue
+            tables = engine_data.read_engine_tables(tysh[record.index].view)
+            entry = layer_entry(record.name, table, table.used_font_ids(tables.engine_dict, tables.resource_dict))
+            per_layer.append(entry)
+            all_fonts.update(entry["fonts"])
+
+    return sorted(all_fonts), per_layer, table.font_list()
 
 def extract_fonts(psd_path: str):
-    psd = PSDImage.open(psd_path)
+    """Leitor nativo primeiro; psd-tools como fallback para arquivos que ele não entende."""
+    try:
+        return extract_fonts_native(psd_path)
+    except ValueError:
+        if PSDImage is None:
+            raise
+    return extract_fonts_psd_tools(psd_path)
+
+def extract_fonts_psd_tools(psd_path: str):
+    psd = psd_metadata.open_metadata(psd_path)
     all_fonts: Set[str] = set()
     per_layer: List[Dict[str, Any]] = []
+    table = DocumentFontTable()
 
     for layer in psd.descendants():
         # só camadas de texto
         if getattr(layer, "kind", None) == "type":
-            layer_fonts = fonts_from_text_layer(layer)
+            layer_fonts = fonts_from_text_layer(layer, table)
             # fallback extra (quando o engine_dict é muito pobre)
             if not layer_fonts:
                 # alguns PSDs permitem pegar família/peso do "text_data" do psd-tools
@@ -89,28 +119,87 @@ def extract_fonts(psd_path: str):
                 except Exception:
                     pass
 
-            per_layer.append({
-                "layer_name": layer.name,
-                "fonts": sorted(set(layer_fonts))
-            })
-            for n in layer_fonts:
-                all_fonts.add(n)
+            entry = layer_entry(layer.name, table, [table.intern(n) for n in layer_fonts])
+            per_layer.append(entry)
+            all_fonts.update(entry["fonts"])
+
+    return sorted(all_fonts), per_layer, table.font_list()
 
-    return sorted(all_fonts), per_layer
+def document_fonts_from_txt2(f, file_size: Optional[int] = None) -> Optional[List[str]]:
+    """
+    Fontes usadas no documento segundo o bloco global Txt2 (FontSet do documento
+    + StyleRuns de cada objeto de texto), sem visitar nenhuma camada.
+    Retorna None quando o arquivo não tem Txt2 (PSDs antigos) ou ele é inválido.
+    file_size como em psd_sections.find_global_block (UNKNOWN_SIZE para uploads
+    que ainda estão chegando).
+    """
+    block = psd_sections.find_global_block(f, "Txt2", file_size)
+    if block is None:
+        return None
+    try:
+        return engine_data.read_txt2_fonts(psd_sections.read_block(f, block)).fonts
+    except ValueError:
+        return None
+
+def extract_document_fonts(psd_path: str) -> List[str]:
+    """
+    Só a lista de fontes do documento: caminho rápido pelo Txt2; sem Txt2,
+    cai para extract_fonts (resolução por camada).
+    """
+    try:
+        with open(psd_path, "rb") as f:
+            fonts = document_fonts_from_txt2(f)
+    except ValueError:
+        fonts = None
+    if fonts is not None:
+        return fonts
+    return extract_fonts(psd_path)[0]
+
+def extract_fonts_cached(psd_path: str, cache=None, refresh: bool = False):
+    """
+    extract_fonts com cache persistente (psd_cache): um arquivo já analisado
+    é respondido sem abrir o PSD. Sem cache, equivale a extract_fonts.
+    """
+    if cache is None:
+        return extract_fonts(psd_path)
+    result = cache.cached(
+        psd_path, CACHE_EXTRACTOR, CACHE_VERSION,
+        lambda p: list(extract_fonts(p)), refresh=refresh
+    )
+    all_fonts, per_layer, font_table = result
+    return all_fonts, per_layer, font_table
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("psd", help="Caminho do arquivo .psd ou .psb")
     ap.add_argument("--json", action="store_true", help="Imprimir resultado em JSON")
+    ap.add_argument("--no-cache", action="store_true", help="Não usar o cache de resultados")
+    ap.add_argument("--refresh", action="store_true", help="Reprocessar e substituir o resultado em cache")
+    ap.add_argument("--cache-dir", default=psd_cache.DEFAULT_CACHE_DIR, help="Pasta do cache de resultados")
+    ap.add_argument("--fonts-only", action="store_true",
+                    help="Só as fontes do documento, pelo Txt2 global (sem resolver por camada)")
     args = ap.parse_args()
 
-    all_fonts, per_layer = extract_fonts(args.psd)
+    if args.fonts_only:
+        all_fonts = extract_document_fonts(args.psd)
+        if args.json:
+            print(json.dumps({"file": args.psd, "fonts": all_fonts}, ensure_ascii=False, indent=2))
+        else:
+            print(f"Arquivo: {args.psd}")
+            print("Fontes únicas encontradas:")
+            for f in all_fonts:
+                print("  -", f)
+        return
+
+    cache = None if args.no_cache else psd_cache.get_cache(args.cache_dir)
+    all_fonts, per_layer, font_table = extract_fonts_cached(args.psd, cache, args.refresh)
 
     if args.json:
         print(json.dumps({
             "file": args.psd,
             "fonts": all_fonts,
             "layers": per_layer,
+            "font_table": font_table,
         }, ensure_ascii=False, indent=2))
     else:
         print(f"Arquivo: {args.psd}")
@@ -4,127 +4,860 @@ API REST para extração de fontes de PSDs
 Integração com frontend Angular
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import tempfile
 import json
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from contextlib import contextmanager
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import BadRequest, HTTPException, RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+from werkzeug.wsgi import get_input_stream
 import uuid
 from datetime import datetime
 
 # Importa nossa função de extração
 import scan_fonts_binary
+import psd_cache
+import psd_executor
+import psd_jobs
+import psd_metrics
+import psd_sections
+import psd_stream
+import psd_tasks
 
 app = Flask(__name__)
 CORS(app)  # Permite requisições do Angular
 
 # Configurações
-UPLOAD_FOLDER = tempfile.mkdtemp()
+# Só recebe uploads maiores que SPOOL_MAX_MEMORY. Os processos do executor
+# reimportam este script como __mp_main__ e não recebem uploads
+UPLOAD_FOLDER = tempfile.mkdtemp() if __name__ != '__mp_main__' else None
 ALLOWED_EXTENSIONS = {'psd', 'psb'}
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_FILE_SIZE = int(os.environ.get('PSD_MAX_FILE_SIZE', 50 * 1024 * 1024))  # 50MB
+SCAN_CHUNK_SIZE = scan_fonts_binary.DEFAULT_CHUNK_SIZE  # leitura em blocos: memória limitada por requisição
+# Uploads até este tamanho ficam em memória; acima disso o spool vai para disco
+SPOOL_MAX_MEMORY = int(os.environ.get('PSD_SPOOL_MAX_MEMORY', psd_stream.DEFAULT_MAX_MEMORY))
+UPLOAD_READ_SIZE = 256 * 1024  # bytes lidos do request.stream por vez
+
+# Como /api/analyze-psd obtém fonts_found: 'binary_scan' (padrão) varre o
+# arquivo; 'txt2' lê só o bloco global Txt2 (cai para a varredura binária em
+# PSDs sem Txt2) e devolve só as fontes usadas pelos textos do documento
+FONTS_METHODS = ('txt2', 'binary_scan')
+FONTS_METHOD = os.environ.get('PSD_FONTS_METHOD', 'binary_scan')
+
+# Cache persistente de resultados (SQLite); PSD_CACHE_DISABLED=1 desliga
+RESULT_CACHE = psd_tasks.result_cache()
+
+# Onde roda o trabalho de CPU da extração (parse do Txt2, varredura dos
+# metadados): 'inline' na thread da requisição, 'thread' num pool de threads
+# (disputa o GIL) ou 'process' num pool de processos pré-carregados
+EXECUTOR_KIND = os.environ.get('PSD_EXECUTOR', psd_executor.PROCESS)
+EXECUTOR_WORKERS = int(os.environ.get('PSD_EXECUTOR_WORKERS', os.cpu_count() or 1))
+# Processo do pool é trocado depois de tantas tarefas (0 = nunca)
+MAX_TASKS_PER_CHILD = int(os.environ.get('PSD_MAX_TASKS_PER_CHILD', 1000)) or None
+# Limite por tarefa em segundos (0 = sem limite); a requisição responde 504
+TASK_TIMEOUT = float(os.environ.get('PSD_TASK_TIMEOUT', 60)) or None
+_executor = None
+_executor_lock = threading.Lock()
+
+# Jobs assíncronos (/api/jobs): pool de processos local, sem broker externo
+JOB_WORKERS = int(os.environ.get('PSD_JOB_WORKERS', psd_jobs.DEFAULT_WORKERS))
+JOB_TTL = float(os.environ.get('PSD_JOB_TTL', psd_jobs.DEFAULT_TTL))  # segundos que um resultado fica disponível
+JOB_MAX_PENDING = int(os.environ.get('PSD_JOB_MAX_PENDING', psd_jobs.DEFAULT_MAX_PENDING))
+JOB_TIMEOUT = float(os.environ.get('PSD_JOB_TIMEOUT', 3600)) or None  # por job; 0 = sem limite
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+# Lote (/api/analyze-batch): limite do corpo inteiro (MAX_FILE_SIZE vale por arquivo)
+# e quantos arquivos de um lote ficam gravados/na fila ao mesmo tempo
+MAX_BATCH_SIZE = int(os.environ.get('PSD_MAX_BATCH_SIZE', 2 * 1024 * 1024 * 1024))  # 2GB
+BATCH_IN_FLIGHT = max(1, min(2 * JOB_WORKERS, JOB_MAX_PENDING))
+ZIP_MIMETYPES = {'application/zip', 'application/x-zip-compressed'}
+# Erros de um membro de ZIP corrompido, cifrado ou com compressão não suportada
+ZIP_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
+# Métricas (GET /metrics, formato texto do Prometheus), só deste processo
+METRICS = psd_metrics.Registry()
+REQUESTS = METRICS.counter(
+    'psd_api_requests_total',
+    'Requisições por endpoint, status HTTP e código da resposta (OK ou o "code" do erro)',
+    ('endpoint', 'status', 'code')
+)
+REQUEST_SECONDS = METRICS.histogram(
+    'psd_api_request_duration_seconds', 'Tempo total das requisições', ('endpoint',)
+)
+STAGE_SECONDS = METRICS.histogram(
+    'psd_api_stage_duration_seconds',
+    'Tempo por etapa: receive (rede/membro do ZIP), spool_write, disk_write, probe, '
+    'txt2, binary_scan, fingerprint, cache_read, cache_write, serialize, cleanup; nos jobs, '
+    'queued e job (da criação ao fim)',
+    ('endpoint', 'stage')
+)
+BYTES_PROCESSED = METRICS.counter(
+    'psd_api_bytes_processed_total',
+    'Bytes de PSD/PSB recebidos para análise (membros de ZIP descomprimidos)',
+    ('endpoint',)
+)
+
 def allowed_file(filename):
     """Verifica se arquivo é PSD/PSB válido"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _cache_stat(key):
+    """Coleta um valor de RESULT_CACHE.stats() (totais de todos os processos do cache)"""
+    return lambda: [({}, RESULT_CACHE.stats()[key])] if RESULT_CACHE else []
+
+def _pools():
+    """(nome, executor) dos pools já criados"""
+    pools = []
+    if _executor is not None:
+        pools.append(('requests', _executor))
+    if _job_manager is not None:
+        pools.append(('jobs', _job_manager.executor))
+    return pools
+
+def _pool_stat(value):
+    """Coleta value(stats) de cada pool, com o label pool"""
+    return lambda: [({'pool': name}, value(executor.stats())) for name, executor in _pools()]
+
+def _pool_tasks():
+    for name, executor in _pools():
+        stats = executor.stats()
+        for outcome in ('completed', 'failed', 'timed_out'):
+            yield {'pool': name, 'outcome': outcome}, stats[outcome]
+
+def _job_counts():
+    if _job_manager is None:
+        return []
+    stats = _job_manager.stats()
+    return [({'status': status}, stats[status]) for status in
+            (psd_jobs.QUEUED, psd_jobs.RUNNING, psd_jobs.DONE, psd_jobs.FAILED)]
+
+METRICS.collected('psd_api_cache_hits_total', 'Consultas ao cache com resultado', 'counter', _cache_stat('total_hits'))
+METRICS.collected('psd_api_cache_misses_total', 'Consultas ao cache sem resultado', 'counter', _cache_stat('total_misses'))
+METRICS.collected('psd_api_cache_hit_ratio', 'hits / (hits + misses) do cache', 'gauge', _cache_stat('hit_ratio'))
+METRICS.collected('psd_api_cache_entries', 'Resultados guardados no cache', 'gauge', _cache_stat('entries'))
+METRICS.collected('psd_api_cache_bytes', 'Bytes guardados no cache', 'gauge', _cache_stat('bytes'))
+METRICS.collected('psd_api_pool_workers', 'Workers de cada pool', 'gauge', _pool_stat(lambda s: s['workers']))
+METRICS.collected(
+    'psd_api_pool_busy_workers', 'Workers ocupados com uma tarefa', 'gauge',
+    _pool_stat(lambda s: min(s['in_flight'], s['workers']))
+)
+METRICS.collected(
+    'psd_api_pool_queue_depth', 'Tarefas esperando um worker livre', 'gauge',
+    _pool_stat(lambda s: max(0, s['in_flight'] - s['workers']))
+)
+METRICS.collected('psd_api_pool_tasks_total', 'Tarefas terminadas por resultado', 'counter', _pool_tasks)
+METRICS.collected('psd_api_pool_recycled_total', 'Trocas do pool de processos', 'counter', _pool_stat(lambda s: s['recycled']))
+METRICS.collected('psd_api_jobs', 'Jobs por status (finalizados ficam até expirar)', 'gauge', _job_counts)
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+class StageTimer:
+    """
+    Tempo das etapas de uma requisição em STAGE_SECONDS. Com um upload
+    (SpooledUpload), o tempo de receber e gravar no spool que uma etapa
+    provocar sai dela e vai para 'receive' e 'spool_write' (em finish)
+    """
+    
+    def __init__(self, upload=None):
+        self.endpoint = _endpoint()  # guardado: observe pode rodar fora da requisição
+        self.upload = upload
+    
+    def _io_time(self):
+        return self.upload.receive_time + self.upload.write_time if self.upload else 0.0
+    
+    def observe(self, stage, seconds):
+        STAGE_SECONDS.observe(seconds, endpoint=self.endpoint, stage=stage)
+    
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        io_start = self._io_time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start - (self._io_time() - io_start))
+    
+    def finish(self):
+        """Registra receive/spool_write e os bytes recebidos do upload"""
+        if self.upload:
+            self.observe('receive', self.upload.receive_time)
+            self.observe('spool_write', self.upload.write_time)
+            BYTES_PROCESSED.inc(self.upload.received, endpoint=self.endpoint)
+
+def task_executor():
+    """
+    Executor das chamadas de extração das requisições, criado no primeiro uso
+    com todos os processos já iniciados
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = psd_executor.TaskExecutor(
+                EXECUTOR_KIND, EXECUTOR_WORKERS, MAX_TASKS_PER_CHILD, TASK_TIMEOUT,
+                preload=psd_tasks.PRELOAD_MODULES
+            )
+            _executor.warm()
+        return _executor
+
+def fonts_from_txt2(upload):
+    """
+    Fontes do documento pelo Txt2 global; None se não houver Txt2 utilizável.
+    O bloco é lido aqui, conforme chega; o parse roda no executor
+    """
+    try:
+        block = psd_sections.find_global_block(upload, 'Txt2', psd_sections.UNKNOWN_SIZE)
+        if block is None:
+            return None
+        data = psd_sections.read_block(upload, block)
+    except ValueError:
+        return None
+    return task_executor().run(psd_tasks.txt2_fonts, data)
+
+def _scan_pieces(pieces):
+    """
+    Varre os pedaços no executor, em tarefas de ~SCAN_CHUNK_SIZE bytes, com
+    no máximo uma tarefa por worker em voo (a memória fica limitada)
+    """
+    executor = task_executor()
+    fonts = set()
+    pending = deque()
+    batch, batch_size = [], 0
+    for piece in pieces:
+        batch.append(piece)
+        batch_size += len(piece)
+        if batch_size >= SCAN_CHUNK_SIZE:
+            if len(pending) >= executor.workers:
+                fonts.update(executor.result(pending.popleft()))
+            pending.append(executor.submit(scan_fonts_binary.scan_pieces, batch))
+            batch, batch_size = [], 0
+    if batch:
+        pending.append(executor.submit(scan_fonts_binary.scan_pieces, batch))
+    for future in pending:
+        fonts.update(executor.result(future))
+    return sorted(fonts)
+
+def scan_upload(upload):
+    """
+    Varredura binária (mesmo resultado de scan_fonts_binary.scan_stream_for_fonts):
+    os metadados são lidos aqui conforme chegam, pulando os pixels, e varridos
+    no executor enquanto o resto do upload ainda chega
+    """
+    try:
+        spans = psd_sections.iter_metadata_spans(upload, psd_sections.UNKNOWN_SIZE)
+        return _scan_pieces(scan_fonts_binary.iter_span_pieces(upload, spans, SCAN_CHUNK_SIZE))
+    except ValueError:
+        # Estrutura ilegível: varre o arquivo inteiro
+        whole = [(0, psd_sections.UNKNOWN_SIZE)]
+        return _scan_pieces(scan_fonts_binary.iter_span_pieces(upload, whole, SCAN_CHUNK_SIZE))
+
+def _multipart_events(stream, boundary):
+    """Eventos do corpo multipart/form-data, decodificado conforme chega"""
+    # o buffer só guarda o que sobra de uma leitura (cabeçalhos, fronteira parcial)
+    decoder = MultipartDecoder(boundary, max_form_memory_size=2 * UPLOAD_READ_SIZE)
+    while True:
+        try:
+            event = decoder.next_event()
+        except ValueError as e:
+            raise BadRequest(f'multipart/form-data inválido: {str(e)}')
+        if isinstance(event, NeedData):
+            decoder.receive_data(stream.read(UPLOAD_READ_SIZE) or None)
+        elif isinstance(event, Epilogue):
+            return
+        else:
+            yield event
+
+def _file_chunks(events):
+    """Bytes da parte de arquivo atual, até o fim dela"""
+    for event in events:
+        if isinstance(event, Data):
+            if event.data:
+                yield event.data
+            if not event.more_data:
+                return
+
+def iter_upload_parts(stream):
+    """
+    (campo, nome, iterador de blocos) de cada arquivo de um corpo
+    multipart/form-data, na ordem em que chegam. Os blocos de um arquivo não
+    consumidos são descartados ao pedir o próximo; campos sem arquivo são ignorados.
+    Sem multipart (ou sem boundary) não gera nada.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    if mimetype != 'multipart/form-data' or not options.get('boundary'):
+        return
+    events = _multipart_events(stream, options['boundary'].encode('latin-1'))
+    for event in events:
+        if isinstance(event, File):
+            yield event.name, event.filename or '', _file_chunks(events)
+
+def open_upload(field='file'):
+    """
+    Abre o arquivo enviado direto do request.stream, sem request.files (que
+    grava o corpo inteiro antes de devolver o controle).
+    Aceita multipart/form-data (campo ``field``) ou o arquivo cru como
+    application/octet-stream com ?filename=.
+    Retorna (nome, iterador de blocos); (None, None) se não houver arquivo.
+    """
+    stream = request.stream
+    if request.mimetype == 'application/octet-stream':
+        return request.args.get('filename', ''), iter(lambda: stream.read(UPLOAD_READ_SIZE), b'')
+    for name, filename, chunks in iter_upload_parts(stream):
+        # Outros arquivos antes do nosso são ignorados
+        if name == field:
+            return filename, chunks
+    return None, None
+
+def spool_upload(chunks):
+    """Upload como arquivo com seek: em memória até SPOOL_MAX_MEMORY, depois em disco"""
+    return psd_stream.SpooledUpload(chunks, SPOOL_MAX_MEMORY, dir=UPLOAD_FOLDER)
+
+def http_error(e):
+    """Resposta JSON para erros HTTP do werkzeug (413, corpo malformado, cliente caiu)"""
+    code = 'FILE_TOO_LARGE' if isinstance(e, RequestEntityTooLarge) else 'BAD_REQUEST'
+    return jsonify({
+        'error': e.description,
+        'code': code
+    }), e.code
+
+def method_error(method):
+    """Resposta 400 se ?method= não for um de FONTS_METHODS; None se ok"""
+    if method not in FONTS_METHODS:
+        return jsonify({
+            'error': f'Método inválido. Use: {", ".join(FONTS_METHODS)}',
+            'code': 'INVALID_METHOD'
+        }), 400
+    return None
+
+def upload_error(filename):
+    """Resposta 400 para upload sem arquivo, sem nome ou com extensão errada; None se ok"""
+    # Verifica se arquivo foi enviado
+    if filename is None:
+        return jsonify({
+            'error': 'Nenhum arquivo enviado',
+            'code': 'NO_FILE'
+        }), 400
+    
+    # Verifica se arquivo foi selecionado
+    if filename == '':
+        return jsonify({
+            'error': 'Nenhum arquivo selecionado',
+            'code': 'EMPTY_FILENAME'
+        }), 400
+    
+    # Verifica extensão
+    if not allowed_file(filename):
+        return jsonify({
+            'error': 'Tipo de arquivo não suportado. Use .psd ou .psb',
+            'code': 'INVALID_FILE_TYPE'
+        }), 400
+    return None
+
+def job_manager():
+    """
+    Pool de jobs, criado no primeiro uso: executor próprio (jobs longos não
+    ocupam os workers das requisições síncronas), nunca inline
+    """
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            kind = psd_executor.THREAD if EXECUTOR_KIND == psd_executor.INLINE else EXECUTOR_KIND
+            executor = psd_executor.TaskExecutor(
+                kind, JOB_WORKERS, MAX_TASKS_PER_CHILD, JOB_TIMEOUT,
+                preload=psd_tasks.PRELOAD_MODULES
+            )
+            _job_manager = psd_jobs.JobManager(executor, JOB_TTL, JOB_MAX_PENDING)
+        return _job_manager
+
+class UploadTooLarge(Exception):
+    """Um arquivo passou de max_size (o corpo da requisição ainda pode continuar)"""
+
+def save_upload(chunks, path, max_size=None, timer=None):
+    """
+    Grava o upload em ``path`` bloco a bloco; UploadTooLarge se passar de max_size.
+    Com ``timer`` (StageTimer), registra as etapas receive e disk_write
+    """
+    size = 0
+    write_time = 0.0
+    start = time.perf_counter()
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise UploadTooLarge(f'Arquivo maior que {max_size / 1024 / 1024:g}MB')
+            write_start = time.perf_counter()
+            f.write(chunk)
+            write_time += time.perf_counter() - write_start
+    if timer:
+        timer.observe('receive', time.perf_counter() - start - write_time)
+        timer.observe('disk_write', write_time)
+    return size
+
+def queue_upload(chunks, filename, method, refresh=False, max_size=None):
+    """
+    Grava o upload em UPLOAD_FOLDER, confere que é PSD/PSB e enfileira
+    psd_tasks.analyze_file no pool; o arquivo some quando o job termina, com
+    sucesso ou não (ou na hora, se não chegar a ser enfileirado).
+    Retorna o Job. Levanta ValueError (não é PSD/PSB), psd_jobs.QueueFull
+    ou UploadTooLarge (maior que max_size)
+    """
+    file_id = str(uuid.uuid4())
+    file_ext = filename.rsplit('.', 1)[1].lower()
+    temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.{file_ext}")
+    timer = StageTimer()
+    
+    def job_done(job):
+        with timer.stage('cleanup'):
+            os.remove(temp_path)
+        if job.started:
+            timer.observe('queued', job.started - job.created)
+        timer.observe('job', job.finished - job.created)
+    
+    queued = False
+    try:
+        size = save_upload(chunks, temp_path, max_size, timer)
+        BYTES_PROCESSED.inc(size, endpoint=timer.endpoint)
+        with timer.stage('probe'):
+            psd_sections.probe_file(temp_path)
+        job = job_manager().submit(
+            psd_tasks.analyze_file, temp_path, filename, file_id, method, refresh,
+            on_done=job_done
+        )
+        queued = True
+        return job
+    finally:
+        if not queued and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def count_request(response):
+    """Conta a resposta em REQUESTS (pelo "code" do JSON de erro) e o tempo em REQUEST_SECONDS"""
+    endpoint = _endpoint()
+    if response.status_code < 400:
+        code = 'OK'
+    else:
+        body = response.get_json(silent=True) if response.is_json else None
+        code = body.get('code') if isinstance(body, dict) and body.get('code') else f'HTTP_{response.status_code}'
+    REQUESTS.inc(endpoint=endpoint, status=str(response.status_code), code=code)
+    if 'request_start' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas deste processo no formato texto do Prometheus"""
+    return METRICS.render(), 200, {'Content-Type': psd_metrics.CONTENT_TYPE}
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check da API"""
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'cache': RESULT_CACHE.stats() if RESULT_CACHE else None,
+        'executor': _executor.stats() if _executor else None,
+        'jobs': _job_manager.stats() if _job_manager else None
     })
 
 @app.route('/api/analyze-psd', methods=['POST'])
 def analyze_psd():
     """
-    Endpoint principal: recebe PSD e retorna fontes
+    Endpoint principal: recebe PSD e retorna fontes.
+    O upload é analisado enquanto chega (sem gravar arquivo temporário): as
+    fontes ficam prontas quando o último byte é recebido
     """
     try:
-        # Verifica se arquivo foi enviado
-        if 'file' not in request.files:
-            return jsonify({
-                'error': 'Nenhum arquivo enviado',
-                'code': 'NO_FILE'
-            }), 400
+        # ?method=txt2|binary_scan escolhe o caminho de extração
+        method = request.args.get('method', FONTS_METHOD)
+        error = method_error(method)
+        if error:
+            return error
         
-        file = request.files['file']
+        filename, chunks = open_upload('file')
+        error = upload_error(filename)
+        if error:
+            return error
         
-        # Verifica se arquivo foi selecionado
-        if file.filename == '':
-            return jsonify({
-                'error': 'Nenhum arquivo selecionado',
-                'code': 'EMPTY_FILENAME'
-            }), 400
+        upload = spool_upload(chunks)
+        timer = StageTimer(upload)
+        try:
+            # Rejeita arquivos que não são PSD/PSB lendo só os primeiros bytes
+            try:
+                with timer.stage('probe'):
+                    summary = psd_sections.probe(upload, psd_sections.UNKNOWN_SIZE)
+            except ValueError as e:
+                return jsonify({
+                    'error': f'Arquivo PSD/PSB inválido: {str(e)}',
+                    'code': 'INVALID_PSD'
+                }), 400
+            
+            file_id = str(uuid.uuid4())
+            filename = secure_filename(filename)
+            
+            try:
+                # Caminho rápido: só o Txt2 global, sem visitar camadas
+                fonts = None
+                if method == 'txt2':
+                    with timer.stage('txt2'):
+                        fonts = fonts_from_txt2(upload)
+                if fonts is None:
+                    # Varre os metadados conforme chegam, pulando os pixels
+                    method = 'binary_scan'
+                    with timer.stage('binary_scan'):
+                        fonts = scan_upload(upload)
+                
+                # Recebe o resto (dados de imagem) só para saber o tamanho
+                file_size = upload.drain()
+                # identifica uploads repetidos lendo só os metadados (do spool)
+                with timer.stage('fingerprint'):
+                    fingerprint = psd_cache.stream_fingerprint(upload, file_size)
+                if RESULT_CACHE and method == 'binary_scan':
+                    # A varredura acontece durante o upload, então o cache (que
+                    # precisa do arquivo inteiro) só é consultado depois dela:
+                    # um acerto devolve o mesmo resultado da CLI, do batch e dos
+                    # jobs; ?refresh=1 grava a varredura nova no lugar
+                    extractor = scan_fonts_binary.CACHE_EXTRACTOR
+                    version = scan_fonts_binary.cache_version(sections_only=True)
+                    cached = None
+                    if request.args.get('refresh') != '1':
+                        with timer.stage('cache_read'):
+                            cached = RESULT_CACHE.get(fingerprint, extractor, version)
+                    if cached is not None:
+                        fonts = cached
+                    else:
+                        with timer.stage('cache_write'):
+                            RESULT_CACHE.put(fingerprint, extractor, version, fonts)
+                
+                # Resultado da análise
+                with timer.stage('serialize'):
+                    return jsonify(psd_tasks.analysis_result(
+                        filename, file_id, summary, fonts, method, file_size, fingerprint,
+                        spooled_to_disk=upload.on_disk, executor=EXECUTOR_KIND
+                    ))
+                
+            except HTTPException:
+                raise
+            except psd_executor.TaskTimeout:
+                return jsonify({
+                    'error': f'Análise passou de {TASK_TIMEOUT:g}s',
+                    'code': 'ANALYSIS_TIMEOUT'
+                }), 504
+            except Exception as e:
+                return jsonify({
+                    'error': f'Erro ao analisar arquivo: {str(e)}',
+                    'code': 'ANALYSIS_ERROR'
+                }), 500
+        finally:
+            # some com o spool (e o arquivo temporário, se foi para disco)
+            with timer.stage('cleanup'):
+                upload.close()
+            timer.finish()
+                
+    except HTTPException as e:
+        return http_error(e)
+    except Exception as e:
+        return jsonify({
+            'error': f'Erro interno: {str(e)}',
+            'code': 'INTERNAL_ERROR'
+        }), 500
+
+@app.route('/api/probe-psd', methods=['POST'])
+def probe_psd():
+    """
+    Endpoint barato: dimensões, modo de cor, profundidade, PSD/PSB, número
+    de layers e presença de texto, lendo só o início do upload
+    """
+    try:
+        filename, chunks = open_upload('file')
+    except HTTPException as e:
+        return http_error(e)
+    if not filename:
+        return jsonify({
+            'error': 'Nenhum arquivo enviado',
+            'code': 'NO_FILE'
+        }), 400
+    
+    if not allowed_file(filename):
+        return jsonify({
+            'error': 'Tipo de arquivo não suportado. Use .psd ou .psb',
+            'code': 'INVALID_FILE_TYPE'
+        }), 400
+    
+    upload = spool_upload(chunks)
+    timer = StageTimer(upload)
+    try:
+        with timer.stage('probe'):
+            summary = psd_sections.probe(upload, psd_sections.UNKNOWN_SIZE)
+    except ValueError as e:
+        return jsonify({
+            'error': f'Arquivo PSD/PSB inválido: {str(e)}',
+            'code': 'INVALID_PSD'
+        }), 400
+    except HTTPException as e:
+        return http_error(e)
+    finally:
+        with timer.stage('cleanup'):
+            upload.close()
+        timer.finish()
+    
+    return jsonify({
+        'success': True,
+        'original_name': secure_filename(filename),
+        'psd': summary.as_dict()
+    })
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    Versão assíncrona de /api/analyze-psd para arquivos grandes: grava o
+    upload, enfileira a análise no pool de processos e responde na hora
+    (202) com o id do job; o resultado sai em GET /api/jobs/<id>
+    """
+    try:
+        method = request.args.get('method', FONTS_METHOD)
+        error = method_error(method)
+        if error:
+            return error
         
-        # Verifica extensão
-        if not allowed_file(file.filename):
+        filename, chunks = open_upload('file')
+        error = upload_error(filename)
+        if error:
+            return error
+        
+        try:
+            job = queue_upload(
+                chunks, secure_filename(filename), method, request.args.get('refresh') == '1'
+            )
+        except ValueError as e:
             return jsonify({
-                'error': 'Tipo de arquivo não suportado. Use .psd ou .psb',
-                'code': 'INVALID_FILE_TYPE'
+                'error': f'Arquivo PSD/PSB inválido: {str(e)}',
+                'code': 'INVALID_PSD'
             }), 400
+        except psd_jobs.QueueFull:
+            return jsonify({
+                'error': 'Fila de jobs cheia, tente novamente mais tarde',
+                'code': 'QUEUE_FULL'
+            }), 503
         
-        # Gera nome único para o arquivo
-        file_id = str(uuid.uuid4())
-        filename = secure_filename(file.filename)
-        file_ext = filename.rsplit('.', 1)[1].lower()
-        temp_filename = f"{file_id}.{file_ext}"
-        temp_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-        
-        # Salva arquivo temporariamente
-        file.save(temp_path)
+        response = jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}'
+        })
+        response.headers['Location'] = f'/api/jobs/{job.id}'
+        return response, 202
         
+    except HTTPException as e:
+        return http_error(e)
+    except Exception as e:
+        return jsonify({
+            'error': f'Erro interno: {str(e)}',
+            'code': 'INTERNAL_ERROR'
+        }), 500
+
+def _zip_member_chunks(archive, info):
+    """Bytes de um membro do ZIP, descomprimidos bloco a bloco"""
+    with archive.open(info) as member:
+        yield from iter(lambda: member.read(UPLOAD_READ_SIZE), b'')
+
+def iter_zip_members(path):
+    """
+    (nome, iterador de blocos) de cada arquivo de um ZIP gravado em ``path``,
+    um membro por vez (nada é extraído além do membro atual); diretórios e
+    resource forks do macOS (__MACOSX/, ._*) são pulados
+    """
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('._'):
+                continue
+            yield name, _zip_member_chunks(archive, info)
+
+def batch_error(name, code, error):
+    return {
+        'success': False,
+        'original_name': secure_filename(name),
+        'error': error,
+        'code': code
+    }
+
+class BatchRun:
+    """
+    Arquivos de um lote: cada PSD é gravado e enfileirado no pool de jobs
+    assim que chega, com no máximo BATCH_IN_FLIGHT gravados/na fila por vez
+    (quem envia espera o pool liberar espaço, então disco e memória ficam limitados)
+    """
+    
+    def __init__(self, method, refresh):
+        self.method = method
+        self.refresh = refresh
+        self.entries = []  # (nome, Job) ou dict de erro, na ordem de chegada
+        self.skipped = []  # nomes que não são .psd/.psb
+        self._in_flight = deque()
+    
+    def add(self, name, chunks):
+        if not allowed_file(name):
+            self.skipped.append(name)
+            return
+        while len(self._in_flight) >= BATCH_IN_FLIGHT:
+            self._in_flight.popleft().wait()
         try:
-            # Executa análise de fontes
-            fonts = scan_fonts_binary.scan_file_for_fonts(temp_path)
-            
-            # Informações do arquivo
-            file_size = os.path.getsize(temp_path)
-            
-            # Resultado da análise
-            result = {
-                'success': True,
-                'file_info': {
-                    'original_name': filename,
-                    'file_id': file_id,
-                    'size_bytes': file_size,
-                    'size_mb': round(file_size / 1024 / 1024, 2)
-                },
-                'analysis': {
-                    'fonts_found': fonts,
-                    'total_fonts': len(fonts),
-                    'timestamp': datetime.now().isoformat()
-                },
-                'metadata': {
-                    'method': 'binary_scan',
-                    'version': '1.0.0'
-                }
-            }
-            
-            return jsonify(result)
-            
-        except Exception as e:
-            return jsonify({
-                'error': f'Erro ao analisar arquivo: {str(e)}',
-                'code': 'ANALYSIS_ERROR'
-            }), 500
-            
+            job = queue_upload(
+                chunks, secure_filename(name), self.method, self.refresh, MAX_FILE_SIZE
+            )
+        except ValueError as e:
+            self.entries.append(batch_error(name, 'INVALID_PSD', f'Arquivo PSD/PSB inválido: {str(e)}'))
+        except UploadTooLarge as e:
+            self.entries.append(batch_error(name, 'FILE_TOO_LARGE', str(e)))
+        except psd_jobs.QueueFull:
+            self.entries.append(batch_error(name, 'QUEUE_FULL', 'Fila de jobs cheia, tente novamente mais tarde'))
+        except ZIP_ERRORS as e:
+            self.entries.append(batch_error(name, 'INVALID_ZIP', f'Membro do ZIP ilegível: {str(e)}'))
+        else:
+            self.entries.append((name, job))
+            self._in_flight.append(job)
+    
+    def add_zip(self, name, chunks):
+        """Grava o ZIP (só ele, sem extrair) e adiciona os membros um a um"""
+        zip_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}.zip")
+        timer = StageTimer()
+        try:
+            save_upload(chunks, zip_path, timer=timer)
+            for member_name, member_chunks in iter_zip_members(zip_path):
+                self.add(member_name, member_chunks)
+        except zipfile.BadZipFile as e:
+            self.entries.append(batch_error(name, 'INVALID_ZIP', f'ZIP inválido: {str(e)}'))
         finally:
-            # Remove arquivo temporário
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                
+            if os.path.exists(zip_path):
+                with timer.stage('cleanup'):
+                    os.remove(zip_path)
+    
+    def results(self):
+        """Espera os jobs e devolve o resultado de cada arquivo, na ordem de chegada"""
+        results = []
+        for entry in self.entries:
+            if isinstance(entry, dict):
+                results.append(entry)
+                continue
+            name, job = entry
+            job.wait()
+            if job.status == psd_jobs.DONE:
+                results.append(job.result)
+            else:
+                results.append(batch_error(
+                    name, 'ANALYSIS_ERROR', f'Erro ao analisar arquivo: {job.error}'
+                ))
+        return results
+
+def font_inventory(results):
+    """Inventário somado do lote: para cada fonte, os arquivos que a usam"""
+    files_by_font = {}
+    for result in results:
+        if result.get('success'):
+            for font in result['analysis']['fonts_found']:
+                files_by_font.setdefault(font, []).append(result['file_info']['original_name'])
+    return [
+        {'font': font, 'file_count': len(files), 'files': files}
+        for font, files in sorted(files_by_font.items())
+    ]
+
+@app.route('/api/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """
+    Vários PSDs numa requisição: multipart com vários arquivos (qualquer nome
+    de campo, ZIPs incluídos) ou um ZIP cru (application/zip, ?filename=).
+    Cada PSD vai para o pool de processos assim que termina de chegar; a
+    resposta traz o resultado de cada arquivo e o inventário de fontes do lote
+    """
+    try:
+        method = request.args.get('method', FONTS_METHOD)
+        error = method_error(method)
+        if error:
+            return error
+        
+        # Limite próprio do lote: request.stream aplicaria MAX_CONTENT_LENGTH
+        stream = get_input_stream(request.environ, max_content_length=MAX_BATCH_SIZE)
+        batch = BatchRun(method, request.args.get('refresh') == '1')
+        if request.mimetype in ZIP_MIMETYPES:
+            batch.add_zip(
+                request.args.get('filename', 'upload.zip'),
+                iter(lambda: stream.read(UPLOAD_READ_SIZE), b'')
+            )
+        else:
+            for _field, filename, chunks in iter_upload_parts(stream):
+                if filename.lower().endswith('.zip'):
+                    batch.add_zip(filename, chunks)
+                elif filename:
+                    batch.add(filename, chunks)
+        
+        if not batch.entries and not batch.skipped:
+            return jsonify({
+                'error': 'Nenhum arquivo enviado',
+                'code': 'NO_FILE'
+            }), 400
+        
+        results = batch.results()
+        inventory = font_inventory(results)
+        analyzed = sum(1 for result in results if result.get('success'))
+        return jsonify({
+            'success': True,
+            'files': results,
+            'skipped': batch.skipped,
+            'fonts': [item['font'] for item in inventory],
+            'font_inventory': inventory,
+            'summary': {
+                'total_files': len(results),
+                'analyzed': analyzed,
+                'failed': len(results) - analyzed,
+                'skipped': len(batch.skipped)
+            },
+            'metadata': {
+                'method': method,
+                'version': '1.0.0'
+            }
+        })
+        
+    except HTTPException as e:
+        return http_error(e)
     except Exception as e:
         return jsonify({
             'error': f'Erro interno: {str(e)}',
             'code': 'INTERNAL_ERROR'
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status, progresso (0 a 1) e, quando pronto, o resultado de um job"""
+    job = job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'error': 'Job não encontrado ou expirado',
+            'code': 'JOB_NOT_FOUND'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job.as_dict(JOB_TTL)
+    })
+
 @app.route('/api/supported-formats', methods=['GET'])
 def supported_formats():
     """Retorna formatos suportados"""
@@ -149,9 +882,15 @@ if __name__ == '__main__':
     print(f"[INFO] Pasta de upload temporaria: {UPLOAD_FOLDER}")
     print(f"[INFO] Tamanho maximo: {MAX_FILE_SIZE / 1024 / 1024}MB")
     print(f"[INFO] Formatos suportados: {ALLOWED_EXTENSIONS}")
+    print(f"[INFO] Uploads em memoria ate: {SPOOL_MAX_MEMORY / 1024 / 1024}MB")
+    print(f"[INFO] Cache de resultados: {RESULT_CACHE.path if RESULT_CACHE else 'desligado'}")
+    print(f"[INFO] Executor: {EXECUTOR_KIND} ({EXECUTOR_WORKERS} workers, limite de {TASK_TIMEOUT or 0:g}s por tarefa)")
     print("[INFO] Servidor rodando em: http://localhost:5000")
     print("[INFO] Health check: http://localhost:5000/api/health")
     print("[INFO] Upload endpoint: POST /api/analyze-psd")
+    print("[INFO] Probe endpoint: POST /api/probe-psd")
+    print("[INFO] Lote: POST /api/analyze-batch (varios PSDs ou um ZIP)")
+    print(f"[INFO] Jobs: POST /api/jobs, GET /api/jobs/<id> ({JOB_WORKERS} processos, resultados por {JOB_TTL:g}s)")
     
     app.run(
         host='0.0.0.0',
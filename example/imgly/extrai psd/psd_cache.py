@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Persistent result cache for the font extractors.
+
+Results are stored in a SQLite database keyed by a fingerprint of the file
+content plus the extractor name and version, so a file that was already
+analysed (under any name or path) is answered without being parsed again.
+The database is bounded in size: when the stored results exceed
+``max_bytes`` the least recently used entries are evicted.
+
+Hashing a multi-GB PSB costs almost as much as scanning it, so lookups go
+through two tiers (see :func:`quick_fingerprint`): a fingerprint of the
+size, header, section lengths and metadata, which only reads a few
+megabytes, and the full SHA-256, computed only when the first tier matches
+a stored entry (and once when a result is stored).
+
+The cache directory defaults to ``$PSD_CACHE_DIR`` or
+``~/.cache/psd_fonts``.
+
+Usage:
+    python psd_cache.py stats
+    python psd_cache.py clear
+    python psd_cache.py stats --cache-dir /tmp/psd_cache
+
+This module has no third-party dependencies.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+import psd_sections
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "PSD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "psd_fonts")
+)
+DATABASE_NAME = "results.sqlite3"
+
+# Upper bound for the total size of the stored (JSON encoded) results.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    fingerprint TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    version TEXT NOT NULL,
+    digest TEXT,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (fingerprint, extractor, version)
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0);
+"""
+
+
+def stream_digest(f: BinaryIO) -> str:
+    """Return the hex SHA-256 of ``f`` from its start."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Return the hex SHA-256 of the content of ``path``."""
+    with open(path, "rb") as f:
+        return stream_digest(f)
+
+
+def quick_fingerprint(path: str) -> str:
+    """Return a fingerprint that only reads the metadata of a PSD/PSB file.
+
+    The fingerprint hashes the file size, the 26-byte header, the offsets
+    and lengths of the metadata spans and their content (Image Resources,
+    layer records and Layer and Mask Info tagged blocks, see
+    :func:`psd_sections.iter_metadata_spans`).  Channel and merged image
+    data are not read, so the cost depends on the metadata size and not on
+    the pixel count.  Two files with the same fingerprint can still differ
+    in their pixels; confirm with :func:`file_digest` when that matters.
+
+    Files that cannot be parsed as PSD/PSB are fingerprinted by their full
+    SHA-256.
+    """
+    with open(path, "rb") as f:
+        return stream_fingerprint(f, os.fstat(f.fileno()).st_size)
+
+
+def stream_fingerprint(f: BinaryIO, size: int) -> str:
+    """:func:`quick_fingerprint` of an open file object of ``size`` bytes.
+
+    Only the metadata spans are read (by offset), so ``f`` can be an upload
+    held in a spool instead of a file on disk.
+    """
+    digest = hashlib.sha256()
+    try:
+        f.seek(0)
+        digest.update(struct.pack(">Q", size) + f.read(psd_sections.HEADER_SIZE))
+        for offset, length in psd_sections.iter_metadata_spans(f, size):
+            digest.update(struct.pack(">QQ", offset, length))
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+    except (ValueError, OSError, struct.error):
+        return "sha256:" + stream_digest(f)
+    return "psd:" + digest.hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed cache of extractor results with LRU eviction.
+
+    Values must be JSON serialisable; they are returned as decoded JSON
+    (tuples come back as lists).  ``hits`` and ``misses`` count the lookups
+    made through this object; :meth:`stats` also reports the totals stored
+    in the database, shared by every process using the same directory.
+
+    One object can be shared by several threads.  It also survives a
+    ``fork``: the child opens its own connection on first use.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.path = os.path.join(self.directory, DATABASE_NAME)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # Older layout: the cached results are simply dropped.
+                conn.execute("DROP TABLE IF EXISTS results")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(
+        self,
+        fingerprint: str,
+        extractor: str,
+        version: str,
+        digest: Optional[Callable[[], str]] = None,
+    ) -> Optional[Any]:
+        """Return the cached value or ``None``, updating the counters.
+
+        When ``digest`` is given, an entry found by ``fingerprint`` only
+        counts as a hit if it was stored with the same full digest;
+        ``digest()`` is called only in that case.
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, digest FROM results "
+                "WHERE fingerprint = ? AND extractor = ? AND version = ?",
+                (fingerprint, extractor, version),
+            ).fetchone()
+        # Hashed outside the lock: this may read the whole file.
+        if row is not None and digest is not None and row[1] != digest():
+            row = None
+        with self._lock:
+            conn = self._connection()
+            counter = "hits" if row else "misses"
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (counter,))
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE results SET last_used = ? "
+                "WHERE fingerprint = ? AND extractor = ? AND version = ?",
+                (time.time(), fingerprint, extractor, version),
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(
+        self,
+        fingerprint: str,
+        extractor: str,
+        version: str,
+        value: Any,
+        digest: Optional[str] = None,
+    ) -> None:
+        """Store ``value`` and evict the least recently used entries if needed."""
+        encoded = json.dumps(value, ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (fingerprint, extractor, version, digest, encoded, size, time.time()),
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT rowid, size FROM results ORDER BY last_used"
+        ).fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((rowid,))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE rowid = ?", doomed)
+
+    def cached(
+        self,
+        path: str,
+        extractor: str,
+        version: str,
+        func: Callable[[str], Any],
+        refresh: bool = False,
+        verify: bool = True,
+    ) -> Any:
+        """Return ``func(path)``, answering from the cache when possible.
+
+        Entries are looked up by :func:`quick_fingerprint`.  With ``verify``
+        a match is confirmed with the full SHA-256 of the file, which is
+        also computed when a new result is stored.  Extractors that only
+        read the metadata covered by the fingerprint (such as the
+        section-aware scan) can pass ``verify=False`` and never hash the
+        whole file.  With ``refresh`` the lookup is skipped and the stored
+        value is replaced by a fresh result.
+        """
+        fingerprint = quick_fingerprint(path)
+        full_digest = lru_cache(maxsize=None)(lambda: file_digest(path))
+        if not refresh:
+            value = self.get(
+                fingerprint, extractor, version, full_digest if verify else None
+            )
+            if value is not None:
+                return value
+        value = func(path)
+        self.put(
+            fingerprint, extractor, version, value, full_digest() if verify else None
+        )
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the entry count, stored bytes and hit/miss counters."""
+        with self._lock:
+            conn = self._connection()
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            totals = dict(conn.execute("SELECT name, value FROM counters"))
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals["hits"],
+            "total_misses": totals["misses"],
+            "hit_ratio": totals["hits"] / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM results")
+            conn.execute("UPDATE counters SET value = 0")
+            self.hits = self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+@lru_cache(maxsize=None)
+def get_cache(directory: Optional[str] = None) -> ResultCache:
+    """Return the shared :class:`ResultCache` for ``directory`` in this process."""
+    return ResultCache(directory)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect or clear the font result cache.")
+    parser.add_argument("command", choices=("stats", "clear"))
+    parser.add_argument("--cache-dir", help="Cache directory (default: %s)." % DEFAULT_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.cache_dir)
+    if args.command == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
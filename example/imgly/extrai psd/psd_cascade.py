@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Cost-ordered cascade of font extraction methods.
+
+The per-layer extractors combine a precise method (the structured
+EngineData / ``text_data`` tables) with slower, noisier fallbacks: regular
+expressions over ``str(tag_data)``, null-stripped byte scans, the
+``psdtxtractor`` subprocess.  Running every method on every layer costs
+the slow path even when the precise one already answered.
+
+A :class:`Cascade` holds :class:`Method` objects, each declaring its
+expected ``cost`` (any unit; only the order matters) and the
+``confidence`` of the names it returns.  :meth:`Cascade.run` calls them
+cheapest first and stops once a method whose confidence reaches
+``stop_confidence`` returned at least one name.  ``exhaustive=True``
+runs every method, in the same order, as the scripts did before.
+
+Each method keeps call, hit and time counters (:class:`MethodStats`) over
+all the layers a cascade has seen, so :meth:`Cascade.report` shows how
+often each fallback actually found something.
+
+This module has no third-party dependencies.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+# Default confidence from which a cascade stops escalating.
+STOP_CONFIDENCE = 0.9
+
+
+@dataclass(frozen=True)
+class Method:
+    """A font extraction method: ``func(item)`` returns font names."""
+
+    name: str
+    cost: float
+    confidence: float
+    func: Callable[[Any], Iterable[str]]
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    hits: int = 0  # calls that returned at least one name
+    skipped: int = 0  # items on which an earlier method stopped the cascade
+    seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "skipped": self.skipped,
+            "seconds": round(self.seconds, 6),
+        }
+
+
+@dataclass
+class CascadeResult:
+    """Names found for one item, in method order, and the methods that ran."""
+
+    fonts: List[str] = field(default_factory=list)
+    methods_run: List[str] = field(default_factory=list)
+    stopped_by: str = ""
+
+
+class Cascade:
+    """Run :class:`Method` objects cheapest first, with early exit."""
+
+    def __init__(
+        self,
+        methods: Sequence[Method],
+        stop_confidence: float = STOP_CONFIDENCE,
+        exhaustive: bool = False,
+    ) -> None:
+        # sorted() is stable: methods of equal cost keep the given order.
+        self.methods = sorted(methods, key=lambda method: method.cost)
+        self.stop_confidence = stop_confidence
+        self.exhaustive = exhaustive
+        self.stats: Dict[str, MethodStats] = {method.name: MethodStats() for method in self.methods}
+
+    def run(self, item: Any) -> CascadeResult:
+        """Run the methods on ``item`` until one answers with enough confidence.
+
+        An exception raised by a method counts as a call without a hit and
+        the cascade moves on to the next method.
+        """
+        result = CascadeResult()
+        for position, method in enumerate(self.methods):
+            stats = self.stats[method.name]
+            start = time.perf_counter()
+            try:
+                names = list(method.func(item))
+            except Exception:
+                names = []
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            result.methods_run.append(method.name)
+            if not names:
+                continue
+            stats.hits += 1
+            result.fonts.extend(names)
+            if not self.exhaustive and method.confidence >= self.stop_confidence:
+                result.stopped_by = method.name
+                for later in self.methods[position + 1:]:
+                    self.stats[later.name].skipped += 1
+                break
+        return result
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Counters of each method, cheapest first."""
+        return {
+            method.name: dict(
+                self.stats[method.name].as_dict(),
+                cost=method.cost,
+                confidence=method.confidence,
+            )
+            for method in self.methods
+        }
+
+    def report(self) -> List[str]:
+        """One line per method: calls, hits, skips and time."""
+        lines = []
+        for method in self.methods:
+            stats = self.stats[method.name]
+            rate = stats.hits / stats.calls * 100 if stats.calls else 0.0
+            lines.append(
+                f"{method.name:<20} cost {method.cost:>6g}  confidence {method.confidence:.2f}  "
+                f"{stats.calls:>4} calls  {stats.hits:>4} hits ({rate:5.1f}%)  "
+                f"{stats.skipped:>4} skipped  {stats.seconds * 1000:9.2f} ms"
+            )
+        return lines
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Execution backend for the CPU-bound extraction calls of the API.
+
+Parsing EngineData and scanning metadata are pure-Python work, so the
+threads of the web server take turns on the GIL instead of running in
+parallel.  A :class:`TaskExecutor` runs those calls in one of three ways:
+
+    inline   in the calling thread (no pool; what the API did before)
+    thread   in a ``ThreadPoolExecutor``; overlaps I/O, not CPU work
+    process  in a ``ProcessPoolExecutor``, one GIL per worker
+
+Process workers are forked from a ``forkserver`` that has imported the
+``preload`` modules once, so starting (or replacing) a worker does not
+import anything again; :meth:`TaskExecutor.warm` starts all of them ahead
+of the first request.  Where ``forkserver`` is unavailable (Windows)
+``spawn`` is used and each worker imports the modules on start.
+
+With ``max_tasks_per_child`` the workers are recycled, which bounds the
+memory a long-lived worker can accumulate: after ``workers *
+max_tasks_per_child`` tasks the pool is replaced by a fresh one, and the
+old pool exits once its queued tasks are done.  Each worker thus runs
+about ``max_tasks_per_child`` tasks.  ``ProcessPoolExecutor``'s own
+``max_tasks_per_child`` is not used: on Python 3.11 it deadlocks once
+tasks are queued behind a worker that retires.
+
+``timeout`` limits each task.  In a worker process it is enforced with
+``SIGALRM``: :class:`TaskTimeout` is raised inside the task, which stops
+pure-Python work between two bytecodes and leaves the worker usable.  The
+caller gives up ``TIMEOUT_GRACE`` seconds later in any case (e.g. when a
+task is stuck in C code, or on platforms without ``SIGALRM``).  Threads
+cannot be interrupted: the caller stops waiting after ``timeout`` and the
+task runs to completion in the background.  Inline tasks are not limited.
+
+Functions and arguments sent to a process pool must be picklable and
+importable by the workers, i.e. defined in a module rather than in the
+script being run.
+
+This module has no third-party dependencies.
+"""
+
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Sequence
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+KINDS = (INLINE, THREAD, PROCESS)
+
+# Seconds the caller waits past ``timeout`` for a process task to stop itself.
+TIMEOUT_GRACE = 5.0
+
+
+class TaskTimeout(Exception):
+    """A task ran longer than the executor's ``timeout``."""
+
+
+def _raise_timeout(signum: int, frame: Any) -> None:
+    raise TaskTimeout("task timed out")
+
+
+def _call_with_timeout(
+    timeout: Optional[float], func: Callable[..., Any], args: tuple, kwargs: dict
+) -> Any:
+    """Run ``func`` in a worker process, interrupted after ``timeout`` seconds."""
+    if not timeout or not hasattr(signal, "setitimer"):
+        return func(*args, **kwargs)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _init_worker(
+    modules: Sequence[str], initializer: Optional[Callable[..., None]], initargs: tuple
+) -> None:
+    # Already imported when the forkserver preloaded them; needed with spawn.
+    for name in modules:
+        if name != "__main__":
+            importlib.import_module(name)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _process_context(preload: Sequence[str]):
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(list(preload))
+        return context
+    # fork cannot be used: it is unsafe in a threaded server and Python
+    # refuses it together with max_tasks_per_child.
+    return multiprocessing.get_context("spawn")
+
+
+class TaskExecutor:
+    """Inline, thread-pool or process-pool runner with per-task timeouts."""
+
+    def __init__(
+        self,
+        kind: str = PROCESS,
+        workers: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = None,
+        timeout: Optional[float] = None,
+        preload: Sequence[str] = (),
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: tuple = (),
+    ) -> None:
+        if kind not in KINDS:
+            raise ValueError(f"unknown executor kind {kind!r}; use one of {', '.join(KINDS)}")
+        self.kind = kind
+        self.workers = 1 if kind == INLINE else workers or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child if kind == PROCESS else None
+        self.timeout = timeout
+        self.preload = tuple(preload)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self._initializer = initializer
+        self._initargs = initargs
+        self.recycled = 0
+        self._lock = threading.Lock()
+        self.context = _process_context(self.preload) if kind == PROCESS else None
+        self._pool = self._new_pool()
+        self._pool_tasks = 0
+
+    def _new_pool(self):
+        if self.kind == THREAD:
+            return ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="psd-task",
+                initializer=_init_worker,
+                initargs=((), self._initializer, self._initargs),
+            )
+        if self.kind == PROCESS:
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self.context,
+                initializer=_init_worker,
+                initargs=(self.preload, self._initializer, self._initargs),
+            )
+        if self._initializer is not None:
+            self._initializer(*self._initargs)
+        return None
+
+    def warm(self) -> None:
+        """Start every worker process now instead of on the first tasks."""
+        if self.kind == PROCESS:
+            with self._lock:
+                futures = [self._pool.submit(_worker_pid) for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Schedule ``func(*args, **kwargs)`` and return its ``Future``.
+
+        Inline tasks run before this returns; the future is already done.
+        """
+        with self._lock:
+            self.submitted += 1
+        if self.kind == INLINE:
+            future: Future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        elif self.kind == THREAD:
+            future = self._pool.submit(func, *args, **kwargs)
+        else:
+            future = self._submit_to_process(
+                _call_with_timeout, self.timeout, func, args, kwargs
+            )
+        future.add_done_callback(self._count)
+        return future
+
+    def _submit_to_process(self, *task: Any) -> Future:
+        with self._lock:
+            if (
+                self.max_tasks_per_child
+                and self._pool_tasks >= self.workers * self.max_tasks_per_child
+            ):
+                self._pool.shutdown(wait=False)  # exits after its queued tasks
+                self._pool = self._new_pool()
+                self._pool_tasks = 0
+                self.recycled += 1
+            try:
+                future = self._pool.submit(*task)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool.
+                self._pool = self._new_pool()
+                self._pool_tasks = 0
+                future = self._pool.submit(*task)
+            self._pool_tasks += 1
+            return future
+
+    def _count(self, future: Future) -> None:
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            if future.cancelled() or error is not None:
+                self.failed += 1
+                if isinstance(error, TaskTimeout):
+                    self.timed_out += 1
+            else:
+                self.completed += 1
+
+    def result(self, future: Future) -> Any:
+        """The result of a future from :meth:`submit`, waiting at most ``timeout``.
+
+        Raises:
+            TaskTimeout: If the task ran out of time.
+        """
+        wait = None
+        if self.timeout and self.kind != INLINE:
+            wait = self.timeout + (TIMEOUT_GRACE if self.kind == PROCESS else 0)
+        try:
+            return future.result(wait)
+        except TimeoutError:
+            # The task itself did not stop (thread, or stuck in C code).
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise TaskTimeout(f"task timed out after {self.timeout:g}s") from None
+
+    def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """``submit`` then ``result``."""
+        return self.result(self.submit(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuration plus task counters; ``in_flight`` are submitted but not finished."""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_tasks_per_child": self.max_tasks_per_child,
+                "timeout": self.timeout,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "in_flight": self.submitted - finished,
+                "recycled": self.recycled,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
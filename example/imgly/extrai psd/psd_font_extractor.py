@@ -11,19 +11,23 @@ from psd_tools import PSDImage
 from psd_tools.api.layers import TypeLayer
 import json
 
-def extract_fonts_from_psd(psd_path):
+import psd_metadata
+
+def extract_fonts_from_psd(psd_path, psd=None):
     """
     Extrai todos os nomes de fontes únicas de um arquivo PSD
     
     Args:
         psd_path (str): Caminho para o arquivo PSD
+        psd (PSDImage, opcional): Arquivo já aberto; evita abrir de novo
         
     Returns:
         dict: Dicionário com informações das fontes encontradas
     """
     try:
-        # Carrega o arquivo PSD
-        psd = PSDImage.open(psd_path)
+        # Carrega o arquivo PSD (se ainda não foi aberto)
+        if psd is None:
+            psd = psd_metadata.open_metadata(psd_path)
         
         fonts_info = {
             'file': psd_path,
@@ -103,12 +107,13 @@ def extract_fonts_from_psd(psd_path):
         print(f"[ERRO] Erro ao processar {psd_path}: {e}")
         return None
 
-def extract_fonts_advanced_method(psd_path):
+def extract_fonts_advanced_method(psd_path, psd=None):
     """
     Método avançado usando acesso direto aos tagged blocks
     """
     try:
-        psd = PSDImage.open(psd_path)
+        if psd is None:
+            psd = psd_metadata.open_metadata(psd_path)
         fonts_found = set()
         
         def extract_from_layer(layer):
@@ -170,11 +175,18 @@ def main():
     
     print("[INFO] Iniciando extracao de fontes...\n")
     
+    # Abre o arquivo uma única vez para os dois métodos
+    try:
+        psd = psd_metadata.open_metadata(psd_path)
+    except Exception as e:
+        print(f"[ERRO] Erro ao processar {psd_path}: {e}")
+        psd = None
+    
     # Método principal
-    result = extract_fonts_from_psd(psd_path)
+    result = extract_fonts_from_psd(psd_path, psd) if psd is not None else None
     
     # Método avançado como backup
-    fonts_advanced = extract_fonts_advanced_method(psd_path)
+    fonts_advanced = extract_fonts_advanced_method(psd_path, psd) if psd is not None else []
     
     print("\n" + "="*50)
     print("[RESULTADOS]")
@@ -11,6 +11,9 @@ import re
 from psd_tools import PSDImage
 from psd_tools.constants import Tag
 
+import psd_metadata
+from psd_results import FontTable, TextLayer
+
 def extract_fonts_from_tysh(layer):
     """Extrai fontes do Type Tool Object Setting (TySh)"""
     fonts_found = []
@@ -131,10 +134,10 @@ def main():
     
     try:
         # Abre o arquivo PSD
-        psd = PSDImage.open(psd_path)
+        psd = psd_metadata.open_metadata(psd_path)
         print(f"[INFO] Dimensoes: {psd.width} x {psd.height}")
         
-        all_fonts = set()
+        fonts = FontTable()  # nomes internados; as layers guardam só IDs
         text_layers_info = []
         
         # Processa cada layer
@@ -146,25 +149,16 @@ def main():
                 # Extrai fontes desta layer
                 layer_fonts = extract_fonts_from_tysh(layer)
                 
-                # Limpa nomes de fontes
-                cleaned_fonts = []
+                # Armazena informações da layer, com os nomes limpos internados
+                layer_info = TextLayer(layer.name, layer.name, layer.text, layer.visible)
                 for font in layer_fonts:
                     cleaned = clean_font_name(font)
                     if cleaned:
-                        cleaned_fonts.append(cleaned)
-                        all_fonts.add(cleaned)
-                
-                # Armazena informações da layer
-                layer_info = {
-                    'layer_name': layer.name,
-                    'text_content': layer.text,
-                    'fonts_found': cleaned_fonts,
-                    'visible': layer.visible
-                }
+                        layer_info.font_ids.append(fonts.intern(cleaned))
                 text_layers_info.append(layer_info)
                 
-                if cleaned_fonts:
-                    print(f"[SUCESSO] Fontes encontradas: {cleaned_fonts}")
+                if layer_info.font_ids:
+                    print(f"[SUCESSO] Fontes encontradas: {layer_info.fonts(fonts)}")
                 else:
                     print(f"[AVISO] Nenhuma fonte encontrada nesta layer")
         
@@ -173,8 +167,8 @@ def main():
         print("RESULTADO FINAL - FONTES EXTRAIDAS")
         print("="*60)
         
-        if all_fonts:
-            sorted_fonts = sorted(list(all_fonts))
+        if len(fonts):
+            sorted_fonts = sorted(fonts.names)
             print(f"[SUCESSO] Total de fontes unicas encontradas: {len(sorted_fonts)}")
             
             for i, font in enumerate(sorted_fonts, 1):
@@ -190,7 +184,16 @@ def main():
                 },
                 'fonts_extracted': sorted_fonts,
                 'total_unique_fonts': len(sorted_fonts),
-                'text_layers': text_layers_info,
+                # Converte para dicts só na saída
+                'text_layers': [
+                    {
+                        'layer_name': info.name,
+                        'text_content': info.text,
+                        'fonts_found': info.fonts(fonts),
+                        'visible': info.visible
+                    }
+                    for info in text_layers_info
+                ],
                 'extraction_date': __import__('datetime').datetime.now().isoformat()
             }
             
@@ -12,6 +12,10 @@ import tempfile
 import re
 from psd_tools import PSDImage
 
+import psd_metadata
+import psd_cascade
+from psd_results import FontTable, TextLayer
+
 def run_psdtxtractor(psd_path):
     """Executa psdtxtractor e captura o output"""
     try:
@@ -138,18 +142,92 @@ try {
     
     return script_path
 
-def analyze_psd_advanced(psd_path):
+def fonts_via_text_data(item, fonts):
+    """Fontes do text_data do psd-tools (document_resources e style_runs)"""
+    layer, layer_info = item
+    found = []
+    
+    if hasattr(layer, 'text_data') and layer.text_data:
+        text_data = layer.text_data
+        
+        # Via document_resources
+        if (hasattr(text_data, 'document_resources') and 
+            text_data.document_resources and
+            hasattr(text_data.document_resources, 'font_set') and
+            text_data.document_resources.font_set):
+            
+            for font in text_data.document_resources.font_set:
+                for attr in ['name', 'postscript_name', 'family_name', 'font_name']:
+                    if hasattr(font, attr):
+                        value = getattr(font, attr)
+                        if value and isinstance(value, str):
+                            found.append(value)
+        
+        # Via style_runs
+        if hasattr(text_data, 'style_runs') and text_data.style_runs:
+            for run in text_data.style_runs:
+                if hasattr(run, 'style') and run.style:
+                    for attr in ['font', 'font_name', 'font_family']:
+                        if hasattr(run.style, attr):
+                            value = getattr(run.style, attr)
+                            if value and isinstance(value, str):
+                                found.append(value)
+    
+    for value in found:
+        layer_info.font_ids.append(fonts.intern(value))
+    return found
+
+class PsdtxtractorRunner:
+    """Roda o psdtxtractor uma vez por arquivo, só quando alguma layer precisa"""
+    
+    def __init__(self, psd_path):
+        self.psd_path = psd_path
+        self.info = None
+    
+    @property
+    def ran(self):
+        return self.info is not None
+    
+    def layers(self):
+        if self.info is None:
+            self.info = parse_psdtxtractor_output(run_psdtxtractor(self.psd_path))
+        return self.info
+    
+    def fonts_for_layer(self, item, fonts):
+        """Fonte que o psdtxtractor informa para a layer de mesmo nome"""
+        layer, layer_info = item
+        psdtxt_data = self.layers().get(layer_info.name, {})
+        if psdtxt_data.get('type') == 'text' and 'font' in psdtxt_data:
+            font_id = fonts.intern(psdtxt_data['font'])
+            if font_id not in layer_info.font_ids:
+                layer_info.font_ids.append(font_id)
+            return [psdtxt_data['font']]
+        return []
+
+def new_cascade(psdtxtractor, fonts, exhaustive=False):
+    """text_data primeiro; o psdtxtractor (subprocesso) só se não achar nada"""
+    return psd_cascade.Cascade([
+        psd_cascade.Method('text_data', 1, 0.95, lambda item: fonts_via_text_data(item, fonts)),
+        psd_cascade.Method('psdtxtractor', 1000, 0.8,
+                           lambda item: psdtxtractor.fonts_for_layer(item, fonts)),
+    ], exhaustive=exhaustive)
+
+def analyze_psd_advanced(psd_path, exhaustive=False):
     """Análise avançada do PSD"""
     results = {
         'psd_tools_info': {},
         'psdtxtractor_info': {},
-        'extracted_fonts': set(),
+        'fonts': FontTable(),  # nomes internados; as layers guardam só IDs
         'text_layers': []
     }
+    fonts = results['fonts']
+    psdtxtractor = PsdtxtractorRunner(psd_path)
+    cascade = new_cascade(psdtxtractor, fonts, exhaustive)
+    psd_tools_ok = False
     
-    # 1. Análise via psd-tools
+    # 1. Análise via psd-tools, com o psdtxtractor como fallback por layer
     try:
-        psd = PSDImage.open(psd_path)
+        psd = psd_metadata.open_metadata(psd_path)
         
         results['psd_tools_info'] = {
             'width': psd.width,
@@ -159,72 +237,35 @@ def analyze_psd_advanced(psd_path):
         
         for layer in psd:
             if layer.kind == 'type':
-                layer_info = {
-                    'name': layer.name,
-                    'text': getattr(layer, 'text', ''),
-                    'visible': layer.visible,
-                    'fonts_found': []
-                }
-                
-                # Tenta diferentes métodos de extração
-                if hasattr(layer, 'text_data') and layer.text_data:
-                    text_data = layer.text_data
-                    
-                    # Via document_resources
-                    if (hasattr(text_data, 'document_resources') and 
-                        text_data.document_resources and
-                        hasattr(text_data.document_resources, 'font_set') and
-                        text_data.document_resources.font_set):
-                        
-                        for font in text_data.document_resources.font_set:
-                            for attr in ['name', 'postscript_name', 'family_name', 'font_name']:
-                                if hasattr(font, attr):
-                                    value = getattr(font, attr)
-                                    if value and isinstance(value, str):
-                                        layer_info['fonts_found'].append(value)
-                                        results['extracted_fonts'].add(value)
-                    
-                    # Via style_runs
-                    if hasattr(text_data, 'style_runs') and text_data.style_runs:
-                        for run in text_data.style_runs:
-                            if hasattr(run, 'style') and run.style:
-                                for attr in ['font', 'font_name', 'font_family']:
-                                    if hasattr(run.style, attr):
-                                        value = getattr(run.style, attr)
-                                        if value and isinstance(value, str):
-                                            layer_info['fonts_found'].append(value)
-                                            results['extracted_fonts'].add(value)
-                
+                layer_info = TextLayer(layer.name, layer.name, getattr(layer, 'text', ''), layer.visible)
+                cascade.run((layer, layer_info))
                 results['text_layers'].append(layer_info)
+        psd_tools_ok = True
                 
     except Exception as e:
         print(f"[AVISO] Erro na análise psd-tools: {e}")
     
-    # 2. Análise via psdtxtractor
-    psdtxt_output = run_psdtxtractor(psd_path)
-    if psdtxt_output:
-        results['psdtxtractor_info'] = parse_psdtxtractor_output(psdtxt_output)
-        
-        # Adiciona informações do psdtxtractor aos layers
-        for layer_name, psdtxt_data in results['psdtxtractor_info'].items():
+    # 2. Sem psd-tools (ou com --all-methods) o psdtxtractor roda de qualquer forma
+    if exhaustive or not psd_tools_ok:
+        psdtxtractor.layers()
+    if psdtxtractor.ran:
+        results['psdtxtractor_info'] = psdtxtractor.info
+        for layer_name, psdtxt_data in psdtxtractor.info.items():
             if psdtxt_data.get('type') == 'text' and 'font' in psdtxt_data:
-                font_name = psdtxt_data['font']
-                results['extracted_fonts'].add(font_name)
-                
-                # Adiciona à layer correspondente
-                for layer_info in results['text_layers']:
-                    if layer_info['name'] == layer_name:
-                        if font_name not in layer_info['fonts_found']:
-                            layer_info['fonts_found'].append(font_name)
+                fonts.intern(psdtxt_data['font'])
     
+    results['method_stats'] = cascade.as_dict()
     return results
 
 def main():
-    if len(sys.argv) != 2:
-        print("Uso: python psd_font_extractor_hybrid.py <arquivo.psd>")
+    # --all-methods roda o psdtxtractor mesmo quando o psd-tools já achou as fontes
+    exhaustive = '--all-methods' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--all-methods']
+    if len(args) != 1:
+        print("Uso: python psd_font_extractor_hybrid.py <arquivo.psd> [--all-methods]")
         sys.exit(1)
     
-    psd_path = sys.argv[1]
+    psd_path = args[0]
     
     if not os.path.exists(psd_path):
         print(f"[ERRO] Arquivo não encontrado: {psd_path}")
@@ -234,7 +275,20 @@ def main():
     print("[INFO] Usando psd-tools + psdtxtractor...")
     
     # Executa análise completa
-    results = analyze_psd_advanced(psd_path)
+    results = analyze_psd_advanced(psd_path, exhaustive)
+    
+    # Converte para dicts só na saída
+    fonts = results.pop('fonts')
+    results['extracted_fonts'] = fonts.names
+    results['text_layers'] = [
+        {
+            'name': layer.name,
+            'text': layer.text,
+            'visible': layer.visible,
+            'fonts_found': layer.fonts(fonts)
+        }
+        for layer in results['text_layers']
+    ]
     
     print(f"\n{'='*60}")
     print("RESULTADO DA ANÁLISE HÍBRIDA")
@@ -261,6 +315,11 @@ def main():
         if 'color' in psdtxt_info:
             print(f"    Cor: rgba({psdtxt_info['color']})")
     
+    print(f"\n[MÉTODOS] Do mais barato ao mais caro:")
+    for name, stats in results['method_stats'].items():
+        print(f"  {name}: {stats['calls']} chamadas, {stats['hits']} acertos, "
+              f"{stats['skipped']} evitadas, {stats['seconds'] * 1000:.2f} ms")
+    
     # Resultado final de fontes
     if results['extracted_fonts']:
         unique_fonts = sorted(list(results['extracted_fonts']))
@@ -277,7 +336,8 @@ def main():
             'total_fonts': len(unique_fonts),
             'text_layers_details': results['text_layers'],
             'psd_info': results['psd_tools_info'],
-            'psdtxtractor_raw': results['psdtxtractor_info']
+            'psdtxtractor_raw': results['psdtxtractor_info'],
+            'method_stats': results['method_stats']
         }
         
         output_file = psd_path.replace('.psd', '_fonts_hybrid.json')
@@ -12,11 +12,36 @@ from psd_tools.api.layers import TypeLayer
 import json
 import re
 
-def extract_fonts_method_1(psd):
+import psd_metadata
+import psd_visitor
+
+# Padrões do método 2 (tagged blocks)
+TAGGED_BLOCK_PATTERNS = [
+    r'FontSet["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
+    r'font["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
+    r'PostScriptName["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
+    r'([A-Za-z]+(?:\-[A-Za-z]+)*(?:\-(?:Bold|Italic|Light|Regular|Medium|Black|Thin))?)(?=\s|"|\'|$)',
+]
+
+# Nomes de fontes comuns procurados no método 2
+COMMON_FONTS = [
+    'Arial', 'Helvetica', 'Times', 'Courier', 'Verdana', 'Georgia',
+    'Trebuchet', 'Impact', 'Comic Sans', 'Calibri', 'Cambria',
+    'Consolas', 'Tahoma', 'Century', 'Garamond', 'Palatino'
+]
+
+# Padrões mais específicos do método 4
+RAW_PATTERNS = [
+    r'([A-Za-z]+\-(?:Bold|Italic|Light|Regular|Medium|Black|Thin|Heavy|Condensed))',
+    r'(Times New Roman|Arial|Helvetica|Courier|Verdana|Georgia|Trebuchet|Impact)',
+    r'([A-Z][a-z]+[A-Z][a-z]+(?:\-[A-Z][a-z]+)?)',  # CamelCase fonts
+]
+
+class TextDataExtractor(psd_visitor.LayerExtractor):
     """Método 1: Acesso direto via text_data"""
-    fonts_found = set()
-    
-    def process_layer(layer):
+
+    def visit(self, context):
+        layer = context.layer
         if hasattr(layer, 'kind') and layer.kind == 'type':
             try:
                 # Método 1a: Via text_data
@@ -24,7 +49,7 @@ def extract_fonts_method_1(psd):
                     if hasattr(layer.text_data, 'style_runs'):
                         for run in layer.text_data.style_runs:
                             if hasattr(run, 'style') and hasattr(run.style, 'font'):
-                                fonts_found.add(run.style.font)
+                                self.fonts.add(run.style.font)
                     
                     # Método 1b: Via document_resources
                     if hasattr(layer.text_data, 'document_resources'):
@@ -32,135 +57,131 @@ def extract_fonts_method_1(psd):
                         if hasattr(doc_res, 'font_set') and doc_res.font_set:
                             for font in doc_res.font_set:
                                 if hasattr(font, 'name'):
-                                    fonts_found.add(font.name)
+                                    self.fonts.add(font.name)
                 
                 print(f"[DEBUG] Layer '{layer.name}': {layer.text if hasattr(layer, 'text') else 'No text'}")
                 
             except Exception as e:
                 print(f"[DEBUG] Erro no layer {layer.name}: {e}")
-        
-        # Processa sublayers
-        if hasattr(layer, 'layers'):
-            for sublayer in layer.layers:
-                process_layer(sublayer)
-    
-    for layer in psd:
-        process_layer(layer)
-    
-    return fonts_found
 
-def extract_fonts_method_2(psd):
+class TaggedBlockExtractor(psd_visitor.LayerExtractor):
     """Método 2: Análise dos tagged blocks"""
-    fonts_found = set()
-    
-    def analyze_tagged_blocks(layer):
-        if hasattr(layer, '_record') and layer._record:
-            if hasattr(layer._record, 'tagged_blocks'):
-                for block_key, block_data in layer._record.tagged_blocks.items():
-                    try:
-                        block_str = str(block_data)
-                        
-                        # Procura padrões de fontes
-                        font_patterns = [
-                            r'FontSet["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
-                            r'font["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
-                            r'PostScriptName["\s]*[:\s]*["\s]*([A-Za-z][A-Za-z0-9\-]*)',
-                            r'([A-Za-z]+(?:\-[A-Za-z]+)*(?:\-(?:Bold|Italic|Light|Regular|Medium|Black|Thin))?)(?=\s|"|\'|$)',
-                        ]
-                        
-                        for pattern in font_patterns:
-                            matches = re.findall(pattern, block_str, re.IGNORECASE)
-                            for match in matches:
-                                if len(match) > 2 and not match.isdigit():
-                                    fonts_found.add(match.strip())
+
+    def visit(self, context):
+        layer = context.layer
+        if not (hasattr(layer, '_record') and layer._record):
+            return
+        if not hasattr(layer._record, 'tagged_blocks'):
+            return
+        for block_key, block_data in layer._record.tagged_blocks.items():
+            try:
+                block_str = str(block_data)
+                
+                # Procura padrões de fontes
+                for pattern in TAGGED_BLOCK_PATTERNS:
+                    matches = re.findall(pattern, block_str, re.IGNORECASE)
+                    for match in matches:
+                        if len(match) > 2 and not match.isdigit():
+                            self.fonts.add(match.strip())
+                
+                # Procura por nomes de fontes comuns
+                for font in COMMON_FONTS:
+                    if font in block_str:
+                        self.fonts.add(font)
                         
-                        # Procura por nomes de fontes comuns
-                        common_fonts = [
-                            'Arial', 'Helvetica', 'Times', 'Courier', 'Verdana', 'Georgia',
-                            'Trebuchet', 'Impact', 'Comic Sans', 'Calibri', 'Cambria',
-                            'Consolas', 'Tahoma', 'Century', 'Garamond', 'Palatino'
-                        ]
+            except Exception as e:
+                continue
+
+class StructureExtractor(psd_visitor.LayerExtractor):
+    """Método 3: Análise da estrutura interna do PSD"""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def begin(self, psd):
+        try:
+            # Verifica recursos do documento
+            if hasattr(psd, '_record') and psd._record:
+                if hasattr(psd._record, 'image_resources'):
+                    for resource in psd._record.image_resources:
+                        resource_str = str(resource)
                         
-                        for font in common_fonts:
-                            if font in block_str:
-                                fonts_found.add(font)
-                                
-                    except Exception as e:
-                        continue
-        
-        # Processa sublayers
-        if hasattr(layer, 'layers'):
-            for sublayer in layer.layers:
-                analyze_tagged_blocks(sublayer)
-    
-    for layer in psd:
-        analyze_tagged_blocks(layer)
-    
-    return fonts_found
+                        # Procura por informações de fonte nos recursos
+                        font_matches = re.findall(r'([A-Za-z]+(?:\-[A-Za-z]+)*)', resource_str)
+                        for match in font_matches:
+                            if len(match) > 3 and match not in ['data', 'type', 'size', 'color']:
+                                self.fonts.add(match)
+        except Exception as e:
+            self.failed = True
+            print(f"[DEBUG] Erro no método 3: {e}")
+
+    def visit(self, context):
+        # Só as layers do topo, como no percurso original
+        if self.failed or context.depth != 0 or not hasattr(context.layer, '_record'):
+            return
+        try:
+            # Extrai possíveis nomes de fonte
+            potential_fonts = re.findall(r'([A-Z][a-z]+(?:[A-Z][a-z]+)*(?:\-[A-Z][a-z]+)*)', context.record_str)
+            for font in potential_fonts:
+                if len(font) > 3:
+                    self.fonts.add(font)
+        except Exception as e:
+            self.failed = True
+            print(f"[DEBUG] Erro no método 3: {e}")
+
+class RawExtractor(psd_visitor.LayerExtractor):
+    """Método 4: Análise raw do conteúdo binário"""
+
+    def end(self, psd):
+        try:
+            # Converte toda estrutura para string e procura padrões
+            # (o registro vem de open_metadata, sem dados de pixel).
+            # Fica fora do percurso: montar esta string com o record_str das
+            # layers mais as partes do documento muda o resultado. No
+            # psd-tools atual str(psd._record) é só "<...PSD object at 0x...>"
+            # (barato e sem matches), enquanto str() das partes traz nomes de
+            # classe (FileHeader, ColorMode, ...) que o padrão CamelCase aceita.
+            full_str = str(psd._record) if hasattr(psd, '_record') else str(psd)
+            
+            for pattern in RAW_PATTERNS:
+                matches = re.findall(pattern, full_str)
+                for match in matches:
+                    if isinstance(match, tuple):
+                        for m in match:
+                            if len(m) > 3:
+                                self.fonts.add(m)
+                    else:
+                        if len(match) > 3:
+                            self.fonts.add(match)
+                            
+        except Exception as e:
+            print(f"[DEBUG] Erro no método 4: {e}")
+
+def extract_all_methods(psd):
+    """Executa os 4 métodos num único percurso das layers"""
+    return psd_visitor.walk(psd, [
+        TextDataExtractor(),
+        TaggedBlockExtractor(),
+        StructureExtractor(),
+        RawExtractor(),
+    ])
+
+def extract_fonts_method_1(psd):
+    """Método 1: Acesso direto via text_data"""
+    return psd_visitor.walk(psd, [TextDataExtractor()])[0]
+
+def extract_fonts_method_2(psd):
+    """Método 2: Análise dos tagged blocks"""
+    return psd_visitor.walk(psd, [TaggedBlockExtractor()])[0]
 
 def extract_fonts_method_3(psd):
     """Método 3: Análise da estrutura interna do PSD"""
-    fonts_found = set()
-    
-    try:
-        # Verifica recursos do documento
-        if hasattr(psd, '_record') and psd._record:
-            if hasattr(psd._record, 'image_resources'):
-                for resource in psd._record.image_resources:
-                    resource_str = str(resource)
-                    
-                    # Procura por informações de fonte nos recursos
-                    font_matches = re.findall(r'([A-Za-z]+(?:\-[A-Za-z]+)*)', resource_str)
-                    for match in font_matches:
-                        if len(match) > 3 and match not in ['data', 'type', 'size', 'color']:
-                            fonts_found.add(match)
-        
-        # Verifica layers resources
-        for layer in psd:
-            if hasattr(layer, '_record'):
-                layer_str = str(layer._record)
-                
-                # Extrai possíveis nomes de fonte
-                potential_fonts = re.findall(r'([A-Z][a-z]+(?:[A-Z][a-z]+)*(?:\-[A-Z][a-z]+)*)', layer_str)
-                for font in potential_fonts:
-                    if len(font) > 3:
-                        fonts_found.add(font)
-                        
-    except Exception as e:
-        print(f"[DEBUG] Erro no método 3: {e}")
-    
-    return fonts_found
+    return psd_visitor.walk(psd, [StructureExtractor()])[0]
 
 def extract_fonts_method_4(psd):
     """Método 4: Análise raw do conteúdo binário"""
-    fonts_found = set()
-    
-    try:
-        # Converte toda estrutura para string e procura padrões
-        full_str = str(psd._record) if hasattr(psd, '_record') else str(psd)
-        
-        # Padrões mais específicos para fontes
-        patterns = [
-            r'([A-Za-z]+\-(?:Bold|Italic|Light|Regular|Medium|Black|Thin|Heavy|Condensed))',
-            r'(Times New Roman|Arial|Helvetica|Courier|Verdana|Georgia|Trebuchet|Impact)',
-            r'([A-Z][a-z]+[A-Z][a-z]+(?:\-[A-Z][a-z]+)?)',  # CamelCase fonts
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, full_str)
-            for match in matches:
-                if isinstance(match, tuple):
-                    for m in match:
-                        if len(m) > 3:
-                            fonts_found.add(m)
-                else:
-                    if len(match) > 3:
-                        fonts_found.add(match)
-                        
-    except Exception as e:
-        print(f"[DEBUG] Erro no método 4: {e}")
-    
-    return fonts_found
+    return psd_visitor.walk(psd, [RawExtractor()])[0]
 
 def main():
     if len(sys.argv) != 2:
@@ -177,7 +198,7 @@ def main():
     print(f"[INFO] Processando: {os.path.basename(psd_path)}")
     
     try:
-        psd = PSDImage.open(psd_path)
+        psd = psd_metadata.open_metadata(psd_path)
         print(f"[INFO] Dimensoes: {psd.width}x{psd.height}")
         
         # Lista layers
@@ -187,11 +208,8 @@ def main():
         
         print("\n[INFO] Executando múltiplos métodos de extração...")
         
-        # Executa todos os métodos
-        fonts_1 = extract_fonts_method_1(psd)
-        fonts_2 = extract_fonts_method_2(psd)
-        fonts_3 = extract_fonts_method_3(psd)
-        fonts_4 = extract_fonts_method_4(psd)
+        # Executa todos os métodos num único percurso
+        fonts_1, fonts_2, fonts_3, fonts_4 = extract_all_methods(psd)
         
         # Combina todos os resultados
         all_fonts = set()
@@ -10,6 +10,8 @@ import json
 from psd_tools import PSDImage
 import struct
 
+import psd_metadata
+
 def extract_engine_data(layer):
     """Extrai dados do engine de texto de uma layer"""
     fonts_found = []
@@ -152,7 +154,7 @@ def main():
     print(f"[INFO] Analisando arquivo: {os.path.basename(psd_path)}")
     
     try:
-        psd = PSDImage.open(psd_path)
+        psd = psd_metadata.open_metadata(psd_path)
         print(f"[INFO] Dimensoes: {psd.width}x{psd.height}")
         
         all_fonts = set()
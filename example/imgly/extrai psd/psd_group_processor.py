@@ -7,21 +7,23 @@ Especialmente para PSDs com estrutura hierárquica
 import sys
 import os
 import json
-from psd_tools import PSDImage
 
-def process_layer_recursive(layer, depth=0, path=""):
-    """Processa layer recursivamente, incluindo grupos"""
+try:
+    from psd_tools import PSDImage
+except ImportError:  # psd-tools é opcional: o leitor nativo (psd_sections) cobre o caso comum
+    PSDImage = None
+
+import engine_data
+import psd_metadata
+import psd_sections
+from psd_results import NO_FONT, DocumentResult, LayerResult, TextLayer
+
+def process_layer_recursive(layer, fonts, depth=0, path=""):
+    """Processa layer recursivamente, incluindo grupos (fontes internadas em ``fonts``)"""
     indent = "  " * depth
     current_path = f"{path}/{layer.name}" if path else layer.name
     
-    results = {
-        'name': layer.name,
-        'kind': layer.kind,
-        'visible': layer.visible,
-        'path': current_path,
-        'text_layers': [],
-        'sublayers': []
-    }
+    result = LayerResult(layer.name, layer.kind, layer.visible, current_path)
     
     print(f"{indent}Layer: {layer.name} ({layer.kind})")
     
@@ -29,13 +31,7 @@ def process_layer_recursive(layer, depth=0, path=""):
     if layer.kind == 'type':
         print(f"{indent}  [TEXTO] '{getattr(layer, 'text', 'N/A')}'")
         
-        text_info = {
-            'name': layer.name,
-            'path': current_path,
-            'text': getattr(layer, 'text', ''),
-            'visible': layer.visible,
-            'fonts_found': []
-        }
+        text_info = TextLayer(layer.name, current_path, getattr(layer, 'text', ''), layer.visible)
         
         # Tenta extrair informações de fonte
         if hasattr(layer, 'text_data') and layer.text_data:
@@ -52,7 +48,7 @@ def process_layer_recursive(layer, depth=0, path=""):
                         if hasattr(font, attr):
                             value = getattr(font, attr)
                             if value and isinstance(value, str):
-                                text_info['fonts_found'].append(value)
+                                text_info.font_ids.append(fonts.intern(value))
                                 print(f"{indent}    Font: {value}")
             
             # Via style_runs
@@ -63,21 +59,102 @@ def process_layer_recursive(layer, depth=0, path=""):
                             if hasattr(run.style, attr):
                                 value = getattr(run.style, attr)
                                 if value and isinstance(value, str):
-                                    text_info['fonts_found'].append(value)
+                                    text_info.font_ids.append(fonts.intern(value))
                                     print(f"{indent}    Font: {value}")
         
-        results['text_layers'].append(text_info)
+        result.text = text_info
     
     # Se é grupo, processa sublayers
     elif layer.kind == 'group' and hasattr(layer, 'layers'):
         print(f"{indent}  [GRUPO] {len(layer.layers)} sublayers")
         for sublayer in layer.layers:
-            sublayer_result = process_layer_recursive(sublayer, depth + 1, current_path)
-            results['sublayers'].append(sublayer_result)
-            # Propaga text_layers para cima
-            results['text_layers'].extend(sublayer_result['text_layers'])
+            result.sublayers.append(
+                process_layer_recursive(sublayer, fonts, depth + 1, current_path)
+            )
+    
+    return result
+
+def process_node_recursive(node, f, fonts, depth=0, path=""):
+    """Mesmo resultado de process_layer_recursive a partir do índice nativo (psd_sections)"""
+    record = node.record
+    indent = "  " * depth
+    current_path = f"{path}/{record.name}" if path else record.name
+    
+    result = LayerResult(record.name, record.kind, record.visible, current_path)
+    
+    print(f"{indent}Layer: {record.name} ({record.kind})")
+    
+    if record.kind == 'type':
+        try:
+            tables = engine_data.read_engine_tables(
+                psd_sections.read_block(f, record.block('TySh'))
+            )
+        except ValueError:
+            tables = engine_data.EngineTables({}, {})
+        text = tables.text.rstrip('\r')
+        print(f"{indent}  [TEXTO] '{text}'")
+        
+        text_info = TextLayer(record.name, current_path, text, record.visible)
+        
+        # Mesmo conteúdo de text_data.document_resources.font_set, resolvido
+        # uma vez por documento: FontSet -> IDs na tabela de fontes
+        font_set_ids = fonts.map_font_set(tables.font_set)
+        for font_id in font_set_ids:
+            if font_id != NO_FONT:
+                text_info.font_ids.append(font_id)
+                print(f"{indent}    Font: {fonts.names[font_id]}")
+        
+        # StyleRun: índice no FontSet -> ID na tabela de fontes
+        for run in tables.style_runs:
+            if isinstance(run.font, int) and 0 <= run.font < len(font_set_ids):
+                if font_set_ids[run.font] != NO_FONT:
+                    text_info.add_run(run.length, font_set_ids[run.font])
+        
+        result.text = text_info
+    
+    elif record.kind == 'group':
+        print(f"{indent}  [GRUPO] {len(node.children)} sublayers")
+        for child in node.children:
+            result.sublayers.append(
+                process_node_recursive(child, f, fonts, depth + 1, current_path)
+            )
+    
+    return result
+
+def process_psd(psd_path):
+    """
+    Processa as layers principais e retorna um DocumentResult.
+    Usa o índice nativo de camadas; psd-tools fica como fallback.
+    """
+    try:
+        with open(psd_path, 'rb') as f:
+            index = psd_sections.read_layer_index(f)
+            top_level = psd_sections.build_layer_tree(index.layers)
+            print_structure_header(index.header.width, index.header.height, len(top_level))
+            document = DocumentResult(psd_path, index.header.width, index.header.height)
+            for i, node in enumerate(top_level, 1):
+                print(f"\n[LAYER PRINCIPAL {i}]")
+                document.layers.append(process_node_recursive(node, f, document.fonts))
+            return document
+    except ValueError as e:
+        if PSDImage is None:
+            raise
+        print(f"[AVISO] Leitor nativo falhou ({e}), usando psd-tools")
     
-    return results
+    psd = psd_metadata.open_metadata(psd_path)
+    print_structure_header(psd.width, psd.height, len(list(psd)))
+    document = DocumentResult(psd_path, psd.width, psd.height)
+    for i, layer in enumerate(psd, 1):
+        print(f"\n[LAYER PRINCIPAL {i}]")
+        document.layers.append(process_layer_recursive(layer, document.fonts))
+    return document
+
+def print_structure_header(width, height, layers_count):
+    print(f"[INFO] Dimensões: {width} x {height}")
+    print(f"[INFO] Total de layers principais: {layers_count}")
+    print(f"\n{'='*60}")
+    print("ESTRUTURA HIERÁRQUICA DO PSD")
+    print(f"{'='*60}")
 
 def extract_from_psdtxtractor_output(psd_path):
     """Extrai dados do psdtxtractor para comparação"""
@@ -109,28 +186,11 @@ def main():
     print(f"[INFO] Processando PSD com grupos: {os.path.basename(psd_path)}")
     
     try:
-        psd = PSDImage.open(psd_path)
-        print(f"[INFO] Dimensões: {psd.width} x {psd.height}")
-        print(f"[INFO] Total de layers principais: {len(list(psd))}")
+        document = process_psd(psd_path)
         
-        all_text_layers = []
-        all_fonts = set()
-        
-        print(f"\n{'='*60}")
-        print("ESTRUTURA HIERÁRQUICA DO PSD")
-        print(f"{'='*60}")
-        
-        # Processa cada layer principal
-        for i, layer in enumerate(psd, 1):
-            print(f"\n[LAYER PRINCIPAL {i}]")
-            layer_result = process_layer_recursive(layer)
-            
-            # Coleta todas as text layers encontradas
-            all_text_layers.extend(layer_result['text_layers'])
-            
-            # Coleta todas as fontes
-            for text_layer in layer_result['text_layers']:
-                all_fonts.update(text_layer['fonts_found'])
+        # Converte para dicts só aqui, na saída
+        all_text_layers = [layer.to_dict(document.fonts) for layer in document.iter_text_layers()]
+        all_fonts = document.font_names()
         
         print(f"\n{'='*60}")
         print("RESUMO - LAYERS DE TEXTO ENCONTRADAS")
@@ -168,7 +228,7 @@ def main():
         print(f"{'='*60}")
         
         if all_fonts:
-            unique_fonts = sorted(list(all_fonts))
+            unique_fonts = all_fonts
             print(f"[SUCESSO] Fontes extraídas: {len(unique_fonts)}")
             for i, font in enumerate(unique_fonts, 1):
                 print(f"  {i}. {font}")
@@ -183,13 +243,14 @@ def main():
         output_data = {
             'source_file': psd_path,
             'psd_info': {
-                'width': psd.width,
-                'height': psd.height,
-                'layers_count': len(list(psd))
+                'width': document.width,
+                'height': document.height,
+                'layers_count': len(document.layers)
             },
             'text_layers_found': all_text_layers,
-            'fonts_extracted': sorted(list(all_fonts)),
+            'fonts_extracted': all_fonts,
             'total_fonts': len(all_fonts),
+            'font_table': document.fonts.font_list(),
             'psdtxtractor_output': psdtxt_output
         }
         
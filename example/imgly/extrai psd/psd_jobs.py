@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Local job queue for extractions that outlive an HTTP request.
+
+A :class:`JobManager` runs functions on a :class:`psd_executor.TaskExecutor`
+(usually a process pool, so a CPU-bound extraction does not hold the GIL
+of the web server) and keeps a :class:`Job` record per submission that
+clients poll for status, progress and result.  Everything lives in the
+server process: there is no broker and no database.
+
+Job functions report progress with :func:`report_progress` from inside the
+worker.  The calls go through a queue passed along with every job (a
+``multiprocessing.Manager`` queue for process pools), and a listener
+thread in the server process applies them to the job records.  A job that
+exceeds the executor's ``timeout`` fails with ``TaskTimeout``.
+
+Finished jobs (``done`` or ``failed``) are kept for ``ttl`` seconds and
+then dropped; expiry is checked on every :meth:`JobManager.submit` and
+:meth:`JobManager.get`.  At most ``max_pending`` jobs may be queued or
+running at once; further submissions raise :class:`QueueFull`.
+
+This module has no third-party dependencies.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import psd_executor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_WORKERS = 2
+DEFAULT_TTL = 15 * 60
+DEFAULT_MAX_PENDING = 32
+
+# Progress queue and id of the job running in this worker (thread).
+_worker = threading.local()
+
+
+class QueueFull(Exception):
+    """Raised by :meth:`JobManager.submit` when ``max_pending`` jobs are pending."""
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = QUEUED
+    progress: float = 0.0
+    stage: str = ""
+    result: Any = None
+    error: Optional[str] = None
+    created: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finished; ``False`` if ``timeout`` expired first."""
+        return self._done.wait(timeout)
+
+    def as_dict(self, ttl: Optional[float] = None) -> Dict[str, Any]:
+        expires = self.finished + ttl if self.finished and ttl is not None else None
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "stage": self.stage,
+            "result": self.result,
+            "error": self.error,
+            "created": _isoformat(self.created),
+            "started": _isoformat(self.started),
+            "finished": _isoformat(self.finished),
+            "expires": _isoformat(expires),
+        }
+
+
+def report_progress(fraction: float, stage: str = "") -> None:
+    """Report the progress (0 to 1) of the job running in this worker.
+
+    Does nothing outside a job, so job functions can also be called
+    directly.
+    """
+    job_id = getattr(_worker, "job_id", None)
+    if job_id is not None:
+        _worker.progress.put((job_id, fraction, stage))
+
+
+def _run_job(
+    job_id: str, progress, func: Callable[..., Any], args: tuple, kwargs: dict
+) -> Any:
+    _worker.job_id, _worker.progress = job_id, progress
+    try:
+        report_progress(0.0, RUNNING)
+        return func(*args, **kwargs)
+    finally:
+        _worker.job_id = _worker.progress = None
+
+
+class JobManager:
+    """Status records of the jobs run on one executor."""
+
+    def __init__(
+        self,
+        executor: psd_executor.TaskExecutor,
+        ttl: float = DEFAULT_TTL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.executor = executor
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._manager = None
+        if executor.kind == psd_executor.PROCESS:
+            # A manager queue is a proxy that can travel with each job, and a
+            # worker killed while writing to it only breaks its own connection.
+            self._manager = executor.context.Manager()
+            self._progress = self._manager.Queue()
+        else:
+            self._progress = queue.Queue()
+        threading.Thread(target=self._listen, name="job-progress", daemon=True).start()
+
+    @property
+    def workers(self) -> int:
+        return self.executor.workers
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                message = self._progress.get()
+            except Exception:
+                return  # the manager process is gone (shutdown)
+            if message is None:
+                return
+            job_id, fraction, stage = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                # Messages can arrive after the job finished; those are stale.
+                if job is None or job.status not in (QUEUED, RUNNING):
+                    continue
+                if job.status == QUEUED:
+                    job.status = RUNNING
+                    job.started = time.time()
+                job.progress = max(job.progress, fraction)
+                job.stage = stage
+
+    def _expire(self) -> None:
+        deadline = time.time() - self.ttl
+        with self._lock:
+            for job_id in [
+                job.id for job in self._jobs.values() if job.finished and job.finished < deadline
+            ]:
+                del self._jobs[job_id]
+
+    def submit(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        on_done: Optional[Callable[[Job], None]] = None,
+        **kwargs: Any,
+    ) -> Job:
+        """Queue ``func(*args, **kwargs)`` and return its :class:`Job`.
+
+        ``func`` and its arguments must be picklable and importable by the
+        workers (see :mod:`psd_executor`).  ``on_done(job)`` is
+        called in the server process once the job finished, whatever the
+        outcome (e.g. to delete its input file).
+
+        Raises:
+            QueueFull: If ``max_pending`` jobs are queued or running.
+        """
+        self._expire()
+        job = Job(uuid.uuid4().hex, created=time.time())
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.status in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs pending")
+            self._jobs[job.id] = job
+        future = self.executor.submit(_run_job, job.id, self._progress, func, args, kwargs)
+        future.add_done_callback(lambda f: self._finish(job, f, on_done))
+        return job
+
+    def _finish(
+        self, job: Job, future: Future, on_done: Optional[Callable[[Job], None]]
+    ) -> None:
+        with self._lock:
+            try:
+                job.result = future.result()
+                job.status = DONE
+                job.progress = 1.0
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = FAILED
+            job.stage = ""
+            job.finished = time.time()
+        try:
+            if on_done is not None:
+                on_done(job)
+        finally:
+            job._done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with ``job_id``; ``None`` if unknown or expired."""
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker count, TTL, the number of jobs in each status and the executor's counters."""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "ttl": self.ttl,
+            "max_pending": self.max_pending,
+            **counts,
+            "executor": self.executor.stats(),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
+        self._progress.put(None)
+        if self._manager is not None:
+            self._manager.shutdown()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Metadata-only loading of PSD/PSB files with psd-tools.
+
+``PSDImage.open`` reads every layer's channel image data and the merged
+image into memory, although the font and text code paths only look at the
+layer records and their tagged blocks.  :func:`open_metadata` hands
+psd-tools a copy of the file built by :func:`psd_sections.strip_image_data`
+instead: same header, resources, layer records and tagged blocks, with
+placeholder channels and an empty merged image.  Pixel data is never read
+from disk.
+
+Layer names, kinds, bounds, visibility, text and engine data are the same
+as with ``PSDImage.open``.  Anything that decodes pixels (``composite``,
+``topil``, ``numpy``) must not be used on the returned image.
+
+Usage:
+    python psd_metadata.py file.psd
+"""
+
+import io
+import sys
+
+try:
+    from psd_tools import PSDImage
+except ImportError:  # psd-tools é opcional: só open_metadata precisa dele
+    PSDImage = None
+
+import psd_sections
+
+
+def open_metadata(path: str) -> "PSDImage":
+    """Open ``path`` as a ``PSDImage`` holding only the layer metadata.
+
+    Files that :mod:`psd_sections` cannot parse are opened with a plain
+    ``PSDImage.open``.
+
+    Raises:
+        ImportError: If psd-tools is not installed.
+    """
+    if PSDImage is None:
+        raise ImportError("psd-tools is not installed (pip install psd-tools)")
+    try:
+        with open(path, "rb") as f:
+            data = psd_sections.strip_image_data(f)
+    except ValueError:
+        return PSDImage.open(path)
+    return PSDImage.open(io.BytesIO(data))
+
+
+def main(argv=None) -> None:
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 1:
+        print("Usage: python psd_metadata.py <file.psd>")
+        sys.exit(1)
+    psd = open_metadata(args[0])
+    print(f"{psd.width} x {psd.height}, {len(list(psd))} top-level layers")
+    for layer in psd.descendants():
+        print(f"  {layer.kind:<12} {layer.name}")
+
+
+if __name__ == "__main__":
+    main()
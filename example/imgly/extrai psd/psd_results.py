@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Compact result model for the font extractors.
+
+The extractors used to describe each layer with a dict of lists, repeating
+every font name string in each layer that uses it, which adds up when the
+results of thousands of files are kept in memory.  Here layers are
+``__slots__`` dataclasses, each font name is stored once in a
+:class:`FontTable` and layers refer to it with integer IDs held in
+``array`` objects (FontSet references and style runs).
+
+JSON dicts are only built by the ``to_dict`` methods, when the CLI or the
+API serialises a result.  They keep the keys of the old dicts.
+
+FontSet entries are resolved into a :class:`DocumentFontTable` once per
+document instead of once per layer.
+
+This module has no third-party dependencies.
+"""
+
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import engine_data
+
+# Typecode of the font ID arrays (unsigned int, at least 2 bytes).
+FONT_ID_TYPECODE = "I"
+
+# ID of FontSet entries that have no name (see DocumentFontTable.map_font_set).
+NO_FONT = -1
+
+
+def _id_array() -> array:
+    return array(FONT_ID_TYPECODE)
+
+
+class FontTable:
+    """Interned font names with stable integer IDs (0, 1, 2, ... in first-seen order)."""
+
+    __slots__ = ("names", "_ids")
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        """Return the ID of ``name``, adding it to the table if needed."""
+        font_id = self._ids.get(name)
+        if font_id is None:
+            font_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return font_id
+
+    def lookup(self, font_ids: Iterable[int]) -> List[str]:
+        """Return the names of ``font_ids``, in order."""
+        names = self.names
+        return [names[font_id] for font_id in font_ids]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._ids
+
+
+class DocumentFontTable(FontTable):
+    """The fonts of one document, with the FontSet entries resolved once.
+
+    Every text layer stores its own copy of the FontSet, usually the same
+    one.  :meth:`map_font_set` resolves a FontSet (:func:`engine_data.font_info`)
+    the first time it is seen and returns, for each of its entries, the ID
+    of the font in this table; later layers with the same FontSet get the
+    mapping back from a dict, so their runs resolve with index lookups.
+    Entries without a name map to :data:`NO_FONT`.
+    """
+
+    __slots__ = ("infos", "_font_set_ids")
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self.infos: List[Optional[engine_data.FontInfo]] = []
+        self._font_set_ids: Dict[Tuple, Tuple[int, ...]] = {}
+        super().__init__(names)
+
+    def intern(self, name: str, info: Optional[engine_data.FontInfo] = None) -> int:
+        font_id = super().intern(name)
+        if font_id == len(self.infos):
+            self.infos.append(info)
+        elif info is not None and self.infos[font_id] is None:
+            self.infos[font_id] = info
+        return font_id
+
+    def map_font_set(self, font_set: List[Any]) -> Tuple[int, ...]:
+        """Return the font ID of each entry of ``font_set`` (``NO_FONT`` if unnamed)."""
+        try:
+            key = tuple(
+                tuple(entry.items()) if isinstance(entry, dict) else entry
+                for entry in font_set
+            )
+            font_ids = self._font_set_ids.get(key)
+        except TypeError:  # unhashable values: resolve without caching
+            key, font_ids = None, None
+        if font_ids is None:
+            font_ids = tuple(self._resolve(entry) for entry in font_set)
+            if key is not None:
+                self._font_set_ids[key] = font_ids
+        return font_ids
+
+    def _resolve(self, entry: Any) -> int:
+        info = engine_data.font_info(entry)
+        if not info.postscript_name:
+            return NO_FONT
+        return self.intern(info.postscript_name, info)
+
+    def used_font_ids(self, engine: Dict[str, Any], resource_dict: Dict[str, Any]) -> List[int]:
+        """IDs of the fonts a text layer uses, like :func:`engine_data.fonts_from_engine_dicts`.
+
+        Sorted by font name, without duplicates or unnamed entries.
+        """
+        font_set, indices = engine_data.used_font_indices(engine, resource_dict)
+        font_ids = self.map_font_set(font_set)
+        used = {font_ids[index] for index in indices}
+        used.discard(NO_FONT)
+        names = self.names
+        return sorted(used, key=lambda font_id: names[font_id])
+
+    def font_list(self) -> List[Dict[str, Any]]:
+        """The table as JSON-ready dicts, in ID order.
+
+        ``family`` and ``style`` are guessed from the PostScript name (see
+        :class:`engine_data.FontInfo`); fonts interned by name only get
+        nothing else.
+        """
+        return [
+            (info or engine_data.font_info({"Name": name})).as_dict()
+            for name, info in zip(self.names, self.infos)
+        ]
+
+
+@dataclass(slots=True)
+class TextLayer:
+    """A text layer and the fonts it references, as IDs into a :class:`FontTable`."""
+
+    name: str
+    path: str
+    text: str
+    visible: bool
+    # Fonts in extraction order (FontSet entries, style sheet fonts, ...),
+    # duplicates kept as the extractors found them.
+    font_ids: array = field(default_factory=_id_array)
+    # Style runs as flat (character count, font ID) pairs; created on the
+    # first run (the psd-tools paths never add any).
+    runs: Optional[array] = None
+
+    def add_run(self, length: int, font_id: int) -> None:
+        if self.runs is None:
+            self.runs = _id_array()
+        self.runs.append(length)
+        self.runs.append(font_id)
+
+    def iter_runs(self) -> Iterator[Tuple[int, int]]:
+        """Yield ``(length, font_id)`` for each style run."""
+        runs = self.runs or ()
+        return zip(runs[::2], runs[1::2])
+
+    def fonts(self, table: FontTable) -> List[str]:
+        return table.lookup(self.font_ids)
+
+    def to_dict(self, table: FontTable) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "text": self.text,
+            "visible": self.visible,
+            "fonts_found": self.fonts(table),
+        }
+
+
+@dataclass(slots=True)
+class LayerResult:
+    """A layer of the hierarchy; ``text`` is set for text layers."""
+
+    name: str
+    kind: str
+    visible: bool
+    path: str
+    text: Optional[TextLayer] = None
+    sublayers: List["LayerResult"] = field(default_factory=list)
+
+    def iter_text_layers(self) -> Iterator[TextLayer]:
+        """Yield this layer's text layer and those of its sublayers, depth first."""
+        if self.text is not None:
+            yield self.text
+        for sublayer in self.sublayers:
+            yield from sublayer.iter_text_layers()
+
+    def to_dict(self, table: FontTable) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "visible": self.visible,
+            "path": self.path,
+            "text_layers": [layer.to_dict(table) for layer in self.iter_text_layers()],
+            "sublayers": [sublayer.to_dict(table) for sublayer in self.sublayers],
+        }
+
+
+@dataclass(slots=True)
+class DocumentResult:
+    """Top-level layers of one file and the font table they share."""
+
+    source_file: str
+    width: int
+    height: int
+    layers: List[LayerResult] = field(default_factory=list)
+    fonts: DocumentFontTable = field(default_factory=DocumentFontTable)
+
+    def iter_text_layers(self) -> Iterator[TextLayer]:
+        for layer in self.layers:
+            yield from layer.iter_text_layers()
+
+    def font_names(self) -> List[str]:
+        """Sorted names of the fonts referenced by the text layers."""
+        used = set()
+        for layer in self.iter_text_layers():
+            used.update(layer.font_ids)
+        return sorted(self.fonts.lookup(used))
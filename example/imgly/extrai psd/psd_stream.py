@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Seekable view of an upload that is still arriving.
+
+The section readers (:mod:`psd_sections`) and the streaming scanner
+(``scan_fonts_binary.scan_stream_for_fonts``) need a seekable file object,
+but only ever jump forward past pixel data or back over a few header
+bytes.  :class:`SpooledUpload` wraps an iterator of byte chunks (an HTTP
+request body, a ZIP member, ...) and pulls chunks from it only when a read
+needs bytes that have not arrived yet.  Every chunk is also written to a
+``tempfile.SpooledTemporaryFile``, which stays in memory up to
+``max_memory`` bytes and moves to a temporary file on disk past it, so
+backward seeks and later reads (fingerprint, fallback scans) are served
+from the spool without going back to the source.
+
+Seeking does not read anything; only a read past the received bytes, or a
+seek relative to the end (:meth:`SpooledUpload.drain`), pulls from the
+source.  A file parsed section by section is therefore fed to the parser
+as it arrives, and the parse finishes when its last byte is received.
+``receive_time`` and ``write_time`` add up the seconds spent waiting for
+the source and writing to the spool, wherever the reads that caused them
+happened.
+
+This module has no third-party dependencies.
+"""
+
+import tempfile
+import time
+from typing import Iterable, Optional
+
+# Uploads up to this size never touch the disk.
+DEFAULT_MAX_MEMORY = 8 * 1024 * 1024
+
+
+class SpooledUpload:
+    """Read-only, seekable file object over an iterator of byte chunks."""
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        max_memory: int = DEFAULT_MAX_MEMORY,
+        dir: Optional[str] = None,
+    ) -> None:
+        self.max_memory = max_memory
+        self.received = 0
+        self.complete = False
+        self.receive_time = 0.0
+        self.write_time = 0.0
+        self._chunks = iter(chunks)
+        self._spool = tempfile.SpooledTemporaryFile(max_size=max_memory, dir=dir)
+        self._pos = 0
+
+    @property
+    def size(self) -> Optional[int]:
+        """Total size once the source is exhausted, ``None`` before."""
+        return self.received if self.complete else None
+
+    @property
+    def on_disk(self) -> bool:
+        """Whether the spool moved to a temporary file."""
+        # SpooledTemporaryFile rolls over once it holds more than max_size.
+        return self.received > self.max_memory
+
+    def _fill(self, end: Optional[int]) -> None:
+        """Pull chunks until ``end`` bytes were received (all of them for ``None``)."""
+        if self.complete or (end is not None and self.received >= end):
+            return
+        self._spool.seek(self.received)
+        while end is None or self.received < end:
+            start = time.perf_counter()
+            chunk = next(self._chunks, None)
+            received = time.perf_counter()
+            self.receive_time += received - start
+            if chunk is None:
+                self.complete = True
+                break
+            self._spool.write(chunk)
+            self.write_time += time.perf_counter() - received
+            self.received += len(chunk)
+
+    def drain(self) -> int:
+        """Receive the rest of the source and return the total size."""
+        self._fill(None)
+        return self.received
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            self._fill(None)
+            end = self.received
+        else:
+            self._fill(self._pos + size)
+            end = min(self._pos + size, self.received)
+        if end <= self._pos:
+            return b""
+        self._spool.seek(self._pos)
+        data = self._spool.read(end - self._pos)
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 0:
+            pos = offset
+        elif whence == 1:
+            pos = self._pos + offset
+        elif whence == 2:
+            pos = self.drain() + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        """Drop the spool; the rest of the source is left unread."""
+        self._spool.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+String extraction for the binary PSD scanners.
+
+Photoshop stores text in two encodings: plain ASCII (descriptor keys, XMP,
+the ``Txt2`` engine data) and UTF-16BE (EngineData strings written as
+``(\\xfe\\xff...)``, descriptor ``TEXT`` values, Unicode layer names).  The
+older scanners deleted every ``\\x00`` byte of the file to turn the UTF-16
+text into "ASCII", which copies the whole buffer, glues unrelated bytes
+into fake words, loses non-Latin characters and breaks file offsets.
+
+The functions here work on the original buffer instead (``bytes``,
+``bytearray``, ``memoryview`` or ``mmap.mmap``) and report offsets into it.
+
+This module has no third-party dependencies.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+ASCII = "ascii"
+UTF16 = "utf-16-be"
+
+# Upper bound for a single EngineData string, so an unterminated "(\xfe\xff"
+# in binary data cannot make the regex run to the end of the buffer.
+MAX_ENGINE_STRING = 4096
+
+_ESCAPE_RE = re.compile(rb"\\(.)", re.S)
+
+
+@lru_cache(maxsize=None)
+def _strings_re(min_length: int) -> "re.Pattern[bytes]":
+    return re.compile(
+        # Cheap first-byte test before trying the alternatives
+        rb"(?=[\x00\x20-\x7e])(?:"
+        # EngineData string: "(" + BOM + UTF-16BE with backslash escapes + ")"
+        rb"\(\xfe\xff(?P<engine>(?:[^\\)]|\\.){0,%d})\)"
+        # Bare UTF-16BE run of Latin-1 characters
+        rb"|(?P<utf16>(?:\x00[\x20-\x7e\xa0-\xff]){%d,})"
+        # Printable ASCII run; "(" only when it does not open a UTF-16 string
+        rb"|(?P<ascii>(?:[\x20-\x27\x29-\x7e]|\((?!\xfe\xff)){%d,})"
+        rb")"
+        % (MAX_ENGINE_STRING, min_length, min_length),
+        re.S,
+    )
+
+
+def iter_strings(
+    buf, min_length: int = 3, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[int, str, str]]:
+    """Yield ``(file_offset, encoding, text)`` for the strings in ``buf``.
+
+    ``encoding`` is :data:`ASCII` or :data:`UTF16`.  ``file_offset`` is the
+    offset of the first byte of the string content (after the ``(\\xfe\\xff``
+    prefix for EngineData strings).  EngineData strings are reported
+    whatever their length, since they are explicitly delimited; bare runs
+    must be at least ``min_length`` characters long.  ``start`` and ``end``
+    limit the search to part of ``buf``.  Only the matched strings are
+    copied, never the whole buffer.
+    """
+    if end is None:
+        end = len(buf)
+    for match in _strings_re(min_length).finditer(buf, start, end):
+        kind = match.lastgroup
+        if kind == "engine":
+            raw = _ESCAPE_RE.sub(rb"\1", match.group("engine"))
+            yield match.start("engine"), UTF16, raw.decode(UTF16, errors="replace")
+        elif kind == "utf16":
+            yield match.start(), UTF16, match.group().decode(UTF16)
+        else:
+            yield match.start(), ASCII, match.group().decode(ASCII)
+
+
+def engine_string(
+    buf, key: str, start: int = 0, end: Optional[int] = None
+) -> Optional[str]:
+    """Return the first EngineData string stored under ``/key``, or ``None``.
+
+    For example ``engine_string(payload, "Text")`` reads the text of a
+    ``TySh`` payload.  Only the first occurrence of the key is considered.
+    """
+    if end is None:
+        end = len(buf)
+    pattern = re.compile(rb"/" + re.escape(key.encode("ascii")) + rb"\s*(?=\(\xfe\xff)")
+    match = pattern.search(buf, start, end)
+    if match is None:
+        return None
+    for _offset, encoding, text in iter_strings(buf, start=match.end(), end=end):
+        return text
+    return None
+
+
+def find_string_spans(buf, needle: str) -> List[Tuple[int, int]]:
+    """Return the sorted ``(start, end)`` file offsets where ``needle`` is stored.
+
+    Both the ASCII/Latin-1 and the UTF-16BE encodings of ``needle`` are
+    searched directly in ``buf``; ``end - start`` is the length of the
+    encoding found, i.e. ``2 * len(needle)`` for UTF-16BE.
+    """
+    spans = []
+    for encoded in (needle.encode("latin-1", errors="ignore"), needle.encode(UTF16)):
+        if not encoded:
+            continue
+        spans.extend(m.span() for m in re.finditer(re.escape(encoded), buf))
+    return sorted(set(spans))
+
+
+def find_string_offsets(buf, needle: str) -> List[int]:
+    """Return the sorted file offsets where ``needle`` is stored.
+
+    Like :func:`find_string_spans`, without the end offsets.
+    """
+    return sorted({start for start, _end in find_string_spans(buf, needle)})
+
+
+def text_around(buf, offset: int, radius: int, min_length: int = 3) -> str:
+    """Return the strings stored within ``radius`` bytes of ``offset``.
+
+    Handy for showing the context of a match found with
+    :func:`find_string_offsets`.
+    """
+    strings = iter_strings(buf, min_length, max(0, offset - radius), offset + radius)
+    return " ".join(text for _offset, _encoding, text in strings)
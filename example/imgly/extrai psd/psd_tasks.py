@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Extraction work that ``psd_api`` hands to its executors.
+
+``psd_api`` runs its CPU-bound calls through a
+:class:`psd_executor.TaskExecutor`, possibly in worker processes.  The
+functions those workers run live here rather than in ``psd_api``, so a
+worker only needs the extraction modules (:data:`PRELOAD_MODULES`, loaded
+once by the forkserver) and never builds a Flask app or an upload folder.
+
+The result cache is configured from the same environment variables as the
+API (``PSD_CACHE_DISABLED``, ``PSD_CACHE_DIR``, ``PSD_CACHE_MAX_BYTES``) and
+opened once per process by :func:`result_cache`.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import engine_data
+import extract_psd_fonts
+import psd_cache
+import psd_jobs
+import psd_sections
+import scan_fonts_binary
+
+# Imported by the forkserver before it forks any worker.  ``__main__`` is
+# the script being run (e.g. psd_api.py): preloading it keeps the workers
+# from importing it again each.
+PRELOAD_MODULES = (
+    "__main__",
+    "engine_data",
+    "extract_psd_fonts",
+    "psd_cache",
+    "psd_jobs",
+    "psd_sections",
+    "psd_tasks",
+    "scan_fonts_binary",
+)
+
+_result_cache: Optional[psd_cache.ResultCache] = None
+_result_cache_opened = False
+_result_cache_lock = threading.Lock()
+
+
+def result_cache() -> Optional[psd_cache.ResultCache]:
+    """The result cache of this process; ``None`` with ``PSD_CACHE_DISABLED=1``."""
+    global _result_cache, _result_cache_opened
+    with _result_cache_lock:
+        if not _result_cache_opened:
+            if os.environ.get("PSD_CACHE_DISABLED") != "1":
+                _result_cache = psd_cache.ResultCache(
+                    os.environ.get("PSD_CACHE_DIR"),
+                    max_bytes=int(
+                        os.environ.get("PSD_CACHE_MAX_BYTES", psd_cache.DEFAULT_MAX_BYTES)
+                    ),
+                )
+            _result_cache_opened = True
+        return _result_cache
+
+
+def txt2_fonts(data: bytes) -> Optional[List[str]]:
+    """Document fonts from the payload of a global ``Txt2`` block; ``None`` if invalid."""
+    try:
+        return engine_data.read_txt2_fonts(data).fonts
+    except ValueError:
+        return None
+
+
+def analysis_result(
+    filename: str,
+    file_id: str,
+    summary: psd_sections.PSDProbe,
+    fonts: List[str],
+    method: str,
+    file_size: int,
+    fingerprint: str,
+    **metadata: Any,
+) -> Dict[str, Any]:
+    """Response body of one analysis (``/api/analyze-psd``, jobs and batches)."""
+    return {
+        "success": True,
+        "file_info": {
+            "original_name": filename,
+            "file_id": file_id,
+            "size_bytes": file_size,
+            "size_mb": round(file_size / 1024 / 1024, 2),
+            # identifies repeated uploads from the metadata alone
+            "fingerprint": fingerprint,
+            "psd": summary.as_dict(),
+        },
+        "analysis": {
+            "fonts_found": fonts,
+            "total_fonts": len(fonts),
+            "timestamp": datetime.now().isoformat(),
+        },
+        "metadata": dict(method=method, **metadata, version="1.0.0"),
+    }
+
+
+def analyze_file(
+    path: str, filename: str, file_id: str, method: str, refresh: bool = False
+) -> Dict[str, Any]:
+    """The ``/api/analyze-psd`` analysis of a saved upload, reporting progress by stage.
+
+    ``method`` is ``"txt2"`` (falls back to the binary scan without a usable
+    ``Txt2``) or ``"binary_scan"``; ``refresh`` bypasses the result cache.
+    """
+    psd_jobs.report_progress(0.1, "probe")
+    summary = psd_sections.probe_file(path)
+    psd_jobs.report_progress(0.2, method)
+    fonts = None
+    if method == "txt2":
+        try:
+            with open(path, "rb") as f:
+                fonts = extract_psd_fonts.document_fonts_from_txt2(f)
+        except ValueError:
+            fonts = None
+    if fonts is None:
+        method = "binary_scan"
+        psd_jobs.report_progress(0.3, method)
+        fonts = scan_fonts_binary.scan_file_for_fonts_cached(
+            path, result_cache(), refresh, sections_only=True
+        )
+    psd_jobs.report_progress(0.9, "fingerprint")
+    return analysis_result(
+        filename, file_id, summary, fonts, method,
+        os.path.getsize(path), psd_cache.quick_fingerprint(path),
+    )
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Single-pass layer visitor for the psd-tools based extractors.
+
+The extraction methods of ``psd_font_extractor_v2`` each walked the layer
+tree of the same ``PSDImage`` on their own.  Here each method is a
+:class:`LayerExtractor` and :func:`walk` visits every layer once, handing
+it to all the registered extractors in order.  Per-layer values that are
+expensive to build (``str(layer._record)``) are computed on first use and
+cached in the :class:`LayerContext`, so extractors that need them share
+one copy; in ``psd_font_extractor_v2`` only method 3 reads it.
+Document-level work stays in ``begin`` and ``end``: method 4 still
+stringifies ``psd._record`` once per document there.
+
+Extractors see the layers in the order of the old recursive walks: the
+top-level layers of the document, each followed by its sublayers when the
+layer has a ``layers`` attribute.
+
+This module has no third-party dependencies; it only calls attributes of
+the ``PSDImage`` it is given.
+"""
+
+from typing import Any, List, Optional, Sequence, Set
+
+
+class LayerContext:
+    """A layer being visited, with values cached for all the extractors."""
+
+    __slots__ = ("layer", "depth", "_record_str")
+
+    def __init__(self, layer: Any, depth: int) -> None:
+        self.layer = layer
+        self.depth = depth
+        self._record_str: Optional[str] = None
+
+    @property
+    def record_str(self) -> str:
+        """``str(layer._record)``, computed on first use."""
+        if self._record_str is None:
+            self._record_str = str(self.layer._record)
+        return self._record_str
+
+
+class LayerExtractor:
+    """Base class of the extractors run by :func:`walk`.
+
+    ``begin`` and ``end`` are called once per document, before and after
+    the layers; ``visit`` once per layer.  Found font names go in
+    ``fonts``.
+    """
+
+    def __init__(self) -> None:
+        self.fonts: Set[str] = set()
+
+    def begin(self, psd: Any) -> None:
+        pass
+
+    def visit(self, context: LayerContext) -> None:
+        pass
+
+    def end(self, psd: Any) -> None:
+        pass
+
+    def result(self) -> Set[str]:
+        return self.fonts
+
+
+def _visit(layer: Any, depth: int, extractors: Sequence[LayerExtractor]) -> None:
+    context = LayerContext(layer, depth)
+    for extractor in extractors:
+        extractor.visit(context)
+    if hasattr(layer, "layers"):
+        for sublayer in layer.layers:
+            _visit(sublayer, depth + 1, extractors)
+
+
+def walk(psd: Any, extractors: Sequence[LayerExtractor]) -> List[Set[str]]:
+    """Run ``extractors`` over ``psd`` in one traversal.
+
+    Returns:
+        The result of each extractor, in the order given.
+    """
+    for extractor in extractors:
+        extractor.begin(psd)
+    for layer in psd:
+        _visit(layer, 0, extractors)
+    for extractor in extractors:
+        extractor.end(psd)
+    return [extractor.result() for extractor in extractors]
@@ -5,18 +5,35 @@ Leitor simples para análise de estrutura PSD
 
 import sys
 import os
-from psd_tools import PSDImage
+try:
+    from psd_tools import PSDImage
+except ImportError:  # psd-tools só é necessário para a listagem detalhada
+    PSDImage = None
+
+import psd_metadata
+import psd_sections
+
+def print_probe_summary(psd_path):
+    """Resumo lido só do cabeçalho e dos cabeçalhos das layers (psd_sections.probe)"""
+    summary = psd_sections.probe_file(psd_path)
+    header = summary.header
+    print(f"[INFO] Arquivo: {os.path.basename(psd_path)}")
+    print(f"[INFO] Formato: {'PSB' if header.is_psb else 'PSD'}")
+    print(f"[INFO] Dimensões: {header.width} x {header.height}")
+    print(f"[INFO] Modo de cor: {psd_sections.COLOR_MODE_NAMES.get(header.color_mode, header.color_mode)}")
+    print(f"[INFO] Profundidade: {header.depth} bits")
+    print(f"\n[LAYERS] Total de layers: {summary.layer_count}")
+    print(f"[LAYERS] Contém texto: {'sim' if summary.has_text else 'não'}")
 
 def analyze_psd_structure(psd_path):
     """Analisa a estrutura completa do PSD"""
     
     try:
-        psd = PSDImage.open(psd_path)
-        print(f"[INFO] Arquivo: {os.path.basename(psd_path)}")
-        print(f"[INFO] Dimensões: {psd.width} x {psd.height}")
-        print(f"[INFO] Modo de cor: {psd.color_mode}")
-        
-        print(f"\n[LAYERS] Total de layers: {len(list(psd))}")
+        print_probe_summary(psd_path)
+        if PSDImage is None:
+            print("\n[AVISO] psd-tools não instalado: listagem detalhada indisponível")
+            return
+        psd = psd_metadata.open_metadata(psd_path)
         
         def print_layer_info(layer, depth=0):
             indent = "  " * depth
@@ -124,16 +141,28 @@ def analyze_psd_structure(psd_path):
         traceback.print_exc()
 
 def main():
-    if len(sys.argv) != 2:
-        print("Uso: python simple_psd_reader.py <arquivo.psd>")
+    args = sys.argv[1:]
+    probe_only = '--probe' in args
+    if probe_only:
+        args.remove('--probe')
+    if len(args) != 1:
+        print("Uso: python simple_psd_reader.py <arquivo.psd> [--probe]")
         sys.exit(1)
     
-    psd_path = sys.argv[1]
+    psd_path = args[0]
     if not os.path.exists(psd_path):
         print(f"Arquivo não encontrado: {psd_path}")
         sys.exit(1)
     
-    analyze_psd_structure(psd_path)
+    if probe_only:
+        # Só o resumo: não abre o PSDImage
+        try:
+            print_probe_summary(psd_path)
+        except ValueError as e:
+            print(f"[ERRO] {e}")
+            sys.exit(1)
+    else:
+        analyze_psd_structure(psd_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
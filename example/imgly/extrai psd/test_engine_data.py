@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the font lookup of engine_data on psd-tools' EngineData objects.
+
+psd-tools returns its own engine_data.Dict/List/Integer/String wrappers
+instead of builtins; the lookup must resolve the same fonts from them as
+from the dictionaries built by parse_engine_data.
+"""
+
+import unittest
+
+import engine_data
+
+try:
+    from psd_tools.psd.engine_data import Dict, Integer, List, String
+except ImportError:  # psd-tools is optional
+    Integer = None
+
+
+def _run(font_index):
+    return {"StyleSheet": {"StyleSheetData": {"Font": font_index}}}
+
+
+@unittest.skipIf(Integer is None, "psd-tools not installed")
+class PsdToolsEngineDictTest(unittest.TestCase):
+    def setUp(self):
+        self.resource_dict = Dict({
+            "FontSet": List([
+                Dict({"Name": String("Arial-BoldMT"), "FontType": Integer(1), "Synthetic": Integer(0)}),
+                Dict({"Name": String("MyriadPro-Regular"), "FontType": Integer(0), "Synthetic": Integer(0)}),
+                Dict({"Name": String("AdobeInvisFont"), "FontType": Integer(0), "Synthetic": Integer(0)}),
+            ]),
+        })
+
+    def test_style_run_integer_indices(self):
+        engine = Dict({
+            "StyleRun": Dict({"RunArray": List([Dict(_run(Integer(1))), Dict(_run(Integer(0)))])}),
+        })
+        font_set, indices = engine_data.used_font_indices(engine, self.resource_dict)
+        self.assertEqual(indices, [1, 0])
+        self.assertTrue(all(type(i) is int for i in indices))
+        self.assertEqual(
+            engine_data.fonts_from_engine_dicts(engine, self.resource_dict),
+            ["Arial-BoldMT", "MyriadPro-Regular"],
+        )
+
+    def test_style_sheet_set_integer_index(self):
+        engine = Dict({"StyleSheetSet": Dict({"StyleSheetData": Dict({"Font": Integer(2)})})})
+        self.assertEqual(
+            engine_data.fonts_from_engine_dicts(engine, self.resource_dict),
+            ["AdobeInvisFont"],
+        )
+
+    def test_out_of_range_indices_are_dropped(self):
+        engine = Dict({
+            "StyleRun": Dict({"RunArray": List([Dict(_run(Integer(7))), Dict(_run(Integer(-1)))])}),
+        })
+        self.assertEqual(engine_data.used_font_indices(engine, self.resource_dict)[1], [])
+
+    def test_font_info(self):
+        info = engine_data.font_info(self.resource_dict["FontSet"][0])
+        self.assertEqual(info, engine_data.FontInfo("Arial-BoldMT", "Arial", "BoldMT", 1, False))
+
+
+class NativeEngineDictTest(unittest.TestCase):
+    def test_matches_parse_engine_data(self):
+        data = (
+            b"<< /EngineDict << /StyleRun << /RunArray [ << /StyleSheet << /StyleSheetData"
+            b" << /Font 1 >> >> >> ] >> >> /ResourceDict << /FontSet [ << /Name (Arial-BoldMT) >>"
+            b" << /Name (MyriadPro-Regular) >> ] >> >>"
+        )
+        parsed = engine_data.parse_engine_data(data)
+        self.assertEqual(
+            engine_data.fonts_from_engine_dicts(parsed["EngineDict"], parsed["ResourceDict"]),
+            ["MyriadPro-Regular"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
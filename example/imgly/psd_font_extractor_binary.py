@@ -9,8 +9,79 @@ import os
 import json
 import re
 import struct
-from psd_tools import PSDImage
-from psd_tools.constants import Tag
+try:
+    from psd_tools import PSDImage
+    from psd_tools.constants import Tag
+except ImportError:  # psd-tools é opcional: o leitor nativo (psd_sections) cobre o caso comum
+    PSDImage = None
+
+import engine_data
+import psd_metadata
+import psd_sections
+
+def fonts_from_tysh_payload(raw_bytes):
+    """
+    Procura nomes de fontes nos bytes de um bloco TySh.
+    Heurística do caminho psd-tools: os padrões genéricos também casam
+    palavras do EngineData, por isso o leitor nativo não a usa.
+    """
+    fonts_found = []
+    print(f"[DEBUG] Encontrados {len(raw_bytes)} bytes de dados")
+
+    # Converte para string legível ignorando erros
+    text_data = str(raw_bytes, 'utf-8', errors='ignore')
+
+    print(f"[DEBUG] Preview dos dados decodificados:")
+    print(f"[DEBUG] {text_data[:200]}...")
+
+    # Procura por padrões de nomes de fontes
+    font_patterns = [
+        # PostScript names
+        r'([A-Z][a-z]+(?:[A-Z][a-z]*)*-(?:Bold|Italic|Light|Regular|Medium|Black|Thin))',
+        r'([A-Z][a-z]+(?:[A-Z][a-z]*)*(?:-[A-Z][a-z]*)*)',
+        # Common font families
+        r'(Times New Roman|Arial|Helvetica|Courier|Verdana|Georgia|Calibri|Cambria)',
+        # Font family patterns
+        r'FontFamily[\\x00-\\x20]*([A-Za-z][A-Za-z0-9\\s-]*?)(?:[\\x00-\\x20]|$)',
+        r'PostScriptName[\\x00-\\x20]*([A-Za-z][A-Za-z0-9-]*?)(?:[\\x00-\\x20]|$)',
+        # Generic patterns
+        r'([A-Z][a-z]{2,}(?:[A-Z][a-z]+)*)',
+    ]
+
+    found_in_layer = set()
+
+    for pattern in font_patterns:
+        matches = re.findall(pattern, text_data)
+        for match in matches:
+            if isinstance(match, tuple):
+                match = match[0] if match[0] else match[1] if len(match) > 1 else ''
+
+            match = match.strip()
+            # Filtra resultados inválidos
+            if (len(match) > 3 and 
+                match not in ['Type', 'Text', 'Data', 'Object', 'Layer', 'Block', 'Tagged'] and
+                not re.match(r'^[0-9]+$', match)):
+
+                found_in_layer.add(match)
+                print(f"[MATCH] Possível fonte: {match}")
+
+    fonts_found.extend(list(found_in_layer))
+
+    # Método alternativo: procura sequências específicas
+    # Procura por null-terminated strings que podem ser fontes
+    strings = re.findall(rb'([A-Za-z][A-Za-z0-9\-]{3,30})\x00', raw_bytes)
+    for string_bytes in strings:
+        try:
+            string = string_bytes.decode('utf-8')
+            if (len(string) > 3 and 
+                any(char.isupper() for char in string) and
+                string not in ['Type', 'Text', 'Data', 'Object', 'Layer']):
+                fonts_found.append(string)
+                print(f"[NULL-TERM] Possível fonte: {string}")
+        except:
+            continue
+    
+    return fonts_found
 
 def extract_fonts_from_binary_tysh(layer):
     """Extrai fontes analisando dados binários do TySh"""
@@ -35,60 +106,7 @@ def extract_fonts_from_binary_tysh(layer):
                             raw_bytes = tag_data._data
                         
                         if raw_bytes and isinstance(raw_bytes, bytes):
-                            print(f"[DEBUG] Encontrados {len(raw_bytes)} bytes de dados")
-                            
-                            # Converte para string legível ignorando erros
-                            text_data = raw_bytes.decode('utf-8', errors='ignore')
-                            
-                            print(f"[DEBUG] Preview dos dados decodificados:")
-                            print(f"[DEBUG] {text_data[:200]}...")
-                            
-                            # Procura por padrões de nomes de fontes
-                            font_patterns = [
-                                # PostScript names
-                                r'([A-Z][a-z]+(?:[A-Z][a-z]*)*-(?:Bold|Italic|Light|Regular|Medium|Black|Thin))',
-                                r'([A-Z][a-z]+(?:[A-Z][a-z]*)*(?:-[A-Z][a-z]*)*)',
-                                # Common font families
-                                r'(Times New Roman|Arial|Helvetica|Courier|Verdana|Georgia|Calibri|Cambria)',
-                                # Font family patterns
-                                r'FontFamily[\\x00-\\x20]*([A-Za-z][A-Za-z0-9\\s-]*?)(?:[\\x00-\\x20]|$)',
-                                r'PostScriptName[\\x00-\\x20]*([A-Za-z][A-Za-z0-9-]*?)(?:[\\x00-\\x20]|$)',
-                                # Generic patterns
-                                r'([A-Z][a-z]{2,}(?:[A-Z][a-z]+)*)',
-                            ]
-                            
-                            found_in_layer = set()
-                            
-                            for pattern in font_patterns:
-                                matches = re.findall(pattern, text_data)
-                                for match in matches:
-                                    if isinstance(match, tuple):
-                                        match = match[0] if match[0] else match[1] if len(match) > 1 else ''
-                                    
-                                    match = match.strip()
-                                    # Filtra resultados inválidos
-                                    if (len(match) > 3 and 
-                                        match not in ['Type', 'Text', 'Data', 'Object', 'Layer', 'Block', 'Tagged'] and
-                                        not re.match(r'^[0-9]+$', match)):
-                                        
-                                        found_in_layer.add(match)
-                                        print(f"[MATCH] Possível fonte: {match}")
-                            
-                            fonts_found.extend(list(found_in_layer))
-                            
-                            # Método alternativo: procura sequências específicas
-                            # Procura por null-terminated strings que podem ser fontes
-                            strings = re.findall(rb'([A-Za-z][A-Za-z0-9\-]{3,30})\x00', raw_bytes)
-                            for string_bytes in strings:
-                                try:
-                                    string = string_bytes.decode('utf-8')
-                                    if (len(string) > 3 and 
-                                        any(char.isupper() for char in string) and
-                                        string not in ['Type', 'Text', 'Data', 'Object', 'Layer']):
-                                        fonts_found.append(string)
-                                        print(f"[NULL-TERM] Possível fonte: {string}")
-                                except:
-                                    continue
+                            fonts_found.extend(fonts_from_tysh_payload(raw_bytes))
                         else:
                             print(f"[DEBUG] Não foi possível acessar dados binários")
                             
@@ -162,6 +180,72 @@ def extract_from_text_engine_data(layer):
     
     return fonts_found
 
+def extract_all_fonts_native(psd_path):
+    """
+    Mesmo percurso do psd-tools (camadas de nível superior) sem o PSDImage:
+    o índice de camadas vem do psd_sections e o TySh de cada camada é uma
+    memoryview sobre o mmap do arquivo, lida pelo engine_data sem cópia.
+    """
+    with open(psd_path, 'rb') as f:
+        index = psd_sections.read_layer_index(f)
+    print(f"[INFO] Dimensões: {index.header.width} x {index.header.height}")
+    
+    all_fonts = set()
+    with psd_sections.map_file(psd_path) as mm:
+        tysh = psd_sections.layer_block_views(mm, 'TySh')
+        
+        for i, node in enumerate(psd_sections.build_layer_tree(index.layers), 1):
+            record = node.record
+            if record.kind != 'type':
+                continue
+            payload = tysh[record.index].view
+            try:
+                tables = engine_data.read_engine_tables(payload)
+            except ValueError:
+                tables = engine_data.EngineTables({}, {})
+            print(f"\n[LAYER {i}] Analisando: '{record.name}'")
+            print(f"[INFO] Texto: '{tables.text.rstrip(chr(13))}'")
+            
+            # FontSet/StyleRun do EngineData: já são as fontes usadas pela
+            # camada, sem a varredura heurística do payload
+            layer_fonts = set(tables.fonts)
+            all_fonts.update(layer_fonts)
+            
+            if layer_fonts:
+                print(f"[RESULTADO] Fontes desta layer: {sorted(layer_fonts)}")
+            else:
+                print(f"[AVISO] Nenhuma fonte encontrada")
+    
+    return all_fonts
+
+def extract_all_fonts_psd_tools(psd_path):
+    psd = psd_metadata.open_metadata(psd_path)
+    print(f"[INFO] Dimensões: {psd.width} x {psd.height}")
+    
+    all_fonts = set()
+    
+    for i, layer in enumerate(psd, 1):
+        if layer.kind == 'type':
+            print(f"\n[LAYER {i}] Analisando: '{layer.name}'")
+            print(f"[INFO] Texto: '{layer.text}'")
+            
+            # Método 1: Análise binária
+            binary_fonts = extract_fonts_from_binary_tysh(layer)
+            
+            # Método 2: text_data
+            engine_fonts = extract_from_text_engine_data(layer)
+            
+            # Combina resultados
+            layer_fonts = set(binary_fonts + engine_fonts)
+            all_fonts.update(layer_fonts)
+            
+            if layer_fonts:
+                print(f"[RESULTADO] Fontes desta layer: {sorted(layer_fonts)}")
+            else:
+                print(f"[AVISO] Nenhuma fonte encontrada")
+    
+    return all_fonts
+
 def main():
     if len(sys.argv) != 2:
         print("Uso: python psd_font_extractor_binary.py <arquivo.psd>")
@@ -176,30 +260,13 @@ def main():
     print(f"[INFO] Extraindo fontes (análise binária): {os.path.basename(psd_path)}")
     
     try:
-        psd = PSDImage.open(psd_path)
-        print(f"[INFO] Dimensões: {psd.width} x {psd.height}")
-        
-        all_fonts = set()
-        
-        for i, layer in enumerate(psd, 1):
-            if layer.kind == 'type':
-                print(f"\n[LAYER {i}] Analisando: '{layer.name}'")
-                print(f"[INFO] Texto: '{layer.text}'")
-                
-                # Método 1: Análise binária
-                binary_fonts = extract_fonts_from_binary_tysh(layer)
-                
-                # Método 2: text_data
-                engine_fonts = extract_from_text_engine_data(layer)
-                
-                # Combina resultados
-                layer_fonts = set(binary_fonts + engine_fonts)
-                all_fonts.update(layer_fonts)
-                
-                if layer_fonts:
-                    print(f"[RESULTADO] Fontes desta layer: {sorted(layer_fonts)}")
-                else:
-                    print(f"[AVISO] Nenhuma fonte encontrada")
+        try:
+            all_fonts = extract_all_fonts_native(psd_path)
+        except ValueError as e:
+            if PSDImage is None:
+                raise
+            print(f"[DEBUG] Leitor nativo falhou ({e}), usando psd-tools")
+            all_fonts = extract_all_fonts_psd_tools(psd_path)
         
         print(f"\n{'='*60}")
         print("FONTES EXTRAÍDAS (ANÁLISE BINÁRIA)")
@@ -0,0 +1,1022 @@
+#!/usr/bin/env python3
+"""
+Minimal reader for the section layout of PSD/PSB files.
+
+Only the header and the length fields of each section are read, so callers
+can jump straight to the metadata they need (image resources, layer records
+and tagged blocks) without touching pixel data.  :func:`read_layer_index`
+also decodes the fixed fields of each layer record (bounds, flags, name,
+group markers and tagged block offsets), which is all most extractors need
+from ``psd_tools.PSDImage``; :func:`probe` reads even less to summarise a
+file (size, color mode, layer count, text layers).
+:func:`iter_document_block_views` walks the
+same structure over an in-memory buffer or ``mmap`` and hands out
+``memoryview`` slices, so no block data is copied.  A PSD/PSB file is laid
+out as follows:
+
+    File Header            26 bytes ("8BPS", version 1 = PSD, 2 = PSB)
+    Color Mode Data        4-byte length + data
+    Image Resources        4-byte length + data
+    Layer and Mask Info    4-byte (PSD) / 8-byte (PSB) length + data
+        Layer Info         length + layer count + layer records
+                           + channel image data
+        Global Layer Mask  4-byte length + data
+        Tagged blocks      "8BIM"/"8B64" + key + length + data
+    Image Data             merged image, up to the end of the file
+
+This module has no third-party dependencies.
+"""
+
+import mmap
+import re
+import struct
+import sys
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+HEADER_SIZE = 26
+
+# ``file_size`` for streams that are still arriving: sections are bounded by
+# their own length fields and a short read raises ValueError.
+UNKNOWN_SIZE = sys.maxsize
+
+TAGGED_BLOCK_SIGNATURES = (b"8BIM", b"8B64")
+
+# Tagged blocks whose length field is 8 bytes wide in PSB files.
+PSB_LONG_LENGTH_KEYS = {
+    b"LMsk", b"Lr16", b"Lr32", b"Layr", b"Mt16", b"Mt32", b"Mtrn",
+    b"Alph", b"FMsk", b"lnk2", b"FEid", b"FXid", b"PxSD",
+}
+
+# Tagged blocks that hold a nested Layer Info structure (16/32-bit files).
+LAYER_INFO_KEYS = {b"Lr16", b"Lr32", b"Layr"}
+
+# Tagged blocks that hold text engine data: ``TySh`` (one per text layer)
+# and ``Txt2`` (document-wide text engine data).
+ENGINE_DATA_KEYS = (b"TySh", b"Txt2")
+
+ENGINE_DATA_HEADER_RE = re.compile(rb"8B(?:IM|64)(TySh|Txt2)")
+
+# Section divider types of the ``lsct``/``lsdk`` tagged blocks.
+SECTION_OTHER = 0
+SECTION_OPEN_FOLDER = 1
+SECTION_CLOSED_FOLDER = 2
+SECTION_DIVIDER = 3  # hidden record that closes a group
+
+SECTION_DIVIDER_KEYS = (b"lsct", b"lsdk")
+
+# Header color modes, using ``psd_tools``' ``ColorMode`` names.
+COLOR_MODE_NAMES = {
+    0: "BITMAP",
+    1: "GRAYSCALE",
+    2: "INDEXED",
+    3: "RGB",
+    4: "CMYK",
+    7: "MULTICHANNEL",
+    8: "DUOTONE",
+    9: "LAB",
+}
+
+# Tagged blocks that identify a layer kind, using ``psd_tools``' names.
+SMART_OBJECT_KEYS = {"SoLd", "SoLE", "PlLd", "plLd"}
+SHAPE_KEYS = {"vscg", "vmsk", "vsms", "vogk"}
+
+
+class PSDHeader(NamedTuple):
+    version: int
+    channels: int
+    height: int
+    width: int
+    depth: int
+    color_mode: int
+
+    @property
+    def is_psb(self) -> bool:
+        return self.version == 2
+
+
+class TaggedBlock(NamedTuple):
+    """Position of a tagged block's data in the file."""
+
+    key: str
+    offset: int
+    length: int
+
+
+class LayerRecord(NamedTuple):
+    """Fixed fields of a layer record, with the offsets of its tagged blocks.
+
+    Records are listed in file order, bottom layer first, as in
+    ``psd_tools``.  A group is stored as a :data:`SECTION_DIVIDER` record
+    (below its children) and a folder record carrying the group name
+    (above them); see :func:`build_layer_tree`.
+    """
+
+    index: int
+    name: str
+    top: int
+    left: int
+    bottom: int
+    right: int
+    channels: int
+    blend_mode: str
+    opacity: int
+    clipping: int
+    flags: int
+    section_type: int
+    layer_id: Optional[int]
+    blocks: Tuple[TaggedBlock, ...]
+
+    @property
+    def visible(self) -> bool:
+        return not self.flags & 0x02
+
+    @property
+    def is_group(self) -> bool:
+        return self.section_type in (SECTION_OPEN_FOLDER, SECTION_CLOSED_FOLDER)
+
+    @property
+    def is_group_end(self) -> bool:
+        return self.section_type == SECTION_DIVIDER
+
+    @property
+    def is_text(self) -> bool:
+        return self.block("TySh") is not None
+
+    @property
+    def kind(self) -> str:
+        """Layer kind as named by ``psd_tools``: group, type, smartobject, shape or pixel."""
+        keys = {block.key for block in self.blocks}
+        if self.is_group:
+            return "group"
+        if "TySh" in keys:
+            return "type"
+        if keys & SMART_OBJECT_KEYS:
+            return "smartobject"
+        if keys & SHAPE_KEYS:
+            return "shape"
+        return "pixel"
+
+    def block(self, key: str) -> Optional[TaggedBlock]:
+        """Return the first tagged block with ``key``, or ``None``."""
+        for block in self.blocks:
+            if block.key == key:
+                return block
+        return None
+
+
+class PSDProbe(NamedTuple):
+    """Summary returned by :func:`probe`."""
+
+    header: PSDHeader
+    # Top-level layers and groups, as ``len(list(psd))`` in ``psd_tools``.
+    layer_count: int
+    # Every layer record, group markers included.
+    record_count: int
+    has_text: bool
+
+    def as_dict(self) -> Dict[str, object]:
+        header = self.header
+        return {
+            "format": "psb" if header.is_psb else "psd",
+            "width": header.width,
+            "height": header.height,
+            "channels": header.channels,
+            "depth": header.depth,
+            "color_mode": COLOR_MODE_NAMES.get(header.color_mode, str(header.color_mode)),
+            "layer_count": self.layer_count,
+            "record_count": self.record_count,
+            "has_text": self.has_text,
+        }
+
+
+class BlockView(NamedTuple):
+    """A tagged block with a zero-copy ``memoryview`` of its data."""
+
+    key: str
+    offset: int
+    length: int
+    view: memoryview
+
+
+class LayerIndex(NamedTuple):
+    """Result of :func:`read_layer_index`."""
+
+    header: PSDHeader
+    layers: List[LayerRecord]
+    # Document-level tagged blocks of the Layer and Mask Info section
+    # (``Txt2``, ``Patt``, ...), excluding the nested layer info blocks.
+    blocks: Tuple[TaggedBlock, ...]
+
+
+class LayerNode(NamedTuple):
+    """A layer in the group hierarchy built by :func:`build_layer_tree`."""
+
+    record: LayerRecord
+    children: List["LayerNode"]
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of file while reading PSD structure")
+    return data
+
+
+def _read_length(f: BinaryIO, wide: bool) -> int:
+    if wide:
+        return struct.unpack(">Q", _read_exact(f, 8))[0]
+    return struct.unpack(">I", _read_exact(f, 4))[0]
+
+
+def _stream_size(f: BinaryIO, file_size: Optional[int]) -> int:
+    """Return ``file_size`` (the length of ``f`` when ``None``) and rewind ``f``.
+
+    An explicit size spares the seek to the end, which would make a
+    stream read up to its last byte before any section is parsed.
+    """
+    if file_size is None:
+        f.seek(0, 2)
+        file_size = f.tell()
+    f.seek(0)
+    return file_size
+
+
+def read_header(f: BinaryIO) -> PSDHeader:
+    """Read the 26-byte file header at the current position.
+
+    Raises:
+        ValueError: If the data is not a PSD/PSB header.
+    """
+    data = _read_exact(f, HEADER_SIZE)
+    signature, version = struct.unpack_from(">4sH", data)
+    if signature != b"8BPS" or version not in (1, 2):
+        raise ValueError("Not a PSD/PSB file (bad signature or version)")
+    channels, height, width, depth, color_mode = struct.unpack_from(">HIIHH", data, 12)
+    return PSDHeader(version, channels, height, width, depth, color_mode)
+
+
+def _iter_raw_layer_records(
+    f: BinaryIO, start: int, end: int, version: int
+) -> Iterator[Tuple[tuple, int, int]]:
+    """Yield ``(fields, offset, length)`` for each layer record.
+
+    ``fields`` holds the fixed part of the record: ``(top, left, bottom,
+    right, channels, blend_mode, opacity, clipping, flags)``.  ``offset`` and
+    ``length`` locate the record's extra data.  The channel image data that
+    follows the records is never read.
+    """
+    f.seek(start)
+    if start + 2 > end:
+        return
+    count = abs(struct.unpack(">h", _read_exact(f, 2))[0])
+    channel_entry_size = 10 if version == 2 else 6
+    for _ in range(count):
+        # Rectangle (16) + channel count (2)
+        top, left, bottom, right, num_channels = struct.unpack(
+            ">iiiiH", _read_exact(f, 18)
+        )
+        f.seek(num_channels * channel_entry_size, 1)
+        # Blend mode signature/key, opacity, clipping, flags, filler and
+        # the extra data length.
+        blend_mode, opacity, clipping, flags, extra_length = struct.unpack(
+            ">4x4sBBBxI", _read_exact(f, 16)
+        )
+        offset = f.tell()
+        if offset + extra_length > end:
+            raise ValueError("Layer record extends past the layer info section")
+        fields = (
+            top, left, bottom, right, num_channels,
+            blend_mode.decode("latin-1"), opacity, clipping, flags,
+        )
+        yield fields, offset, extra_length
+        f.seek(offset + extra_length)
+
+
+def _iter_layer_records(
+    f: BinaryIO, start: int, end: int, version: int
+) -> Iterator[Tuple[int, int]]:
+    """Yield ``(offset, length)`` of each layer record's extra data.
+
+    The extra data holds the layer mask, blending ranges, the layer name and
+    the per-layer tagged blocks (``TySh``, ``luni``, ...).
+    """
+    for _fields, offset, length in _iter_raw_layer_records(f, start, end, version):
+        yield offset, length
+
+
+def _iter_tagged_blocks(
+    f: BinaryIO, start: int, end: int, version: int
+) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield ``(key, offset, length)`` for the tagged blocks in a range.
+
+    ``offset`` and ``length`` describe the block data, clipped to ``end``.
+    The file position is restored before every step.
+    """
+    pos = start
+    while pos + 12 <= end:
+        f.seek(pos)
+        signature = f.read(4)
+        if signature not in TAGGED_BLOCK_SIGNATURES:
+            # Writers pad blocks to 2 or 4 bytes relative to the block start
+            # without always counting the padding in the length field.
+            skipped = _skip_padding(f, pos, end)
+            if skipped is None:
+                break
+            pos = skipped
+            continue
+        key = _read_exact(f, 4)
+        length = _read_length(f, version == 2 and key in PSB_LONG_LENGTH_KEYS)
+        data_start = f.tell()
+        data_end = min(data_start + length, end)
+        yield key, data_start, data_end - data_start
+        pos = data_end
+
+
+def _iter_tagged_block_spans(
+    f: BinaryIO, start: int, end: int, version: int
+) -> Iterator[Tuple[int, int]]:
+    """Yield the data spans of the tagged blocks between ``start`` and ``end``.
+
+    Nested layer info blocks (``Lr16``/``Lr32``/``Layr``) are expanded into
+    their layer records so their channel image data is skipped as well.
+    """
+    for key, offset, length in _iter_tagged_blocks(f, start, end, version):
+        if key in LAYER_INFO_KEYS:
+            yield from _iter_layer_records(f, offset, offset + length, version)
+        else:
+            yield offset, length
+
+
+def _skip_padding(f: BinaryIO, pos: int, end: int) -> Optional[int]:
+    """Return the position of the next block signature within 3 bytes."""
+    f.seek(pos)
+    window = f.read(7)
+    for padding in range(1, 4):
+        if pos + padding + 12 > end:
+            return None
+        if window[padding:padding + 4] in TAGGED_BLOCK_SIGNATURES:
+            return pos + padding
+    return None
+
+
+def iter_metadata_spans(
+    f: BinaryIO, file_size: Optional[int] = None
+) -> Iterator[Tuple[int, int]]:
+    """Yield ``(offset, length)`` spans that may contain text metadata.
+
+    The spans cover the Image Resources section, the extra data of every
+    layer record and the additional tagged blocks of the Layer and Mask Info
+    section.  Color Mode Data, channel image data and the merged Image Data
+    section are skipped, so the amount of work depends on the metadata size
+    and not on the pixel count.
+
+    The file position is restored before every step, so callers may read
+    from the same file object between iterations.
+
+    ``file_size`` bounds the sections instead of the length of ``f``; pass
+    :data:`UNKNOWN_SIZE` for a stream whose length is not known yet (see
+    :func:`_stream_size`).
+
+    Raises:
+        ValueError: If the file is not a well-formed PSD/PSB file.
+    """
+    file_size = _stream_size(f, file_size)
+    header = read_header(f)
+    wide = header.is_psb
+
+    color_mode_length = _read_length(f, False)
+    f.seek(color_mode_length, 1)
+
+    resources_length = _read_length(f, False)
+    resources_start = f.tell()
+    if resources_start + resources_length > file_size:
+        raise ValueError("Image resources section extends past end of file")
+    if resources_length:
+        yield resources_start, resources_length
+    f.seek(resources_start + resources_length)
+
+    section_length = _read_length(f, wide)
+    section_start = f.tell()
+    section_end = min(section_start + section_length, file_size)
+    if not section_length:
+        return
+
+    layer_info_length = _read_length(f, wide)
+    layer_info_start = f.tell()
+    layer_info_end = min(layer_info_start + layer_info_length, section_end)
+    if layer_info_length:
+        yield from _iter_layer_records(
+            f, layer_info_start, layer_info_end, header.version
+        )
+
+    f.seek(layer_info_end)
+    if layer_info_end + 4 > section_end:
+        return
+    global_mask_length = _read_length(f, False)
+    blocks_start = f.tell() + global_mask_length
+    yield from _iter_tagged_block_spans(f, blocks_start, section_end, header.version)
+
+
+def _read_layer_record(
+    f: BinaryIO, index: int, fields: tuple, offset: int, length: int, version: int
+) -> LayerRecord:
+    """Decode the name and tagged blocks of one layer record's extra data."""
+    end = offset + length
+    f.seek(offset)
+    mask_length = _read_length(f, False)
+    f.seek(mask_length, 1)
+    blending_length = _read_length(f, False)
+    f.seek(blending_length, 1)
+    name_length = _read_exact(f, 1)[0]
+    name = _read_exact(f, name_length).decode("latin-1")
+    # The Pascal string (length byte included) is padded to 4 bytes.
+    blocks_start = f.tell() + (-(name_length + 1) % 4)
+    if blocks_start > end:
+        raise ValueError("Layer name extends past the layer record")
+
+    blocks = []
+    section_type = SECTION_OTHER
+    layer_id = None
+    for key, block_offset, block_length in _iter_tagged_blocks(
+        f, blocks_start, end, version
+    ):
+        blocks.append(TaggedBlock(key.decode("latin-1"), block_offset, block_length))
+        f.seek(block_offset)
+        if key == b"luni" and block_length >= 4:
+            count = struct.unpack(">I", _read_exact(f, 4))[0]
+            raw = f.read(min(count * 2, block_length - 4))
+            name = raw.decode("utf-16-be", errors="replace").rstrip("\x00")
+        elif key in SECTION_DIVIDER_KEYS and block_length >= 4:
+            section_type = struct.unpack(">I", _read_exact(f, 4))[0]
+        elif key == b"lyid" and block_length >= 4:
+            layer_id = struct.unpack(">I", _read_exact(f, 4))[0]
+
+    return LayerRecord(index, name, *fields, section_type, layer_id, tuple(blocks))
+
+
+def _read_layer_records(
+    f: BinaryIO, start: int, end: int, version: int
+) -> List[LayerRecord]:
+    raw = list(_iter_raw_layer_records(f, start, end, version))
+    return [
+        _read_layer_record(f, index, fields, offset, length, version)
+        for index, (fields, offset, length) in enumerate(raw)
+    ]
+
+
+def read_layer_index(f: BinaryIO) -> LayerIndex:
+    """Read the header, the layer records and the document tagged blocks.
+
+    Only the Layer and Mask Info section is walked; no image data is read
+    or decoded.  16/32-bit files, whose records live in a nested
+    ``Lr16``/``Lr32`` block, are handled as well.
+
+    Raises:
+        ValueError: If the file is not a well-formed PSD/PSB file.
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    f.seek(0)
+    header = read_header(f)
+    wide = header.is_psb
+
+    color_mode_length = _read_length(f, False)
+    f.seek(color_mode_length, 1)
+    resources_length = _read_length(f, False)
+    f.seek(resources_length, 1)
+
+    section_length = _read_length(f, wide)
+    section_start = f.tell()
+    section_end = min(section_start + section_length, file_size)
+    if not section_length:
+        return LayerIndex(header, [], ())
+
+    layer_info_length = _read_length(f, wide)
+    layer_info_start = f.tell()
+    layer_info_end = min(layer_info_start + layer_info_length, section_end)
+    layers: List[LayerRecord] = []
+    if layer_info_length:
+        layers = _read_layer_records(f, layer_info_start, layer_info_end, header.version)
+
+    f.seek(layer_info_end)
+    if layer_info_end + 4 > section_end:
+        return LayerIndex(header, layers, ())
+    global_mask_length = _read_length(f, False)
+    blocks_start = f.tell() + global_mask_length
+
+    blocks = []
+    nested = []
+    for key, offset, length in _iter_tagged_blocks(
+        f, blocks_start, section_end, header.version
+    ):
+        if key in LAYER_INFO_KEYS:
+            nested.append((offset, length))
+        else:
+            blocks.append(TaggedBlock(key.decode("latin-1"), offset, length))
+    if not layers:
+        for offset, length in nested:
+            layers.extend(
+                _read_layer_records(f, offset, offset + length, header.version)
+            )
+    return LayerIndex(header, layers, tuple(blocks))
+
+
+def _probe_records(
+    f: BinaryIO, start: int, end: int, version: int
+) -> Tuple[List[int], bool]:
+    """Return the section type of each record and whether any has a ``TySh`` block."""
+    section_types = []
+    has_text = False
+    for _fields, offset, length in _iter_raw_layer_records(f, start, end, version):
+        record_end = offset + length
+        f.seek(offset)
+        f.seek(_read_length(f, False), 1)  # layer mask data
+        f.seek(_read_length(f, False), 1)  # blending ranges
+        name_length = _read_exact(f, 1)[0]
+        blocks_start = f.tell() + name_length + (-(name_length + 1) % 4)
+        section_type = SECTION_OTHER
+        for key, block_offset, block_length in _iter_tagged_blocks(
+            f, blocks_start, record_end, version
+        ):
+            if key == b"TySh":
+                has_text = True
+            elif key in SECTION_DIVIDER_KEYS and block_length >= 4:
+                f.seek(block_offset)
+                section_type = struct.unpack(">I", _read_exact(f, 4))[0]
+        section_types.append(section_type)
+    return section_types, has_text
+
+
+def probe(f: BinaryIO, file_size: Optional[int] = None) -> PSDProbe:
+    """Summarise a PSD/PSB file from its header and layer record headers.
+
+    Reads the header, the section lengths and, for each layer record, the
+    fixed fields and the key/length of its tagged blocks.  Names and block
+    data (apart from the 4-byte group markers) are not read, so the cost
+    is a few small reads per layer whatever the file size.  The counts
+    match :func:`build_layer_tree` over :func:`read_layer_index`.
+
+    ``file_size`` is used as in :func:`iter_metadata_spans`.
+
+    Raises:
+        ValueError: If the file is not a well-formed PSD/PSB file.
+    """
+    file_size = _stream_size(f, file_size)
+    header = read_header(f)
+    wide = header.is_psb
+
+    f.seek(_read_length(f, False), 1)  # color mode data
+    f.seek(_read_length(f, False), 1)  # image resources
+    section_length = _read_length(f, wide)
+    section_start = f.tell()
+    section_end = min(section_start + section_length, file_size)
+    if not section_length:
+        return PSDProbe(header, 0, 0, False)
+
+    layer_info_length = _read_length(f, wide)
+    layer_info_start = f.tell()
+    layer_info_end = min(layer_info_start + layer_info_length, section_end)
+    section_types: List[int] = []
+    has_text = False
+    if layer_info_length:
+        section_types, has_text = _probe_records(
+            f, layer_info_start, layer_info_end, header.version
+        )
+
+    if not section_types and layer_info_end + 4 <= section_end:
+        f.seek(layer_info_end)
+        blocks_start = f.tell() + 4 + _read_length(f, False)
+        nested = [
+            (offset, length)
+            for key, offset, length in _iter_tagged_blocks(
+                f, blocks_start, section_end, header.version
+            )
+            if key in LAYER_INFO_KEYS
+        ]
+        for offset, length in nested:
+            types, text = _probe_records(f, offset, offset + length, header.version)
+            section_types.extend(types)
+            has_text = has_text or text
+
+    # Same nesting rule as build_layer_tree, top-down.
+    depth = 0
+    layer_count = 0
+    for section_type in reversed(section_types):
+        if section_type == SECTION_DIVIDER:
+            depth = max(0, depth - 1)
+            continue
+        if depth == 0:
+            layer_count += 1
+        if section_type in (SECTION_OPEN_FOLDER, SECTION_CLOSED_FOLDER):
+            depth += 1
+    return PSDProbe(header, layer_count, len(section_types), has_text)
+
+
+def probe_file(path: str) -> PSDProbe:
+    """Open ``path`` and :func:`probe` it."""
+    with open(path, "rb") as f:
+        return probe(f)
+
+
+def find_global_block(
+    f: BinaryIO, key: str, file_size: Optional[int] = None
+) -> Optional[TaggedBlock]:
+    """Locate a document-level tagged block of the Layer and Mask Info section.
+
+    Reads the header and the section lengths, skips the layer info and the
+    global layer mask with their length fields and walks the additional
+    tagged blocks (e.g. ``Txt2``) that follow.  No layer record is read.
+    Returns ``None`` when the file has no such block.
+
+    ``file_size`` is used as in :func:`iter_metadata_spans`.
+
+    Raises:
+        ValueError: If the file is not a well-formed PSD/PSB file.
+    """
+    file_size = _stream_size(f, file_size)
+    header = read_header(f)
+    wide = header.is_psb
+
+    f.seek(_read_length(f, False), 1)  # color mode data
+    f.seek(_read_length(f, False), 1)  # image resources
+    section_length = _read_length(f, wide)
+    section_start = f.tell()
+    section_end = min(section_start + section_length, file_size)
+    if not section_length:
+        return None
+
+    layer_info_end = section_start + (8 if wide else 4) + _read_length(f, wide)
+    if layer_info_end + 4 > section_end:
+        return None
+    f.seek(layer_info_end)
+    blocks_start = layer_info_end + 4 + _read_length(f, False)
+    wanted = key.encode("latin-1")
+    for block_key, offset, length in _iter_tagged_blocks(
+        f, blocks_start, section_end, header.version
+    ):
+        if block_key == wanted:
+            return TaggedBlock(key, offset, length)
+    return None
+
+
+def _strip_layer_info(f: BinaryIO, start: int, end: int, version: int) -> bytes:
+    """Return a layer info body whose channels hold no image data.
+
+    Every channel keeps its ID and is stored RAW: empty channels as the
+    compression marker alone, the others with a single zero byte so that
+    readers still see which channels have pixels (``psd_tools`` derives
+    ``has_pixels()`` and shape bounds from it).  The rest of each record is
+    copied unchanged.
+    """
+    if start + 2 > end:
+        return b""
+    f.seek(start)
+    count_raw = _read_exact(f, 2)
+    count = abs(struct.unpack(">h", count_raw)[0])
+    wide = version == 2
+    channel_entry = ">hQ" if wide else ">hI"
+    channel_entry_size = struct.calcsize(channel_entry)
+    parts = [count_raw]
+    channel_data = []
+    for _ in range(count):
+        fixed = _read_exact(f, 18)
+        num_channels = struct.unpack_from(">H", fixed, 16)[0]
+        entries = _read_exact(f, num_channels * channel_entry_size)
+        parts.append(fixed)
+        for i in range(num_channels):
+            channel_id, length = struct.unpack_from(
+                channel_entry, entries, i * channel_entry_size
+            )
+            data = b"\x00\x00\x00" if length > 2 else b"\x00\x00"
+            parts.append(struct.pack(channel_entry, channel_id, len(data)))
+            channel_data.append(data)
+        blend = _read_exact(f, 16)
+        extra_length = struct.unpack_from(">I", blend, 12)[0]
+        if f.tell() + extra_length > end:
+            raise ValueError("Layer record extends past the layer info section")
+        parts.append(blend)
+        parts.append(_read_exact(f, extra_length))
+    parts.extend(channel_data)
+    body = b"".join(parts)
+    return body + b"\x00" * (-len(body) % 4)
+
+
+def strip_image_data(f: BinaryIO) -> bytes:
+    """Return a copy of the file without channel or merged image data.
+
+    The header, color mode data, image resources, layer records and tagged
+    blocks are copied byte for byte.  Layer channels (in the nested
+    ``Lr16``/``Lr32``/``Layr`` blocks as well) are replaced by placeholder
+    RAW channels of at most one byte and the merged image by an empty RAW
+    image, so a reader such as ``psd_tools`` can parse the result without
+    loading any pixel data; the placeholders must not be decoded.  Lengths
+    are rewritten to match.  Only the metadata is read from ``f``.
+
+    Raises:
+        ValueError: If the file is not a well-formed PSD/PSB file.
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    f.seek(0)
+    header = read_header(f)
+    wide = header.is_psb
+    length_format = ">Q" if wide else ">I"
+    f.seek(HEADER_SIZE)
+    color_mode_length = _read_length(f, False)
+    f.seek(color_mode_length, 1)
+    resources_length = _read_length(f, False)
+    prefix_end = f.tell() + resources_length
+    if prefix_end > file_size:
+        raise ValueError("Image resources extend past the end of the file")
+    f.seek(0)
+    prefix = _read_exact(f, prefix_end)
+
+    section_length = _read_length(f, wide)
+    section_start = f.tell()
+    section_end = min(section_start + section_length, file_size)
+    section = b""
+    if section_length:
+        layer_info_length = _read_length(f, wide)
+        layer_info_start = f.tell()
+        layer_info_end = min(layer_info_start + layer_info_length, section_end)
+        layer_info = b""
+        if layer_info_length:
+            layer_info = _strip_layer_info(
+                f, layer_info_start, layer_info_end, header.version
+            )
+        parts = [struct.pack(length_format, len(layer_info)), layer_info]
+
+        if layer_info_end + 4 <= section_end:
+            f.seek(layer_info_end)
+            blocks_start = layer_info_end + 4 + _read_length(f, False)
+            pos = layer_info_end
+            for key, offset, length in _iter_tagged_blocks(
+                f, blocks_start, section_end, header.version
+            ):
+                if key not in LAYER_INFO_KEYS:
+                    continue
+                # Copy everything up to this block, then rewrite it.
+                long_length = wide and key in PSB_LONG_LENGTH_KEYS
+                block_start = offset - 8 - (8 if long_length else 4)
+                f.seek(pos)
+                parts.append(_read_exact(f, block_start - pos))
+                signature = _read_exact(f, 4)
+                data = _strip_layer_info(f, offset, offset + length, header.version)
+                parts.append(signature + key)
+                parts.append(struct.pack(">Q" if long_length else ">I", len(data)))
+                parts.append(data)
+                pos = offset + length
+            f.seek(pos)
+            parts.append(_read_exact(f, section_end - pos))
+        section = b"".join(parts)
+
+    # Merged image: RAW compression marker and no data.
+    return b"".join((prefix, struct.pack(length_format, len(section)), section, b"\x00\x00"))
+
+
+def build_layer_tree(layers: List[LayerRecord]) -> List[LayerNode]:
+    """Nest the layer records of :func:`read_layer_index` into groups.
+
+    Returns the top-level nodes.  Siblings keep the file order (bottom
+    layer first) and the :data:`SECTION_DIVIDER` records are dropped, so
+    the tree has the shape of ``psd_tools``' ``PSDImage``.
+    """
+    root: List[LayerNode] = []
+    stack = [root]
+    # Walk top-down: a folder record opens a group, its divider closes it.
+    for record in reversed(layers):
+        if record.is_group_end:
+            if len(stack) > 1:
+                stack.pop()
+            continue
+        node = LayerNode(record, [])
+        stack[-1].append(node)
+        if record.is_group:
+            stack.append(node.children)
+    _reverse_tree(root)
+    return root
+
+
+def _reverse_tree(nodes: List[LayerNode]) -> None:
+    nodes.reverse()
+    for node in nodes:
+        _reverse_tree(node.children)
+
+
+def iter_layer_paths(nodes: List[LayerNode], parent: Tuple[str, ...] = ()) -> Iterator[
+    Tuple[LayerRecord, Tuple[str, ...]]
+]:
+    """Yield ``(record, group_path)`` for every node of a layer tree, depth first."""
+    for node in nodes:
+        yield node.record, parent
+        if node.children:
+            yield from iter_layer_paths(node.children, parent + (node.record.name,))
+
+
+def read_block(f: BinaryIO, block: TaggedBlock) -> bytes:
+    """Return the data of a tagged block found by :func:`read_layer_index`."""
+    f.seek(block.offset)
+    return _read_exact(f, block.length)
+
+
+def _iter_record_block_ranges(
+    view: memoryview, start: int, end: int, version: int
+) -> Iterator[Tuple[int, int]]:
+    """Yield ``(start, end)`` of the tagged blocks of each layer record in ``view``."""
+    if start + 2 > end:
+        return
+    count = abs(struct.unpack_from(">h", view, start)[0])
+    channel_entry_size = 10 if version == 2 else 6
+    pos = start + 2
+    for _ in range(count):
+        num_channels = struct.unpack_from(">16xH", view, pos)[0]
+        # Rectangle and channel count, channel entries, blend mode
+        # signature/key, opacity, clipping, flags and filler.
+        pos += 18 + num_channels * channel_entry_size + 12
+        extra_length = struct.unpack_from(">I", view, pos)[0]
+        extra_start = pos + 4
+        extra_end = extra_start + extra_length
+        if extra_end > end:
+            raise ValueError("Layer record extends past the layer info section")
+        mask_length = struct.unpack_from(">I", view, extra_start)[0]
+        pos = extra_start + 4 + mask_length
+        blending_length = struct.unpack_from(">I", view, pos)[0]
+        pos += 4 + blending_length
+        name_length = view[pos]
+        # The Pascal string (length byte included) is padded to 4 bytes.
+        pos += name_length + 1 + (-(name_length + 1) % 4)
+        yield pos, extra_end
+        pos = extra_end
+
+
+def _walk_block_views(
+    view: memoryview, start: int, end: int, version: int, nested: bool
+) -> Iterator[BlockView]:
+    pos = start
+    while pos + 12 <= end:
+        signature, key = struct.unpack_from(">4s4s", view, pos)
+        if signature not in TAGGED_BLOCK_SIGNATURES:
+            # Same padding rule as _skip_padding.
+            for padding in range(1, 4):
+                if pos + padding + 12 > end:
+                    return
+                if struct.unpack_from(">4s", view, pos + padding)[0] in TAGGED_BLOCK_SIGNATURES:
+                    pos += padding
+                    break
+            else:
+                return
+            continue
+        if version == 2 and key in PSB_LONG_LENGTH_KEYS:
+            length = struct.unpack_from(">Q", view, pos + 8)[0]
+            data_start = pos + 16
+        else:
+            length = struct.unpack_from(">I", view, pos + 8)[0]
+            data_start = pos + 12
+        data_end = min(data_start + length, end)
+        yield BlockView(
+            key.decode("latin-1"), data_start, data_end - data_start,
+            view[data_start:data_end],
+        )
+        if nested and key in LAYER_INFO_KEYS:
+            for record_start, record_end in _iter_record_block_ranges(
+                view, data_start, data_end, version
+            ):
+                yield from _walk_block_views(view, record_start, record_end, version, True)
+        pos = data_end
+
+
+def iter_block_views(
+    buf, start: int = 0, end: Optional[int] = None, version: int = 1
+) -> Iterator[BlockView]:
+    """Yield a :class:`BlockView` for each tagged block in ``buf[start:end]``.
+
+    ``buf`` is ``bytes``, ``bytearray``, ``mmap`` or a ``memoryview``.  Keys
+    and lengths are read with ``struct.unpack_from`` and the views are
+    slices of a single ``memoryview``, so no block data is copied.  Nested
+    layer info blocks (``Lr16``/``Lr32``/``Layr``) are yielded and then
+    followed by the tagged blocks of their layer records.  ``version`` is
+    the file version (2 for PSB, where some lengths are 8 bytes wide).
+
+    Raises:
+        ValueError: If a nested layer record is truncated.
+    """
+    view = buf if isinstance(buf, memoryview) else memoryview(buf)
+    if end is None:
+        end = len(view)
+    try:
+        yield from _walk_block_views(view, start, end, version, True)
+    except struct.error as exc:
+        raise ValueError(f"Truncated tagged block data: {exc}") from None
+
+
+def iter_document_block_views(buf) -> Iterator[Tuple[Optional[int], BlockView]]:
+    """Yield ``(layer_index, block)`` for every tagged block of a PSD/PSB buffer.
+
+    ``layer_index`` is the position of the layer record the block belongs
+    to, numbered as in :func:`read_layer_index`, or ``None`` for the
+    document-level blocks of the Layer and Mask Info section.  Blocks are
+    :class:`BlockView` objects over ``buf`` (typically an ``mmap`` of the
+    file); see :func:`iter_block_views`.
+
+    Raises:
+        ValueError: If the buffer is not a well-formed PSD/PSB file.
+    """
+    view = buf if isinstance(buf, memoryview) else memoryview(buf)
+    size = len(view)
+    try:
+        signature, version = struct.unpack_from(">4sH", view, 0)
+        if signature != b"8BPS" or version not in (1, 2):
+            raise ValueError("Not a PSD/PSB file (bad signature or version)")
+        wide = version == 2
+        pos = HEADER_SIZE
+        pos += 4 + struct.unpack_from(">I", view, pos)[0]  # color mode data
+        pos += 4 + struct.unpack_from(">I", view, pos)[0]  # image resources
+        section_length = struct.unpack_from(">Q" if wide else ">I", view, pos)[0]
+        section_start = pos + (8 if wide else 4)
+        section_end = min(section_start + section_length, size)
+        if not section_length:
+            return
+
+        layer_info_length = struct.unpack_from(">Q" if wide else ">I", view, section_start)[0]
+        layer_info_start = section_start + (8 if wide else 4)
+        layer_info_end = min(layer_info_start + layer_info_length, section_end)
+        has_records = False
+        if layer_info_length:
+            ranges = _iter_record_block_ranges(view, layer_info_start, layer_info_end, version)
+            for index, (start, end) in enumerate(ranges):
+                has_records = True
+                for block in _walk_block_views(view, start, end, version, False):
+                    yield index, block
+
+        if layer_info_end + 4 > section_end:
+            return
+        blocks_start = layer_info_end + 4 + struct.unpack_from(">I", view, layer_info_end)[0]
+        for block in _walk_block_views(view, blocks_start, section_end, version, False):
+            yield None, block
+            if block.key.encode("latin-1") in LAYER_INFO_KEYS and not has_records:
+                ranges = _iter_record_block_ranges(
+                    view, block.offset, block.offset + block.length, version
+                )
+                for index, (start, end) in enumerate(ranges):
+                    for nested in _walk_block_views(view, start, end, version, False):
+                        yield index, nested
+    except struct.error as exc:
+        raise ValueError(f"Truncated PSD structure: {exc}") from None
+
+
+def layer_block_views(buf, key: str) -> Dict[int, BlockView]:
+    """Return the ``key`` block of each layer record of ``buf``, by layer index.
+
+    Layers without the block are left out.  See :func:`iter_document_block_views`.
+    """
+    return {
+        index: block
+        for index, block in iter_document_block_views(buf)
+        if index is not None and block.key == key
+    }
+
+
+@contextmanager
+def map_file(path: str) -> Iterator[mmap.mmap]:
+    """Map ``path`` read-only for :func:`iter_document_block_views`.
+
+    The mapping is closed on exit unless block views still reference it;
+    it is then released when the last view is garbage collected.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mm
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            pass
+
+
+def iter_engine_data_spans(buf) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield ``(key, offset, length)`` for every ``TySh``/``Txt2`` block.
+
+    ``buf`` is any bytes-like object supporting the buffer protocol
+    (``bytes``, ``bytearray``, ``memoryview`` or ``mmap.mmap``).  The tagged
+    block headers are located directly in the raw bytes, so the section
+    structure does not need to be parsed.  ``offset`` and ``length``
+    describe the block payload; headers whose length would run past the end
+    of the buffer, and matches inside an already reported payload, are
+    ignored.
+    """
+    size = len(buf)
+    covered_until = 0
+    for match in ENGINE_DATA_HEADER_RE.finditer(buf):
+        header_start = match.start()
+        if header_start < covered_until:
+            continue
+        data_start = match.end() + 4
+        if data_start > size:
+            break
+        length = struct.unpack_from(">I", buf, match.end())[0]
+        if data_start + length > size:
+            continue
+        covered_until = data_start + length
+        yield match.group(1), data_start, length
@@ -16,93 +16,1024 @@ positives.  For a more robust solution, use `psd-tools` as demonstrated in
 Usage:
     python scan_fonts_binary.py /path/to/file.psd
     python scan_fonts_binary.py /path/to/file.psd --json
+    python scan_fonts_binary.py /path/to/file.psb --stream --chunk-size 1048576
+    python scan_fonts_binary.py /path/to/file.psd --sections
+    python scan_fonts_binary.py /path/to/file.psd --engine-data
+    python scan_fonts_binary.py /path/to/file.psd --strings
+    python scan_fonts_binary.py /path/to/file.psb --workers 8
+    python scan_fonts_binary.py /path/to/templates/ "more/**/*.psd" --workers 8
+    python scan_fonts_binary.py --manifest files.txt --workers 8 --ordered
+    python scan_fonts_binary.py /path/to/file.psd --no-cache
+    python scan_fonts_binary.py /path/to/file.psd --probe
 """
 
 import argparse
+import glob
 import json
+import mmap
 import os
 import re
 import sys
-from typing import List, Set
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import psd_cache
+import psd_sections
+import psd_strings
 
-def scan_file_for_fonts(path: str) -> List[str]:
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: the pure ``re`` path is used instead
+    np = None
+
+# Regular expression to find sequences of printable ASCII characters.
+# We allow letters, numbers, spaces, underscores, hyphens and slashes.
+WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9 _\-/]{2,}")
+
+# Characters that may continue a word matched by ``WORD_RE``.  Used by the
+# streaming scanner to find where an unfinished word starts at a chunk edge.
+WORD_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 _-/"
+WORD_BYTES = WORD_CHARS.encode("ascii")
+
+# Terms that suggest a word is a font name.  These are typical weights
+# or styles found in font names.
+FONT_TERMS = [
+    "Bold",
+    "Light",
+    "Regular",
+    "Italic",
+    "Thin",
+    "Medium",
+    "Black",
+    "Semibold",
+    "Condensed",
+    "Heavy",
+    "Ultra",
+    "Book",
+]
+
+# Known non-font flags that happen to contain a font term.
+IGNORED_NAMES = {"fauxbold false", "fauxitalic false"}
+
+MAX_NAME_LENGTH = 50
+
+# Chunk size used by the streaming mode (see ``StreamingFontScanner``).
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Smallest range handed to a worker by the parallel scan.
+MIN_PARALLEL_RANGE = 16 * 1024 * 1024
+
+# A byte that ends a word: neither a word character nor a null byte.
+SEPARATOR_RE = re.compile(rb"[^\x00A-Za-z0-9 _\-/]")
+
+# Longest run of word bytes (null bytes aside) that is scanned: longer runs
+# are dropped by ``StreamingFontScanner`` and ``iter_span_pieces``.
+MAX_PIECE_CARRY = 64 * 1024
+
+# Name and version under which results are stored in ``psd_cache``.  Bump
+# the version whenever a change to the scanner can change its results.
+CACHE_EXTRACTOR = "scan_fonts_binary"
+CACHE_VERSION = "2"
+
+# File extensions picked up when a directory is given in batch mode.
+BATCH_EXTENSIONS = (".psd", ".psb")
+
+# Below this size the NumPy prefilter costs more than it saves.
+NUMPY_PREFILTER_MIN_SIZE = 64 * 1024
+
+if np is not None:
+    # 256-entry lookup table: True for bytes that can be part of a word.
+    _WORD_LUT = np.zeros(256, dtype=bool)
+    _WORD_LUT[np.frombuffer(WORD_BYTES, dtype=np.uint8)] = True
+
+# ``bytes.translate`` table mapping word bytes to ``a`` and the rest to ``.``.
+_WORD_MASK = bytes(0x61 if byte in WORD_BYTES else 0x2E for byte in range(256))
+
+
+def normalize_font_name(word: str) -> Optional[str]:
+    """Return the normalised font name for a matched word, or ``None``.
+
+    A name is kept when it is not a known non-font flag and is at most
+    ``MAX_NAME_LENGTH`` characters long.
+    """
+    # Normalize by stripping leading/trailing slashes or spaces
+    name = word.strip().strip("/")
+    # Filter out known non-font flags
+    if name.lower() in IGNORED_NAMES:
+        return None
+    # Exclude overly long names
+    if not 0 < len(name) <= MAX_NAME_LENGTH:
+        return None
+    return name
+
+
+@lru_cache(maxsize=None)
+def _long_run_re(max_run: int) -> "re.Pattern[bytes]":
+    word = re.escape(WORD_BYTES)
+    return re.compile(rb"(?<![" + word + rb"])[" + word + rb"]{%d,}" % (max_run + 1))
+
+
+def drop_long_runs(data: bytes, max_run: int) -> bytes:
+    """Remove the runs of more than ``max_run`` word bytes from null-free ``data``."""
+    if len(data) <= max_run or b"a" * (max_run + 1) not in data.translate(_WORD_MASK):
+        return data
+    return _long_run_re(max_run).sub(b"", data)
+
+
+def word_text(
+    data: bytes, use_numpy: Optional[bool] = None, max_run: Optional[int] = None
+) -> str:
+    """Remove null bytes from ``data`` and decode it for the word regex.
+
+    With NumPy available (and ``use_numpy`` not ``False``), the buffer is
+    classified with a 256-entry lookup table and the run boundaries are
+    found with ``diff``/``flatnonzero``; only runs of 3 or more word bytes
+    are kept, each followed by the non-word byte that ends it.  The word
+    regex then sees the same words as with the full text, but skips the
+    megabytes of compressed pixel noise in between.  With ``max_run``,
+    runs longer than that are left out as well (see :func:`drop_long_runs`).
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if not use_numpy or np is None or len(data) < NUMPY_PREFILTER_MIN_SIZE:
+        data = data.replace(b"\x00", b"")
+        if max_run is not None:
+            data = drop_long_runs(data, max_run)
+        return data.decode("latin-1", errors="ignore")
+
+    arr = np.frombuffer(data, dtype=np.uint8)
+    arr = arr[arr != 0]
+    is_word = _WORD_LUT[arr].view(np.int8)
+    edges = np.diff(is_word, prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long_runs = ends - starts >= 3
+    if max_run is not None:
+        long_runs &= ends - starts <= max_run
+    starts = starts[long_runs]
+    ends = ends[long_runs]
+
+    # Keep [start, end] for every long run: the run plus its terminator.
+    marks = np.zeros(len(arr) + 2, dtype=np.int32)
+    marks[starts] += 1
+    marks[ends + 1] -= 1
+    keep = np.cumsum(marks[:len(arr)]) > 0
+    return arr[keep].tobytes().decode("latin-1")
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Build a regex alternation for ``terms`` shaped as a prefix trie.
+
+    At each position the regex engine follows a single branch of the trie,
+    so the cost of a lookup depends on the term length and not on how many
+    terms there are.
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class FontTermMatcher:
+    """Find words that contain one of a set of font terms.
+
+    Words are the spans of ``WORD_RE``: from the first letter or digit of a
+    run of word characters to the end of the run.  Each word is searched
+    for the terms with one regular expression shaped as a prefix trie, so
+    adding terms does not slow the scan down, which allows lists with
+    hundreds of style keywords or known family names.  ``WORD_RE`` reads
+    each run once and the term search stays inside the word, so the scan
+    is linear even in long runs of short words without a term.
+    """
+
+    def __init__(self, terms: Iterable[str] = FONT_TERMS) -> None:
+        self.terms = tuple(t for t in dict.fromkeys(terms) if t)
+        if not self.terms:
+            raise ValueError("At least one font term is required")
+        self.term_pattern = re.compile(_trie_pattern(self.terms))
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(start, end, term)`` for every word containing a term."""
+        search = self.term_pattern.search
+        for word in WORD_RE.finditer(text):
+            start, end = word.span()
+            term = search(text, start, end)
+            if term is not None:
+                yield start, end, term.group()
+
+    def font_names(self, text: str) -> Iterator[str]:
+        """Yield the normalised candidate font names found in ``text``."""
+        for start, end, _term in self.finditer(text):
+            name = normalize_font_name(text[start:end])
+            if name:
+                yield name
+
+
+DEFAULT_MATCHER = FontTermMatcher()
+
+
+def load_terms(path: str) -> List[str]:
+    """Read a term list with one term per line (``#`` starts a comment)."""
+    with open(path, encoding="utf-8") as f:
+        return [
+            line.strip()
+            for line in f
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+
+class StreamingFontScanner:
+    """Incremental version of :func:`scan_file_for_fonts`.
+
+    Bytes are fed in arbitrary chunks with :meth:`feed`; :meth:`close`
+    returns the same candidate list the whole-file scan would produce.
+    Only the current chunk plus the unfinished word at its end (at most
+    ``max_carry`` characters) is held in memory, so memory use is bounded
+    by the chunk size instead of the file size.
+
+    Runs of word bytes longer than ``max_carry`` are dropped, wherever they
+    fall relative to the chunks, so the result does not depend on how the
+    file is cut.  Such a run can only survive the ``MAX_NAME_LENGTH`` filter
+    when it is almost entirely spaces, slashes, underscores or hyphens,
+    which does not happen in real PSD data.
+    """
+
+    def __init__(
+        self,
+        max_carry: int = MAX_PIECE_CARRY,
+        matcher: Optional[FontTermMatcher] = None,
+        use_numpy: Optional[bool] = None,
+    ) -> None:
+        self.max_carry = max_carry
+        self.matcher = matcher or DEFAULT_MATCHER
+        self.use_numpy = use_numpy
+        self.candidates: Set[str] = set()
+        self._carry = b""
+        self._skipping = False
+
+    def feed(self, data: bytes) -> None:
+        """Scan the next chunk of the file."""
+        # Null bytes can be removed chunk by chunk: the result is the same
+        # as removing them from the whole buffer at once.
+        data = data.replace(b"\x00", b"")
+        if self._skipping:
+            # Still inside an over-long word that was already dropped.
+            data = data.lstrip(WORD_BYTES)
+            if not data:
+                return
+            self._skipping = False
+        data = self._carry + data
+
+        # Everything after the last non-word byte may continue in the next
+        # chunk, so it is carried over instead of being matched now.
+        head = data.rstrip(WORD_BYTES)
+        tail_length = len(data) - len(head)
+        if tail_length > self.max_carry:
+            self._carry = b""
+            self._skipping = True
+        else:
+            self._carry = data[len(head):]
+        self._scan(head)
+
+    def flush(self) -> None:
+        """Scan the pending word so the next chunk starts a new word.
+
+        Call this between non-contiguous regions of the file.
+        """
+        if self._carry:
+            self._scan(self._carry)
+            self._carry = b""
+        self._skipping = False
+
+    def close(self) -> List[str]:
+        """Flush the pending word and return the sorted candidate list."""
+        self.flush()
+        return sorted(self.candidates)
+
+    def _scan(self, data: bytes) -> None:
+        text = word_text(data, self.use_numpy, self.max_carry)
+        self.candidates.update(self.matcher.font_names(text))
+
+
+def scan_spans(
+    f: BinaryIO,
+    spans: Iterable[Tuple[int, int]],
+    scanner: StreamingFontScanner,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """Feed the ``(offset, length)`` spans of ``f`` into ``scanner``.
+
+    Each span is scanned on its own: words never continue across spans.
+    """
+    for offset, length in spans:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            scanner.feed(chunk)
+            remaining -= len(chunk)
+        scanner.flush()
+
+
+def iter_span_pieces(
+    f: BinaryIO,
+    spans: Iterable[Tuple[int, int]],
+    piece_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Read the ``(offset, length)`` spans of ``f`` as independent pieces.
+
+    The stream counterpart of :func:`split_spans`: each read of about
+    ``piece_size`` bytes is cut before its last byte that ends a word and
+    the rest is carried into the next piece, so no run of word bytes is
+    split and scanning the pieces separately (:func:`scan_pieces`, possibly
+    in other processes) finds the same words as :func:`scan_spans`.  A run
+    that grows past ``MAX_PIECE_CARRY`` bytes is one that
+    :class:`StreamingFontScanner` drops: it is left out of the pieces, up
+    to the byte that ends it in a later read.  ``spans`` is consumed lazily,
+    so it can be a generator over a stream that is still arriving; a span
+    running past the end of ``f`` stops there.
+    """
+    word_bytes = WORD_BYTES + b"\x00"
+    for offset, length in spans:
+        f.seek(offset)
+        remaining = length
+        carry = b""
+        skipping = False
+        while remaining > 0:
+            chunk = f.read(min(piece_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if skipping:
+                # Still inside an over-long run that was already dropped.
+                chunk = chunk.lstrip(word_bytes)
+                if not chunk:
+                    continue
+                skipping = False
+            data = carry + chunk
+            carry = b""
+            if remaining > 0:
+                cut = len(data.rstrip(word_bytes)) - 1
+                tail = data[cut + 1:]
+                if len(tail) - tail.count(b"\x00") > MAX_PIECE_CARRY:
+                    data = data[:cut + 1]
+                    skipping = True
+                elif cut > 0:
+                    data, carry = data[:cut], data[cut:]
+                else:
+                    carry = data  # one run so far: wait for its end
+                    continue
+            if data:
+                yield data
+        if carry:
+            yield carry
+
+
+def scan_stream_for_fonts(
+    f: BinaryIO,
+    file_size: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    matcher: Optional[FontTermMatcher] = None,
+    use_numpy: Optional[bool] = None,
+) -> List[str]:
+    """The ``sections_only`` scan of :func:`scan_file_for_fonts` over a file object.
+
+    Each metadata span is scanned as soon as
+    :func:`psd_sections.iter_metadata_spans` yields it, so ``f`` is read
+    front to back once and a stream that is still arriving (see
+    ``psd_stream.SpooledUpload``) never has to be complete before the scan
+    starts.  ``file_size`` is passed on to ``iter_metadata_spans``.  When
+    the structure cannot be parsed, ``f`` is scanned in full from the
+    start instead.
+    """
+    scanner = StreamingFontScanner(matcher=matcher, use_numpy=use_numpy)
+    try:
+        for span in psd_sections.iter_metadata_spans(f, file_size):
+            scan_spans(f, [span], scanner, chunk_size)
+    except ValueError:
+        scanner = StreamingFontScanner(matcher=matcher, use_numpy=use_numpy)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            scanner.feed(chunk)
+    return scanner.close()
+
+
+def engine_data_spans(path: str) -> List[Tuple[int, int]]:
+    """Return the ``(offset, length)`` payload spans of the TySh/Txt2 blocks.
+
+    The file is memory-mapped for the search, so it is never read whole
+    into memory.  See :func:`psd_sections.iter_engine_data_spans`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [
+                (offset, length)
+                for _key, offset, length in psd_sections.iter_engine_data_spans(mm)
+            ]
+
+
+def split_spans(
+    buf, spans: Iterable[Tuple[int, int]], range_size: int
+) -> List[Tuple[int, int]]:
+    """Split ``(offset, length)`` spans of ``buf`` into ranges of about ``range_size``.
+
+    Each cut is moved forward to the next byte that ends a word (see
+    ``SEPARATOR_RE``), so no word straddles two ranges and scanning the
+    ranges independently finds the same words as scanning the span in one
+    go.  A span without such a byte after the cut is kept in one piece.
+    """
+    ranges = []
+    for offset, length in spans:
+        end = offset + length
+        start = offset
+        while end - start > range_size:
+            match = SEPARATOR_RE.search(buf, start + range_size, end)
+            if match is None:
+                break
+            ranges.append((start, match.start() - start))
+            start = match.start()
+        if end > start:
+            ranges.append((start, end - start))
+    return ranges
+
+
+@lru_cache(maxsize=None)
+def _matcher_for(terms: Optional[Tuple[str, ...]]) -> FontTermMatcher:
+    return FontTermMatcher(terms) if terms is not None else DEFAULT_MATCHER
+
+
+def _scan_range(
+    path: str,
+    offset: int,
+    length: int,
+    terms: Optional[Tuple[str, ...]],
+    use_numpy: Optional[bool],
+    chunk_size: int,
+) -> List[str]:
+    """Worker for :func:`scan_spans_parallel`: scan one range of ``path``.
+
+    The file is memory-mapped in the worker, so only the arguments and the
+    candidate list cross the process boundary.
+    """
+    scanner = StreamingFontScanner(matcher=_matcher_for(terms), use_numpy=use_numpy)
+    end = offset + length
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for pos in range(offset, end, chunk_size):
+                scanner.feed(mm[pos:min(pos + chunk_size, end)])
+    return scanner.close()
+
+
+def scan_pieces(
+    pieces: Iterable[bytes],
+    terms: Optional[Tuple[str, ...]] = None,
+    use_numpy: Optional[bool] = None,
+) -> List[str]:
+    """Scan pieces from :func:`iter_span_pieces`, each one on its own.
+
+    Only the bytes and the term tuple cross a process boundary, so this can
+    be sent to a worker pool; merging the candidate lists of any grouping
+    of the pieces gives the result of :func:`scan_spans` over the spans.
+    """
+    scanner = StreamingFontScanner(matcher=_matcher_for(terms), use_numpy=use_numpy)
+    for piece in pieces:
+        scanner.feed(piece)
+        scanner.flush()
+    return scanner.close()
+
+
+def scan_spans_parallel(
+    path: str,
+    spans: Iterable[Tuple[int, int]],
+    workers: int,
+    matcher: Optional[FontTermMatcher] = None,
+    use_numpy: Optional[bool] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[str]:
+    """Scan the ``(offset, length)`` spans of ``path`` in a process pool.
+
+    The spans are cut with :func:`split_spans` into about four ranges per
+    worker (at least ``MIN_PARALLEL_RANGE`` bytes each) and the candidate
+    sets of the ranges are merged.  The result is the same as feeding the
+    spans to one :class:`StreamingFontScanner` with :func:`scan_spans`.
+    When the spans fit in a single range no pool is started.
+    """
+    matcher = matcher or DEFAULT_MATCHER
+    spans = list(spans)
+    total = sum(length for _offset, length in spans)
+    if not total:
+        return []
+    range_size = max(MIN_PARALLEL_RANGE, total // (workers * 4))
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = split_spans(mm, spans, range_size)
+
+    terms = None if matcher is DEFAULT_MATCHER else matcher.terms
+    if workers <= 1 or len(ranges) <= 1:
+        results = [
+            _scan_range(path, offset, length, terms, use_numpy, chunk_size)
+            for offset, length in ranges
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = [
+                pool.submit(_scan_range, path, offset, length, terms, use_numpy, chunk_size)
+                for offset, length in ranges
+            ]
+            results = [future.result() for future in futures]
+
+    candidates: Set[str] = set()
+    for names in results:
+        candidates.update(names)
+    return sorted(candidates)
+
+
+def scan_strings_for_fonts(
+    path: str,
+    spans: Optional[Iterable[Tuple[int, int]]] = None,
+    matcher: Optional[FontTermMatcher] = None,
+) -> List[str]:
+    """Scan the ASCII and UTF-16BE strings of a file for font names.
+
+    Strings are decoded in place with :func:`psd_strings.iter_strings` over
+    a memory map of the file, so no null-stripped copy of the buffer is
+    made and words from unrelated bytes are never glued together.  When
+    ``spans`` is given only those ``(offset, length)`` ranges are searched.
+    """
+    matcher = matcher or DEFAULT_MATCHER
+    candidates: Set[str] = set()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset, length in spans if spans is not None else [(0, len(mm))]:
+                for _offset, _encoding, text in psd_strings.iter_strings(
+                    mm, start=offset, end=offset + length
+                ):
+                    candidates.update(matcher.font_names(text))
+    return sorted(candidates)
+
+
+def scan_file_for_fonts(
+    path: str,
+    chunk_size: Optional[int] = None,
+    sections_only: bool = False,
+    engine_data_only: bool = False,
+    terms: Optional[Iterable[str]] = None,
+    decode_strings: bool = False,
+    use_numpy: Optional[bool] = None,
+    workers: Optional[int] = None,
+) -> List[str]:
     """Scan a PSD/PSB file for potential font names.
 
     Args:
         path: Path to the PSD/PSB file.
+        chunk_size: When given, read the file in chunks of this many bytes
+            with :class:`StreamingFontScanner` instead of loading it whole.
+            The result is the same; peak memory is bounded by the chunk
+            size rather than roughly three times the file size.
+        sections_only: Only scan the Image Resources section, the layer
+            records and the Layer and Mask Info tagged blocks, seeking past
+            Color Mode Data, channel image data and the merged Image Data
+            (see :func:`psd_sections.iter_metadata_spans`).  Files whose
+            structure cannot be parsed are scanned in full.
+        engine_data_only: Only scan the payloads of the ``TySh`` (text
+            layer) and ``Txt2`` (document text engine) tagged blocks, where
+            the font names live (see :func:`engine_data_spans`).  This also
+            drops false positives from XMP and ICC profile strings.  Files
+            without any such block yield no candidates.
+        terms: Font terms to look for instead of ``FONT_TERMS``.
+        decode_strings: Decode ASCII and UTF-16BE strings in place (see
+            :func:`scan_strings_for_fonts`) instead of deleting null bytes.
+            Can be combined with ``sections_only`` or ``engine_data_only``.
+        use_numpy: Use the NumPy run prefilter of :func:`word_text`.  The
+            default is to use it when NumPy is installed.
+        workers: Scan with this many processes (``0`` means one per CPU)
+            using :func:`scan_spans_parallel`.  The result is the same as
+            the ``chunk_size`` streaming scan.  Ignored together with
+            ``decode_strings``.
 
     Returns:
         A sorted list of candidate font names (deduplicated).
     """
     if not os.path.isfile(path):
         raise FileNotFoundError(f"File not found: {path}")
+    matcher = FontTermMatcher(terms) if terms is not None else DEFAULT_MATCHER
+
+    if decode_strings:
+        spans = None
+        if engine_data_only:
+            spans = engine_data_spans(path)
+        elif sections_only:
+            with open(path, "rb") as f:
+                try:
+                    spans = list(psd_sections.iter_metadata_spans(f))
+                except (ValueError, OSError):
+                    spans = None
+        return scan_strings_for_fonts(path, spans, matcher)
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers and workers > 1:
+        if engine_data_only:
+            spans = engine_data_spans(path)
+        else:
+            spans = [(0, os.path.getsize(path))]
+            if sections_only:
+                with open(path, "rb") as f:
+                    try:
+                        spans = list(psd_sections.iter_metadata_spans(f))
+                    except (ValueError, OSError):
+                        pass
+        return scan_spans_parallel(
+            path, spans, workers, matcher, use_numpy, chunk_size or DEFAULT_CHUNK_SIZE
+        )
+
+    if engine_data_only:
+        scanner = StreamingFontScanner(matcher=matcher, use_numpy=use_numpy)
+        spans = engine_data_spans(path)
+        with open(path, "rb") as f:
+            scan_spans(f, spans, scanner, chunk_size or DEFAULT_CHUNK_SIZE)
+        return scanner.close()
+
+    if sections_only:
+        with open(path, "rb") as f:
+            return scan_stream_for_fonts(
+                f, chunk_size=chunk_size or DEFAULT_CHUNK_SIZE, matcher=matcher, use_numpy=use_numpy
+            )
+
+    if chunk_size:
+        scanner = StreamingFontScanner(matcher=matcher, use_numpy=use_numpy)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                scanner.feed(chunk)
+        return scanner.close()
+
     with open(path, "rb") as f:
         data = f.read()
 
     # Remove null bytes, which appear in UTF‑16 encoded strings.
     # We use Latin‑1 to decode remaining bytes into a string.
-    text = data.replace(b"\x00", b"").decode("latin-1", errors="ignore")
-
-    # Regular expression to find sequences of printable ASCII characters.
-    # We allow letters, numbers, spaces, underscores, hyphens and slashes.
-    words = re.findall(r"[A-Za-z0-9][A-Za-z0-9 _\-/]{2,}", text)
-
-    # Terms that suggest a word is a font name.  These are typical weights
-    # or styles found in font names.
-    terms = [
-        "Bold",
-        "Light",
-        "Regular",
-        "Italic",
-        "Thin",
-        "Medium",
-        "Black",
-        "Semibold",
-        "Condensed",
-        "Heavy",
-        "Ultra",
-        "Book",
-    ]
+    text = word_text(data, use_numpy)
 
-    candidates: Set[str] = set()
-    for w in words:
-        if any(t in w for t in terms):
-            # Normalize by stripping leading/trailing slashes or spaces
-            name = w.strip().strip("/")
-            # Filter out known non-font flags
-            if name.lower() not in {"fauxbold false", "fauxitalic false"}:
-                # Exclude overly long names
-                if 0 < len(name) <= 50:
-                    candidates.add(name)
+    candidates: Set[str] = set(matcher.font_names(text))
 
     return sorted(candidates)
 
 
+def cache_version(
+    sections_only: bool = False,
+    engine_data_only: bool = False,
+    terms: Optional[Iterable[str]] = None,
+    decode_strings: bool = False,
+    **_ignored: Any,
+) -> str:
+    """Return the cache version string for a set of scan options.
+
+    Only the options that can change the result are part of the key;
+    ``chunk_size``, ``use_numpy`` and ``workers`` are not.
+    """
+    key = {
+        "sections_only": sections_only,
+        "engine_data_only": engine_data_only,
+        "terms": list(terms) if terms is not None else None,
+        "decode_strings": decode_strings,
+    }
+    return CACHE_VERSION + ":" + json.dumps(key, sort_keys=True)
+
+
+def scan_file_for_fonts_cached(
+    path: str,
+    cache: Optional[psd_cache.ResultCache] = None,
+    refresh: bool = False,
+    **options: Any,
+) -> List[str]:
+    """:func:`scan_file_for_fonts` behind a :class:`psd_cache.ResultCache`.
+
+    Without ``cache`` this is a plain scan.  With ``refresh`` the file is
+    scanned again and the stored result replaced.  The ``sections_only``
+    scan reads nothing but the metadata hashed by
+    :func:`psd_cache.quick_fingerprint`, so its entries are not confirmed
+    with a full-file hash.
+    """
+    if cache is None:
+        return scan_file_for_fonts(path, **options)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"File not found: {path}")
+    return cache.cached(
+        path,
+        CACHE_EXTRACTOR,
+        cache_version(**options),
+        lambda p: scan_file_for_fonts(p, **options),
+        refresh=refresh,
+        verify=not options.get("sections_only"),
+    )
+
+
+def iter_input_paths(
+    inputs: Iterable[str], manifest: Optional[str] = None
+) -> Iterator[str]:
+    """Expand the batch inputs into file paths.
+
+    Each input may be a file, a directory (searched recursively for
+    ``BATCH_EXTENSIONS`` files) or a glob pattern (``**`` is supported).
+    ``manifest`` names a file with one path per line (``-`` for stdin);
+    blank lines and lines starting with ``#`` are skipped.  Paths are
+    yielded lazily, so a large manifest is never held in memory.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(BATCH_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(item):
+            yield from sorted(glob.glob(item, recursive=True))
+        else:
+            yield item
+    if manifest:
+        f = sys.stdin if manifest == "-" else open(manifest, encoding="utf-8")
+        try:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def scan_batch_item(path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Scan one file of a batch and return its NDJSON record.
+
+    Errors are reported in the ``error`` field instead of being raised, so
+    one broken file does not stop the batch.  ``options`` are passed to
+    :func:`scan_file_for_fonts`, except ``cache_dir`` and ``refresh`` which
+    select the result cache (see :func:`scan_file_for_fonts_cached`); the
+    cache is opened by name so the options can be sent to worker processes.
+    """
+    options = dict(options)
+    cache_dir = options.pop("cache_dir", None)
+    refresh = options.pop("refresh", False)
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"path": path, "size": None, "fonts": [], "error": None}
+    try:
+        record["size"] = os.path.getsize(path)
+        cache = psd_cache.get_cache(cache_dir) if cache_dir else None
+        record["fonts"] = scan_file_for_fonts_cached(path, cache, refresh, **options)
+    except Exception as exc:
+        record["error"] = str(exc)
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+def scan_batch(
+    paths: Iterable[str],
+    workers: int = 1,
+    ordered: bool = False,
+    **options: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Scan many files and yield one record per file (see :func:`scan_batch_item`).
+
+    With ``workers`` > 1 (``0`` means one per CPU) the files are spread over
+    a process pool.  At most four files per worker are in flight, so the
+    path list is consumed lazily.  Records are yielded as soon as a file is
+    done; with ``ordered`` they keep the order of ``paths``, which can hold
+    fast files back behind a slow one.  ``options`` are passed to
+    :func:`scan_file_for_fonts`; each file is scanned by a single process.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for path in paths:
+            yield scan_batch_item(path, options)
+        return
+
+    paths = iter(paths)
+    max_pending = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        while True:
+            while len(pending) < max_pending:
+                path = next(paths, None)
+                if path is None:
+                    break
+                pending.append(pool.submit(scan_batch_item, path, options))
+            if not pending:
+                return
+            if ordered:
+                yield pending.popleft().result()
+                continue
+            done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+            for future in [f for f in pending if f in done]:
+                pending.remove(future)
+                yield future.result()
+
+
+def run_batch(paths: Iterable[str], workers: int, ordered: bool, **options: Any) -> int:
+    """Print one NDJSON record per file and a throughput summary on stderr.
+
+    Returns the number of files that could not be scanned.
+    """
+    start = time.perf_counter()
+    files = errors = total_bytes = 0
+    for record in scan_batch(paths, workers, ordered, **options):
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+        files += 1
+        total_bytes += record["size"] or 0
+        if record["error"]:
+            errors += 1
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    megabytes = total_bytes / 1024 / 1024
+    sys.stderr.write(
+        f"{files} arquivos ({errors} com erro), {megabytes:.1f} MB em {elapsed:.2f} s: "
+        f"{files / elapsed:.1f} arquivos/s, {megabytes / elapsed:.1f} MB/s\n"
+    )
+    return errors
+
+
+def run_probe(paths: Iterable[str], as_json: bool) -> int:
+    """Print :func:`psd_sections.probe` summaries and return the error count.
+
+    With ``as_json`` one JSON record is printed per line, as in batch mode.
+    """
+    errors = 0
+    for path in paths:
+        try:
+            summary = psd_sections.probe_file(path).as_dict()
+        except (OSError, ValueError) as exc:
+            errors += 1
+            sys.stderr.write(f"Error: {path}: {exc}\n")
+            continue
+        if as_json:
+            print(json.dumps({"file": path, **summary}, ensure_ascii=False), flush=True)
+        else:
+            print(f"Arquivo: {path}")
+            for key, value in summary.items():
+                print(f"  {key}: {value}")
+    return errors
+
+
 def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(
         description=(
             "Scan a PSD/PSB file for probable font names by examining the binary contents."
         )
     )
-    parser.add_argument("file", help="Path to the PSD or PSB file to analyse.")
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help=(
+            "PSD/PSB files, directories or glob patterns to analyse. More than "
+            "one file switches to batch mode (one NDJSON record per file)."
+        ),
+    )
+    parser.add_argument(
+        "--manifest",
+        help="File with one path per line to scan in batch mode ('-' reads stdin).",
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="In batch mode, print the records in input order.",
+    )
     parser.add_argument(
         "--json",
         action="store_true",
         help="Output the result as JSON instead of plain text.",
     )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help=(
+            "Only print a summary read from the header and layer records "
+            "(size, color mode, depth, layer count, text layers); no font scan."
+        ),
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read the file in fixed-size chunks instead of loading it whole.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Chunk size in bytes for --stream (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--sections",
+        action="store_true",
+        help=(
+            "Only scan metadata sections (image resources, layer records and "
+            "tagged blocks), skipping pixel data."
+        ),
+    )
+    parser.add_argument(
+        "--engine-data",
+        action="store_true",
+        help="Only scan the TySh/Txt2 text engine data blocks.",
+    )
+    parser.add_argument(
+        "--terms-file",
+        help="File with one font term per line, replacing the built-in list.",
+    )
+    parser.add_argument(
+        "--strings",
+        action="store_true",
+        help="Decode ASCII and UTF-16BE strings in place instead of stripping null bytes.",
+    )
+    parser.add_argument(
+        "--no-numpy",
+        action="store_true",
+        help="Do not use the NumPy prefilter even when NumPy is installed.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker processes; 0 uses one per CPU (default: %(default)s). "
+            "In batch mode, the number of files scanned at once."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the persistent result cache.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Scan again and replace the cached result.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=psd_cache.DEFAULT_CACHE_DIR,
+        help="Result cache directory (default: %(default)s).",
+    )
     args = parser.parse_args(argv)
+    if not args.files and not args.manifest:
+        parser.error("give a file, a directory, a glob pattern or --manifest")
+
+    options = dict(
+        chunk_size=args.chunk_size if args.stream else None,
+        sections_only=args.sections,
+        engine_data_only=args.engine_data,
+        terms=load_terms(args.terms_file) if args.terms_file else None,
+        decode_strings=args.strings,
+        use_numpy=False if args.no_numpy else None,
+    )
 
+    single = (
+        len(args.files) == 1
+        and not args.manifest
+        and not os.path.isdir(args.files[0])
+        and not glob.has_magic(args.files[0])
+    )
+    if args.probe:
+        paths = args.files[:1] if single else iter_input_paths(args.files, args.manifest)
+        sys.exit(1 if run_probe(paths, args.json or not single) else 0)
+    if not single:
+        if not args.no_cache:
+            options.update(cache_dir=args.cache_dir, refresh=args.refresh)
+        paths = iter_input_paths(args.files, args.manifest)
+        errors = run_batch(paths, args.workers, args.ordered, **options)
+        sys.exit(1 if errors else 0)
+
+    path = args.files[0]
+    cache = None if args.no_cache else psd_cache.get_cache(args.cache_dir)
     try:
-        fonts = scan_file_for_fonts(args.file)
+        fonts = scan_file_for_fonts_cached(
+            path, cache, args.refresh, workers=args.workers, **options
+        )
     except Exception as exc:
         sys.stderr.write(f"Error: {exc}\n")
         sys.exit(1)
 
     if args.json:
-        print(json.dumps({"file": args.file, "fonts": fonts}, ensure_ascii=False, indent=2))
+        print(json.dumps({"file": path, "fonts": fonts}, ensure_ascii=False, indent=2))
     else:
-        print(f"Arquivo: {args.file}")
+        print(f"Arquivo: {path}")
         if fonts:
             print("Possíveis fontes encontradas:")
             for name in fonts: